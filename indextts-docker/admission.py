@@ -0,0 +1,119 @@
+"""
+准入控制
+按估算的工作量（文本长度 × num_beams）而不是请求数限制同时在处理的请求，
+超出容量时立即拒绝，并根据当前的消化速度给出建议的重试间隔
+"""
+
+import math
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """容量已满，retry_after 为建议的重试间隔（秒）"""
+
+    def __init__(self, retry_after, message="服务繁忙，请稍后重试"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_cost(text, num_beams=1):
+    """单条请求的工作量估算：字符数 × 束搜索宽度"""
+    try:
+        num_beams = max(1, int(num_beams))
+    except (TypeError, ValueError):
+        # 参数格式错误由后续的参数解析报告，这里按 1 估算
+        num_beams = 1
+    return max(1, len(text or '')) * num_beams
+
+
+class AdmissionTicket:
+    """已准入请求的凭证，处理结束后交还给 release()"""
+
+    def __init__(self, cost):
+        self.cost = cost
+        self.admitted_at = time.monotonic()
+        self.released = False
+
+
+class AdmissionController:
+    """
+    基于工作量的有界准入
+
+    - 在处理中的总工作量超过 max_cost 时拒绝新请求；空闲时单个超大请求仍然放行，避免永远无法执行
+    - 消化速度取最近 window 秒内完成的工作量 / 时间，用于估算排队等待和 Retry-After
+    """
+
+    def __init__(self, max_cost, window=60.0, min_retry_after=1, max_retry_after=60):
+        self.max_cost = int(max_cost)
+        self.window = float(window)
+        self.min_retry_after = min_retry_after
+        self.max_retry_after = max_retry_after
+        self._lock = threading.Lock()
+        self._inflight_cost = 0
+        self._inflight = 0
+        self._completed = deque()  # (完成时间, 工作量)
+        self.stats = {"admitted": 0, "rejected": 0}
+
+    @property
+    def enabled(self):
+        return self.max_cost > 0
+
+    def acquire(self, cost):
+        """准入成功返回 AdmissionTicket，容量已满时抛出 Overloaded"""
+        with self._lock:
+            if self.enabled and self._inflight and self._inflight_cost + cost > self.max_cost:
+                self.stats["rejected"] += 1
+                excess = self._inflight_cost + cost - self.max_cost
+                raise Overloaded(self._retry_after_locked(excess))
+            self._inflight_cost += cost
+            self._inflight += 1
+            self.stats["admitted"] += 1
+        return AdmissionTicket(cost)
+
+    def release(self, ticket):
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            self._inflight_cost -= ticket.cost
+            self._inflight -= 1
+            self._completed.append((time.monotonic(), ticket.cost))
+
+    def drain_rate(self):
+        """最近 window 秒内每秒完成的工作量"""
+        with self._lock:
+            return self._drain_rate_locked()
+
+    def snapshot(self):
+        with self._lock:
+            rate = self._drain_rate_locked()
+            return {
+                "max_cost": self.max_cost,
+                "inflight_requests": self._inflight,
+                "inflight_cost": self._inflight_cost,
+                "drain_rate": round(rate, 2),
+                "estimated_wait_seconds": round(self._inflight_cost / rate, 2) if rate else None,
+                **self.stats,
+            }
+
+    def _drain_rate_locked(self):
+        now = time.monotonic()
+        while self._completed and self._completed[0][0] < now - self.window:
+            self._completed.popleft()
+        if not self._completed:
+            return 0.0
+        span = max(1.0, now - self._completed[0][0])
+        return sum(cost for _, cost in self._completed) / span
+
+    def _retry_after_locked(self, excess):
+        rate = self._drain_rate_locked()
+        if not rate:
+            # 还没有完成过请求，无法估算速度
+            return self.min_retry_after
+        seconds = math.ceil(excess / rate)
+        return max(self.min_retry_after, min(self.max_retry_after, seconds))
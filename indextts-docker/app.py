@@ -5,15 +5,58 @@ IndexTTS2.5 API 服务
 """
 
 import os
+import gc
 import sys
+import hmac
 import json
 import base64
+import time
+import signal
 import logging
 import tempfile
+import threading
 from pathlib import Path
-from flask import Flask, request, jsonify, send_file
+from contextlib import ExitStack
+import numpy as np
+from flask import Flask, Request, Response, g, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.serving import make_server
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from config import (
+    INDEXTTS_CONFIG, API_CONFIG, CACHE_CONFIG, PROMPT_CONFIG, JOB_CONFIG, BATCH_CONFIG, REPLICA_CONFIG,
+    ADMISSION_CONFIG, AUDIO_CONFIG, VOICE_CONFIG, LIFECYCLE_CONFIG, ADMIN_CONFIG, PROFILE_CONFIG, TRACE_CONFIG,
+    LOCAL_CONFIG,
+)
+from tts_cache import DiskLRUCache, CachePins, make_cache_key
+from prompt_store import PromptStore, PromptScope, PromptTooLarge
+from prompt_fetcher import PromptFetcher, PromptFetchError
+from url_guard import URLRejected
+from tts_jobs import JobManager, JobQueueFull, WebhookRejected
+from model_lifecycle import (
+    ModelStatus, ModelSlot, Drainer, PhaseTimer, construct_model, make_warmup_prompt, process_uptime, warm_up,
+)
+from tts_scheduler import BatchScheduler, SingleFlight
+from replica_pool import ReplicaPool
+from admission import AdmissionController, Overloaded, estimate_cost
+from voice_registry import VoiceRegistry, VoiceError, VoiceExists, PRECOMPUTE_TEXT, run_infer, forget_prompt
+from request_deadline import Cancellation, DisconnectWatcher, RequestCancelled, parse_deadline
+import tts_metrics
+import request_profiler
+from request_profiler import PROFILE_ARTIFACTS, ProfileStore
+import tts_tracing
+from tts_tracing import Tracer, make_exporter
+from shm_handoff import LOCAL_TRANSPORT_KEY, HandoffStore, HandoffFull, local_transport
+from tts_metrics import stage, observe_stage
+from text_segmenter import split_sentences, segment_text
+from audio_utils import (
+    read_pcm16, read_float, audio_info, wav_stream_header,
+    resample, crossfade_concat, pcm16_to_float, loudness_normalize,
+)
+import audio_encoder
+from audio_encoder import SUPPORTED_FORMATS, opus_sample_rate, parse_bitrate
 
 # 配置日志
 logging.basicConfig(
@@ -37,55 +80,760 @@ USE_CUDA_KERNEL = os.getenv('USE_CUDA_KERNEL', 'True').lower() == 'true'
 USE_DEEPSPEED = os.getenv('USE_DEEPSPEED', 'False').lower() == 'true'
 DEVICE = os.getenv('DEVICE', 'cuda' if os.getenv('CUDA_VISIBLE_DEVICES') else 'cpu')
 
+# IndexTTS2 构造参数，单进程和多副本模式共用
+MODEL_KWARGS = {
+    'cfg_path': CONFIG_PATH,
+    'model_dir': CHECKPOINT_PATH,
+    'use_fp16': USE_FP16,
+    'use_cuda_kernel': USE_CUDA_KERNEL,
+    'use_deepspeed': USE_DEEPSPEED,
+    'device': DEVICE,
+}
+
+# 输出格式对应的 MIME 类型
+AUDIO_MIMETYPES = {
+    'wav': 'audio/wav',
+    'mp3': 'audio/mpeg',
+    'ogg': 'audio/ogg',
+    'opus': 'audio/ogg'
+}
+
+# 非流式响应的返回方式（shm 仅限经 Unix 套接字的同机连接）
+RESPONSE_MODES = ('base64', 'binary', 'url', 'shm')
+
+# 流式响应头
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"  # 关闭 nginx 缓冲，保证逐句下发
+}
+
 # 确保输出目录存在
 Path(OUTPUT_PATH).mkdir(parents=True, exist_ok=True)
 
-# 全局变量存储模型实例
+# 全局变量存储模型实例（多副本模式下为 ReplicaPool，调用方式相同）
 tts_model = None
 
-def load_model():
-    """加载 IndexTTS2 模型"""
-    global tts_model
+# 模型加载/预热状态
+model_status = ModelStatus()
+
+# 推理实际使用的模型实例：热重载时原子切换，旧实例在在途推理结束后释放
+model_slot = ModelSlot()
+
+# 在途请求计数：SIGTERM 后不再接收新的合成请求，等在途请求结束后退出
+drainer = Drainer()
+
+# 热重载状态
+reload_status = {"state": "idle"}
+_reload_lock = threading.Lock()
+
+
+def _run_infer(profile=None, trace=None, **infer_kwargs):
+    """
+    在调度线程中调用模型推理；profile 为所属请求的剖析，推理过程计入该剖析，
+    trace 为所属请求的 span，推理记为其子 span
+    """
+    model = model_slot.acquire()
+    try:
+        with request_profiler.profiling(profile, trace=True), tts_tracing.activated(trace), stage('infer'):
+            return run_infer(model, infer_kwargs)
+    finally:
+        model_slot.release(model)
+
+
+def _run_infer_batch(batch):
+    """多副本模式：整批派发给在途任务最少的副本"""
+    t0 = time.perf_counter()
+    # 剖析对象不能传给副本进程；推理在副本中执行，这里只采样等待副本的调度线程
+    profiles = {id(p): p for p in (kwargs.pop('profile', None) for kwargs in batch) if p is not None}
+    traces = [kwargs.pop('trace', None) for kwargs in batch]
+    started_ns = time.time_ns()
+    pool = model_slot.acquire()
+    try:
+        with ExitStack() as scope:
+            for profile in profiles.values():
+                scope.enter_context(profile.activate())
+            results = pool.infer_batch(batch)
+    finally:
+        model_slot.release(pool)
+    # 副本内背靠背执行，按条目平均计入推理耗时
+    per_item = (time.perf_counter() - t0) / max(1, len(batch))
+    for _ in batch:
+        observe_stage('infer', per_item)
+    for trace in traces:
+        tts_tracing.record(trace, 'infer', started_ns, batch_size=len(batch))
+    return results
+
+
+def _observe_queue_wait(task):
+    waited = time.monotonic() - task.enqueued_at
+    observe_stage('queue_wait', waited)
+    tts_tracing.record(task.infer_kwargs.get('trace'), 'queue_wait', time.time_ns() - int(waited * 1e9))
+
+
+# 推理调度器：并发请求按音色和采样参数分组，凑批后串行交给模型；
+# 多副本模式下每个副本一个调度线程，各批次并行执行
+tts_scheduler = BatchScheduler(
+    _run_infer,
+    batch_size=INDEXTTS_CONFIG['batch_size'],
+    max_wait=INDEXTTS_CONFIG['batch_max_wait_ms'] / 1000.0,
+    batch_infer_fn=_run_infer_batch if REPLICA_CONFIG['replicas'] > 0 else None,
+    workers=max(1, REPLICA_CONFIG['replicas']),
+    on_dispatch=_observe_queue_wait,
+)
+
+
+# 参考音频存储：上传内容按哈希去重，路径稳定以复用模型内部的音色条件缓存
+prompt_store = PromptStore(
+    PROMPT_CONFIG['cache_dir'],
+    PROMPT_CONFIG['cache_max_bytes'],
+    spool_max_bytes=PROMPT_CONFIG['spool_max_bytes'],
+    upload_max_bytes=PROMPT_CONFIG['upload_max_bytes'],
+)
+
+# URL 参考音频：连接池下载，按内容哈希落盘，按 ETag/Last-Modified 重新验证
+prompt_fetcher = PromptFetcher(
+    PromptStore(
+        PROMPT_CONFIG['url_cache_dir'],
+        PROMPT_CONFIG['url_cache_max_bytes'],
+        spool_max_bytes=PROMPT_CONFIG['spool_max_bytes'],
+        upload_max_bytes=PROMPT_CONFIG['upload_max_bytes'],
+    ),
+    per_host=PROMPT_CONFIG['fetch_per_host'],
+    pool_size=PROMPT_CONFIG['fetch_pool_size'],
+    timeout=PROMPT_CONFIG['fetch_timeout'],
+    revalidate_after=PROMPT_CONFIG['url_revalidate_after'],
+    allowed_hosts=PROMPT_CONFIG['fetch_allowed_hosts'],
+    allow_private=PROMPT_CONFIG['fetch_allow_private'],
+)
+
+# 音色注册表：参考音频预处理后持久化，条件张量预先算好，按 voice_id 合成时跳过参考音频处理
+voice_registry = VoiceRegistry(
+    VOICE_CONFIG['dir'],
+    sample_rate=VOICE_CONFIG['sample_rate'],
+    max_seconds=VOICE_CONFIG['max_seconds'],
+    trim_db=VOICE_CONFIG['trim_db'],
+)
+
+# 异步任务：有界线程池执行，HTTP 线程不等待推理
+tts_jobs = JobManager(
+    max_workers=JOB_CONFIG['workers'],
+    max_pending=JOB_CONFIG['max_pending'],
+    result_ttl=JOB_CONFIG['result_ttl'],
+    webhook_timeout=JOB_CONFIG['webhook_timeout'],
+    webhook_allowed_hosts=JOB_CONFIG['webhook_allowed_hosts'],
+    webhook_allow_private=JOB_CONFIG['webhook_allow_private'],
+    webhook_workers=JOB_CONFIG['webhook_workers'],
+)
+
+# 批量接口的条目执行线程：条目在这里等待调度器，推理本身仍由调度线程串行执行
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_CONFIG['workers'], thread_name_prefix='tts-batch')
+
+# 长文本分段线程：与 batch_executor 分开，避免批量条目等待分段时占满线程池
+segment_executor = ThreadPoolExecutor(max_workers=INDEXTTS_CONFIG['segment_workers'], thread_name_prefix='tts-segment')
+
+# 相同缓存键的并发请求只合成一次
+tts_inflight = SingleFlight()
+
+# 结果缓存：输出目录按字节配额做 LRU 淘汰
+result_cache = DiskLRUCache(OUTPUT_PATH, CACHE_CONFIG['result_cache_max_bytes'])
+
+# 准入控制：同步接口按工作量限流，满载时返回 429 而不是让请求堆积到超时
+admission = AdmissionController(
+    ADMISSION_CONFIG['max_cost'],
+    window=ADMISSION_CONFIG['window'],
+    max_retry_after=ADMISSION_CONFIG['max_retry_after'],
+)
+
+# 同步请求的客户端断开检测：断开后撤回排队中的推理任务
+disconnect_watcher = DisconnectWatcher()
+
+# 请求剖析：X-Profile 头（需管理令牌）触发的显式剖析，以及按 PROFILE_SAMPLE_RATE 抽样的剖析
+profile_store = ProfileStore(
+    PROFILE_CONFIG['dir'],
+    max_entries=PROFILE_CONFIG['max_entries'],
+    sample_rate=PROFILE_CONFIG['sample_rate'],
+    interval=PROFILE_CONFIG['interval'],
+    torch_trace=PROFILE_CONFIG['torch_trace'],
+)
+
+# 分布式追踪：沿用请求 traceparent 中的 trace，各处理阶段记为 span 导出到 JSONL 文件或 OTLP 收集器
+tracer = Tracer(
+    make_exporter(
+        TRACE_CONFIG['exporter'],
+        path=TRACE_CONFIG['file'],
+        endpoint=TRACE_CONFIG['otlp_endpoint'],
+        service_name=TRACE_CONFIG['service_name'],
+        max_bytes=TRACE_CONFIG['file_max_bytes'],
+    ),
+    service_name=TRACE_CONFIG['service_name'],
+    sample_rate=TRACE_CONFIG['sample_rate'],
+)
+
+# 同机共享内存交接：配置了 UDS_PATH 时，经 Unix 套接字的请求可以用 response_mode=shm 取回结果
+handoff_store = HandoffStore(
+    LOCAL_CONFIG['handoff_dir'],
+    ttl=LOCAL_CONFIG['lease_ttl'],
+    max_bytes=LOCAL_CONFIG['max_bytes'],
+    source_dir=OUTPUT_PATH,
+) if LOCAL_CONFIG['socket_path'] else None
+
+# 监控指标中按需读取的状态值
+tts_metrics.QUEUE_DEPTH.set_function(tts_scheduler.queue_depth)
+tts_metrics.INFLIGHT_COST.set_function(lambda: admission.snapshot()["inflight_cost"])
+tts_metrics.CACHE_HIT_RATIO.set_function(lambda: result_cache.snapshot()["hit_ratio"])
+tts_metrics.CACHE_BYTES.set_function(lambda: result_cache.snapshot()["bytes"])
+tts_metrics.MODEL_LOAD_SECONDS.set_function(lambda: model_status.load_seconds or 0)
+tts_metrics.MODEL_WARMUP_SECONDS.set_function(lambda: model_status.warmup_seconds or 0)
+tts_metrics.MODEL_READY.set_function(lambda: 1 if tts_model is not None and model_status.ready else 0)
+
+# 计入请求数/耗时指标的接口及其标签
+METERED_ENDPOINTS = {
+    'generate_tts': 'tts',
+    'generate_tts_batch': 'tts_batch',
+    'create_tts_job': 'tts_jobs',
+    'generate_speech': 'tts_generate',
+}
+
+
+def _prompt_identity(value):
+    """本地路径参考音频的标识：带上大小和修改时间，文件被替换后缓存键随之变化"""
+    if value is None:
+        return None
+    if os.path.exists(value):
+        st = os.stat(value)
+        return f"file:{os.path.abspath(value)}:{st.st_size}:{st.st_mtime_ns}"
+    return value
+
+
+def _output_name(text, spk_audio_id, emo_audio_id, sampling_params, output_format, audio_params, incremental=False):
+    """返回 (缓存键, 结果文件名)；逐句拼接的结果与整段合成的结果不同，incremental 计入缓存键"""
+    if incremental:
+        audio_params = {**audio_params, "incremental": True}
+    cache_key = make_cache_key(text, spk_audio_id, emo_audio_id, sampling_params, output_format, audio_params)
+    return cache_key, f"tts_{cache_key[:32]}.{output_format}"
+
+
+def _incremental_units(text):
+    """
+    增量模式的合成单位：按句切分，超过 max_text_length 的句子再按 segment_text 切开
+    每个单位都不会再分段，分段线程中的 synthesize() 不会向同一线程池提交任务后阻塞等待
+    """
+    max_length = INDEXTTS_CONFIG['max_text_length']
+    return [unit for sentence in split_sentences(text) for unit in segment_text(sentence, max_length)]
+
+
+def synthesize(text, spk_audio_prompt, spk_audio_id, emo_audio_prompt, emo_audio_id,
+               sampling_params, output_format, audio_params=None, voice=None, verbose=False, timeout=None,
+               progress=None, incremental=False, cancellation=None, pins=None):
+    """
+    合成语音（带结果缓存和同键请求合并）
+    超过 max_text_length 的文本会切段并行合成后拼接
+    audio_params 为后处理参数：sample_rate / loudness / bitrate
+    voice 为注册音色的推理参数（见 VoiceRegistry.infer_spec），推理前装入预计算的条件
+    progress(已完成, 总数) 用于汇报分段进度
+    incremental 为 True 时按句合成：每句的波形单独缓存（与流式输出共用），
+    修改文稿后重新提交只合成改动的句子，其余句子取自缓存后交叉淡化拼接
+    cancellation 为请求的截止时间和取消状态：过期或取消后排队中的任务被丢弃，抛出 RequestCancelled
+    pins 为 CachePins 时结果文件被 pin 住，调用方读取、发送完毕后 close()，期间不会被淘汰
+    返回 dict: path / duration / sample_rate / cache_key / cached / coalesced，
+    incremental 时另有 sentences / sentences_reused
+    """
+    if timeout is None:
+        timeout = API_CONFIG['timeout']
+    if cancellation is not None:
+        cancellation.check()
+        timeout = cancellation.limit(timeout)
+    profile = request_profiler.current()
+    trace = tts_tracing.current()
+    audio_params = dict(audio_params or {})
+    if output_format == 'wav':
+        # WAV 为无损 PCM，码率不影响结果
+        audio_params.pop('bitrate', None)
+    cache_key, output_filename = _output_name(
+        text, spk_audio_id, emo_audio_id, sampling_params, output_format, audio_params, incremental
+    )
+    
+    if CACHE_CONFIG['result_cache_enabled']:
+        cached_path = (pins or result_cache).get(output_filename)
+        if cached_path is not None:
+            if cached_path.exists():
+                logger.info(f"命中结果缓存: {output_filename}")
+                request_profiler.annotate(cache="hit")
+                duration, sample_rate = _probe_audio(cached_path)
+                result = {
+                    "path": str(cached_path), "duration": duration, "sample_rate": sample_rate,
+                    "cache_key": cache_key, "cached": True, "coalesced": False
+                }
+                if incremental:
+                    sentences = len(_incremental_units(text))
+                    result.update(sentences=sentences, sentences_reused=sentences)
+                return result
+            result_cache.discard(output_filename)
     
+    # 增量模式按句切分（与流式输出一致，两者共用每句的缓存），超长的句子按 max_text_length 再切开
+    segments = _incremental_units(text) if incremental else segment_text(text, INDEXTTS_CONFIG['max_text_length'])
+    request_profiler.annotate(text_chars=len(text), segments=len(segments), spk_audio_id=spk_audio_id)
+    
+    def run():
+        if incremental or len(segments) > 1:
+            result = _synthesize_segments(
+                segments, output_filename, spk_audio_prompt, spk_audio_id, emo_audio_prompt, emo_audio_id,
+                sampling_params, output_format, audio_params, voice, verbose, timeout, progress, cancellation, pins
+            )
+            reused = result.pop("reused")
+            if incremental:
+                logger.info(f"增量合成: {len(segments)} 句, 复用 {reused} 句")
+                tts_metrics.INCREMENTAL_SENTENCES.labels(result='reused').inc(reused)
+                tts_metrics.INCREMENTAL_SENTENCES.labels(result='synthesized').inc(len(segments) - reused)
+                result.update(sentences=len(segments), sentences_reused=reused)
+            return result
+        
+        # 交给调度器执行：同音色、同采样参数的并发请求会合并为一批
+        # 模型直接返回波形（不写文件），后处理和编码都在内存中完成
+        started = time.perf_counter()
+        group_key = (spk_audio_id, emo_audio_id, json.dumps(sampling_params, sort_keys=True))
+        future = tts_scheduler.submit(group_key, dict(
+            spk_audio_prompt=spk_audio_prompt,
+            text=text,
+            output_path=None,
+            emo_audio_prompt=emo_audio_prompt,
+            verbose=verbose,
+            **({"voice": voice} if voice is not None else {}),
+            **({"profile": profile} if profile is not None else {}),
+            **({"trace": trace} if trace is not None else {}),
+            **sampling_params
+        ), deadline=cancellation.deadline if cancellation is not None else None)
+        if cancellation is not None:
+            cancellation.on_cancel(future.cancel)
+        try:
+            sample_rate, wave = future.result(timeout=timeout)
+        except BaseException as e:
+            future.cancel()
+            if cancellation is not None and cancellation.cancelled and not isinstance(e, RequestCancelled):
+                raise cancellation.error() from e
+            raise
+        result = _encode_result(pcm16_to_float(wave), sample_rate, output_filename, output_format, audio_params, pins)
+        tts_metrics.observe_synthesis(result["duration"], time.perf_counter() - started)
+        return result
+    
+    # 同一缓存键正在合成时，后到的请求直接等待其结果；发起合成的请求被取消时，等待者自己重新合成
+    result, coalesced = tts_inflight.do(cache_key, run, timeout=timeout, retry_on=(RequestCancelled,))
+    if coalesced:
+        logger.info(f"合并到进行中的合成: {output_filename}")
+        if pins is not None:
+            # 结果由发起合成的请求写入并 pin 住，这里为本请求再 pin 一次
+            pins.get(output_filename)
+    return {**result, "cache_key": cache_key, "cached": False, "coalesced": coalesced}
+
+
+def _encode_result(wave, sample_rate, output_filename, output_format, audio_params, pins=None):
+    """
+    后处理并编码：重采样、响度归一化、按格式和码率编码，写入结果缓存（pins 不为 None 时 pin 住）
+    时长按采样点数精确计算，返回 dict: path / duration / sample_rate
+    """
+    target_rate = audio_params.get('sample_rate') or sample_rate
+    if output_format == 'opus':
+        target_rate = opus_sample_rate(target_rate)
+    with stage('postprocess'):
+        wave = resample(wave, sample_rate, target_rate)
+        if audio_params.get('loudness') is not None:
+            wave = loudness_normalize(wave, target_rate, audio_params['loudness'])
+    with stage('audio_encode'):
+        audio_bytes = audio_encoder.encode(wave, target_rate, output_format, audio_params.get('bitrate'))
+    
+    staging_path = result_cache.staging_path(output_filename)
+    try:
+        with open(staging_path, 'wb') as f:
+            f.write(audio_bytes)
+        path = str((pins or result_cache).commit(output_filename, staging_path))
+    except BaseException:
+        if staging_path.exists():
+            staging_path.unlink()
+        raise
+    return {"path": path, "duration": round(len(wave) / float(target_rate), 3), "sample_rate": target_rate}
+
+
+def _probe_audio(path):
+    """读取已有音频文件的 (时长, 采样率)，无法解析时返回 (None, None)"""
+    try:
+        duration, sample_rate = audio_info(path)
+        return round(duration, 3), sample_rate
+    except Exception as e:
+        logger.warning(f"读取音频信息失败: {path}, {str(e)}")
+        return None, None
+
+
+def _synthesize_segments(segments, output_filename, spk_audio_prompt, spk_audio_id, emo_audio_prompt,
+                         emo_audio_id, sampling_params, output_format, audio_params, voice, verbose, timeout,
+                         progress, cancellation=None, pins=None):
+    """
+    长文本分段合成：各段同时提交（每段单独走缓存，保存未经后处理的 WAV），
+    完成后统一采样率、交叉淡化拼接，再对整段做后处理和编码
+    各段文件在读取完之前保持 pin 住，不会被并发请求的写入淘汰
+    任一段失败或请求被取消时，尚未开始的段不再合成
+    返回的 dict 中 reused 为命中缓存的段数
+    """
+    logger.info(f"长文本分段合成: {len(segments)} 段, 各段长度={[len(segment) for segment in segments]}")
+    segment_pins = CachePins(result_cache)
+    futures = [
+        segment_executor.submit(
+            request_profiler.wrap(tts_tracing.wrap(synthesize)), segment, spk_audio_prompt, spk_audio_id, emo_audio_prompt, emo_audio_id,
+            sampling_params, 'wav', voice=voice, verbose=verbose, timeout=timeout, cancellation=cancellation,
+            pins=segment_pins
+        )
+        for segment in segments
+    ]
+    if cancellation is not None:
+        cancellation.on_cancel(lambda: [future.cancel() for future in futures])
+    try:
+        done = 0
+        for future in as_completed(futures, timeout=timeout):
+            future.result()
+            done += 1
+            if progress is not None:
+                progress(done, len(segments))
+        
+        waves = []
+        sample_rate = None
+        reused = 0
+        for future in futures:
+            segment_result = future.result()
+            reused += segment_result["cached"]
+            rate, wave = read_float(segment_result["path"])
+            if sample_rate is None:
+                sample_rate = rate
+            waves.append(resample(wave, rate, sample_rate))
+    except BaseException as e:
+        for future in futures:
+            future.cancel()
+        if cancellation is not None and cancellation.cancelled and not isinstance(e, RequestCancelled):
+            raise cancellation.error() from e
+        raise
+    finally:
+        segment_pins.close()
+    
+    channels = max(wave.shape[1] for wave in waves)
+    waves = [np.repeat(wave, channels, axis=1) if wave.shape[1] < channels else wave for wave in waves]
+    joined = crossfade_concat(waves, sample_rate, INDEXTTS_CONFIG['segment_crossfade_ms'])
+    return {**_encode_result(joined, sample_rate, output_filename, output_format, audio_params, pins), "reused": reused}
+
+
+def load_model(model_kwargs=None, timer=None):
+    """
+    加载 IndexTTS2 模型，成功返回模型实例，失败返回 None；model_kwargs 默认为 MODEL_KWARGS
+    timer 为 PhaseTimer 时记录导入模型代码和加载权重的耗时
+    """
+    model_kwargs = model_kwargs or MODEL_KWARGS
     try:
         logger.info(f"正在加载 IndexTTS2 模型...")
-        logger.info(f"配置文件路径: {CONFIG_PATH}")
-        logger.info(f"模型目录: {CHECKPOINT_PATH}")
-        logger.info(f"设备: {DEVICE}, FP16: {USE_FP16}, CUDA Kernel: {USE_CUDA_KERNEL}")
+        logger.info(f"配置文件路径: {model_kwargs['cfg_path']}")
+        logger.info(f"模型目录: {model_kwargs['model_dir']}")
+        logger.info(
+            f"设备: {model_kwargs['device']}, FP16: {model_kwargs['use_fp16']}, "
+            f"CUDA Kernel: {model_kwargs['use_cuda_kernel']}"
+        )
         
         # 检查配置文件是否存在
-        if not os.path.exists(CONFIG_PATH):
-            logger.error(f"❌ 配置文件不存在: {CONFIG_PATH}")
-            return False
-        
-        if not os.path.exists(CHECKPOINT_PATH):
-            logger.error(f"❌ 模型目录不存在: {CHECKPOINT_PATH}")
-            return False
-        
-        # 导入 IndexTTS2
-        from indextts.infer_v2 import IndexTTS2
-        
-        # 初始化模型
-        tts_model = IndexTTS2(
-            cfg_path=CONFIG_PATH,
-            model_dir=CHECKPOINT_PATH,
-            use_fp16=USE_FP16,
-            use_cuda_kernel=USE_CUDA_KERNEL,
-            use_deepspeed=USE_DEEPSPEED,
-            device=DEVICE
+        if not os.path.exists(model_kwargs['cfg_path']):
+            logger.error(f"❌ 配置文件不存在: {model_kwargs['cfg_path']}")
+            return None
+        
+        if not os.path.exists(model_kwargs['model_dir']):
+            logger.error(f"❌ 模型目录不存在: {model_kwargs['model_dir']}")
+            return None
+        
+        # 导入 IndexTTS2（MODEL_CLASS 可替换为基准测试用的假模型）并初始化，权重经检查点快照加载
+        model = construct_model(
+            INDEXTTS_CONFIG['model_class'], model_kwargs,
+            snapshot_dir=INDEXTTS_CONFIG['snapshot_dir'] if INDEXTTS_CONFIG['snapshot_enabled'] else None,
+            timer=timer
         )
         
         logger.info("✅ IndexTTS2 模型加载完成")
-        return True
+        return model
     except ImportError as e:
         logger.error(f"❌ 导入 IndexTTS2 失败: {str(e)}")
         logger.error("请确保已安装 indextts 包: pip install indextts")
         logger.error(traceback.format_exc())
-        return False
+        return None
     except Exception as e:
         logger.error(f"❌ 模型加载失败: {str(e)}")
         logger.error(traceback.format_exc())
+        return None
+
+
+def start_replicas(model_kwargs=None):
+    """
+    多副本模式：启动 REPLICAS 个工作进程，各自加载并预热模型
+    至少一个副本就绪时返回 ReplicaPool，否则返回 None
+    """
+    model_kwargs = model_kwargs or MODEL_KWARGS
+    device = model_kwargs['device']
+    replicas = REPLICA_CONFIG['replicas']
+    logger.info(f"正在启动 {replicas} 个推理副本...")
+    if not os.path.exists(model_kwargs['cfg_path']):
+        logger.error(f"❌ 配置文件不存在: {model_kwargs['cfg_path']}")
+        return None
+    
+    pool = ReplicaPool(
+        replicas,
+        model_kwargs,
+        model_class=INDEXTTS_CONFIG['model_class'],
+        snapshot_dir=INDEXTTS_CONFIG['snapshot_dir'] if INDEXTTS_CONFIG['snapshot_enabled'] else None,
+        warmup={
+            "texts": INDEXTTS_CONFIG['warmup_texts'],
+            "spk_prompt": INDEXTTS_CONFIG['warmup_spk_prompt'],
+        },
+        # 绑核只在 CPU 推理时有意义，GPU 模式下由 CUDA 设备区分副本
+        cpu_pinning=REPLICA_CONFIG['cpu_pinning'] and device == 'cpu',
+        torch_threads=REPLICA_CONFIG['torch_threads'],
+        cuda_devices=REPLICA_CONFIG['cuda_devices'] if device != 'cpu' else None,
+        restart_delay=REPLICA_CONFIG['restart_delay'],
+    )
+    if pool.start() == 0:
+        pool.close()
+        return None
+    return pool
+
+
+def load_model_in_background():
+    """
+    后台加载并预热模型，期间 /health 可以正常应答
+    预热完成后才设置 tts_model，推理请求在此之前返回 503
+    各阶段耗时记入 /health 的 model.startup_phases，就绪时输出到日志
+    """
+    timer = PhaseTimer()
+    # 进程启动到开始加载模型：解释器启动和服务模块导入，这段时间内 HTTP 服务还不可用
+    timer.record('process_start', process_uptime())
+    model_status.update(phase='loading', phases=timer.phases)
+    if REPLICA_CONFIG['replicas'] > 0:
+        # 副本进程内部完成加载和预热
+        pool = start_replicas()
+        if pool is None:
+            model_status.update(phase='failed', error="推理副本启动失败")
+            logger.error("❌ 服务启动失败：推理副本启动失败")
+            if INDEXTTS_CONFIG['exit_on_load_failure']:
+                os._exit(1)
+            return
+        _activate_model(pool)
+        timer.record('load_weights', pool.load_seconds)
+        timer.record('warmup', pool.warmup_seconds)
+        model_status.update(
+            phase='ready', ready_at=time.time(),
+            load_seconds=pool.load_seconds, warmup_seconds=pool.warmup_seconds
+        )
+        logger.info(f"✅ 推理副本已就绪: 加载 {pool.load_seconds}s, 预热 {pool.warmup_seconds}s")
+        logger.info(f"启动耗时: {timer.summary()}, 进程启动至就绪共 {process_uptime()}s")
+        prepare_voices()
+        return
+    
+    t0 = time.perf_counter()
+    model = load_model(timer=timer)
+    if model is None:
+        model_status.update(phase='failed', error="模型加载失败")
+        logger.error("❌ 服务启动失败：模型加载失败")
+        if INDEXTTS_CONFIG['exit_on_load_failure']:
+            os._exit(1)
+        return
+    model_status.update(phase='warming_up', load_seconds=round(time.perf_counter() - t0, 2))
+    
+    try:
+        warmup_seconds = _warm_up_model(model, status=model_status)
+        if warmup_seconds is not None:
+            timer.record('warmup', warmup_seconds)
+            model_status.update(warmup_seconds=round(warmup_seconds, 2))
+    except Exception as e:
+        # 预热失败不影响服务，真实请求会再次触发初始化
+        logger.warning(f"模型预热失败: {str(e)}")
+        logger.warning(traceback.format_exc())
+        model_status.update(warmup_error=str(e))
+    
+    _activate_model(model)
+    model_status.update(phase='ready', ready_at=time.time())
+    logger.info(f"✅ 模型已就绪: 加载 {model_status.load_seconds}s, 预热 {model_status.warmup_seconds}s")
+    logger.info(f"启动耗时: {timer.summary()}, 进程启动至就绪共 {process_uptime()}s")
+    prepare_voices()
+
+
+def _warm_up_model(model, status=None):
+    """按 WARMUP_TEXTS 预热，返回耗时（秒）；未配置预热时返回 None，失败时抛出异常"""
+    warmup_texts = INDEXTTS_CONFIG['warmup_texts']
+    if not warmup_texts:
+        return None
+    spk_audio_prompt = INDEXTTS_CONFIG['warmup_spk_prompt'] or make_warmup_prompt(tempfile.gettempdir())
+    return warm_up(model, warmup_texts, spk_audio_prompt, status=status)
+
+
+def _activate_model(model):
+    """原子地切换推理使用的模型实例，返回旧实例"""
+    global tts_model
+    old = model_slot.swap(model)
+    tts_model = model
+    return old
+
+
+def _release_model(model, timeout):
+    """等旧实例的在途推理结束后释放：副本进程退出，单进程模型回收显存"""
+    if not model_slot.wait_idle(model, timeout):
+        logger.warning(f"旧模型仍有 {model_slot.inflight(model)} 个在途推理，等待超时，强制释放")
+    if isinstance(model, ReplicaPool):
+        model.close()
+    del model
+    gc.collect()
+    torch = sys.modules.get('torch')
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+# 热重载可以修改的构造参数：请求字段 -> IndexTTS2 参数
+RELOAD_FIELDS = {
+    'checkpoint_path': 'model_dir',
+    'config_path': 'cfg_path',
+    'use_fp16': 'use_fp16',
+    'use_cuda_kernel': 'use_cuda_kernel',
+    'use_deepspeed': 'use_deepspeed',
+    'device': 'device',
+}
+
+
+def start_reload(overrides=None, purge_cache=None):
+    """
+    后台加载新的模型实例，预热通过后原子切换，旧实例在在途推理结束后释放
+    overrides 为要修改的 IndexTTS2 构造参数；已有重载在进行时返回 False
+    purge_cache 为 None 时，权重或配置文件变化才清空结果缓存
+    """
+    if not _reload_lock.acquire(blocking=False):
         return False
+    reload_status.clear()
+    reload_status.update(state='pending', started_at=time.time(), overrides=dict(overrides or {}))
+    threading.Thread(
+        target=_reload_model, args=(dict(overrides or {}), purge_cache), name="model-reload", daemon=True
+    ).start()
+    return True
+
+
+def _reload_model(overrides, purge_cache):
+    new_model = None
+    activated = False
+    try:
+        model_kwargs = {**MODEL_KWARGS, **overrides}
+        weights_changed = any(
+            model_kwargs[key] != MODEL_KWARGS[key] for key in ('model_dir', 'cfg_path')
+        )
+        logger.info(f"开始热重载模型: {overrides or '沿用当前参数'}")
+        
+        t0 = time.perf_counter()
+        reload_status.update(state='loading')
+        if REPLICA_CONFIG['replicas'] > 0:
+            # 新副本组在各自进程内完成加载和预热
+            new_model = start_replicas(model_kwargs)
+            if new_model is None:
+                raise RuntimeError("推理副本启动失败")
+        else:
+            new_model = load_model(model_kwargs)
+            if new_model is None:
+                raise RuntimeError("模型加载失败")
+            reload_status.update(state='warming_up', load_seconds=round(time.perf_counter() - t0, 2))
+            # 预热必须成功才切换，避免把流量交给不可用的实例
+            _warm_up_model(new_model)
+        
+        old_model = _activate_model(new_model)
+        activated = True
+        MODEL_KWARGS.update(model_kwargs)
+        reload_status.update(
+            state='draining', activated_at=time.time(), generation=model_slot.generation,
+            ready_seconds=round(time.perf_counter() - t0, 2)
+        )
+        logger.info(f"✅ 新模型已接管流量（第 {model_slot.generation} 代），等待旧模型在途推理结束")
+        
+        if purge_cache if purge_cache is not None else weights_changed:
+            removed = result_cache.clear()
+            logger.info(f"已清空结果缓存: {removed} 个文件")
+        if weights_changed:
+            # 音色条件与权重对应，切换后按新模型重新计算
+            voice_registry.invalidate_conditioning()
+        
+        if old_model is not None:
+            _release_model(old_model, LIFECYCLE_CONFIG['reload_drain_timeout'])
+        reload_status.update(state='done', finished_at=time.time())
+        logger.info("✅ 热重载完成，旧模型已释放")
+        prepare_voices()
+    except Exception as e:
+        logger.error(f"❌ 热重载失败，继续使用当前模型: {str(e)}")
+        logger.error(traceback.format_exc())
+        reload_status.update(state='failed', error=str(e), finished_at=time.time())
+        if new_model is not None and not activated:
+            _release_model(new_model, 0)
+    finally:
+        _reload_lock.release()
+
+
+def graceful_shutdown(signum=None, frame=None):
+    """
+    SIGTERM：不再接收新的合成请求（/ready 返回 503），
+    等在途请求和异步任务完成（最长 DRAIN_TIMEOUT 秒）后退出
+    """
+    if drainer.draining:
+        return
+    drainer.start()
+    logger.info(f"收到退出信号，等待 {drainer.active} 个在途请求和 {tts_jobs.stats()['active']} 个异步任务完成...")
+    
+    def run():
+        drained = drainer.wait(
+            LIFECYCLE_CONFIG['drain_timeout'],
+            busy=lambda: tts_jobs.stats()['active'] > 0 or tts_jobs.stats()['webhooks_pending'] > 0
+        )
+        if not drained:
+            logger.warning(f"等待超时，仍有 {drainer.active} 个在途请求，强制退出")
+        tts_scheduler.stop(timeout=5)
+        if isinstance(tts_model, ReplicaPool):
+            tts_model.close()
+        tracer.flush()
+        logger.info("服务已退出")
+        os._exit(0)
+    
+    threading.Thread(target=run, name="graceful-shutdown", daemon=True).start()
+
+
+def precompute_voice(voice_id, timeout=None):
+    """
+    用音色的参考音频合成一句短文本，把模型算出的条件张量保存到音色目录
+    经由调度器执行，不会与其他推理同时改动模型缓存；返回是否保存成功
+    """
+    spk_audio_prompt, spk_audio_id, _ = voice_registry.infer_spec(voice_id)
+    started = time.perf_counter()
+    future = tts_scheduler.submit((spk_audio_id, None, 'precompute'), dict(
+        spk_audio_prompt=spk_audio_prompt,
+        text=PRECOMPUTE_TEXT,
+        output_path=None,
+        capture_conditioning=voice_registry.conditioning_path(voice_id),
+    ))
+    try:
+        saved = future.result(timeout=timeout or API_CONFIG['timeout'])
+    except BaseException:
+        future.cancel()
+        raise
+    if saved:
+        voice_registry.mark_conditioned(voice_id, time.perf_counter() - started)
+        logger.info(f"音色条件已保存: {voice_id}, 耗时 {time.perf_counter() - started:.2f}s")
+    else:
+        logger.warning(f"当前模型不支持导出音色条件，音色 {voice_id} 将按参考音频合成")
+    return saved
+
+
+def prepare_voices():
+    """模型就绪后：以 mmap 方式预加载已有的音色条件，并补算缺失的"""
+    if not isinstance(tts_model, ReplicaPool):
+        # 副本进程在首次使用时各自加载
+        loaded = voice_registry.preload(getattr(tts_model, 'device', None))
+        if loaded:
+            logger.info(f"已加载 {loaded} 个音色的条件张量")
+    for voice_id in voice_registry.pending():
+        try:
+            precompute_voice(voice_id)
+        except Exception as e:
+            logger.warning(f"计算音色条件失败: {voice_id}, {str(e)}")
+
 
 @app.route('/health', methods=['GET'])
 @app.route('/api/health', methods=['GET'])
@@ -93,10 +841,45 @@ def health_check():
     """健康检查接口"""
     try:
         model_loaded = tts_model is not None
+        phase = model_status.phase
+        if phase == 'failed':
+            status = "unhealthy"
+        elif drainer.draining:
+            status = "draining"
+        elif phase == 'warming_up':
+            status = "warming_up"
+        elif model_loaded:
+            status = "healthy"
+        else:
+            status = "loading"
         return jsonify({
-            "status": "healthy" if model_loaded else "loading",
-            "model_loaded": model_loaded
-        }), 200
+            "status": status,
+            "model_loaded": model_loaded,
+            "model": model_status.snapshot(),
+            "cache": result_cache.snapshot(),
+            "singleflight": {
+                **tts_inflight.stats,
+                "inflight": tts_inflight.inflight_count()
+            },
+            "jobs": tts_jobs.stats(),
+            "prompt_urls": prompt_fetcher.snapshot(),
+            "voices": voice_registry.snapshot(),
+            "profiles": profile_store.snapshot(),
+            "tracing": tracer.snapshot(),
+            "handoff": handoff_store.snapshot() if handoff_store is not None else None,
+            "queue": {
+                "depth": tts_scheduler.queue_depth(),
+                # 出队时丢弃的任务：调用方已取消 / 已过截止时间
+                "cancelled": tts_scheduler.stats["cancelled"],
+                "expired": tts_scheduler.stats["expired"],
+                "disconnects": disconnect_watcher.stats["disconnects"],
+                **admission.snapshot()
+            },
+            "replicas": tts_model.snapshot() if isinstance(tts_model, ReplicaPool) else None,
+            "reload": dict(reload_status),
+            "draining": drainer.draining,
+            "active_requests": drainer.active
+        }), 500 if phase == 'failed' else 200
     except Exception as e:
         logger.error(f"健康检查失败: {str(e)}")
         return jsonify({
@@ -104,6 +887,18 @@ def health_check():
             "error": str(e)
         }), 500
 
+@app.route('/ready', methods=['GET'])
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """就绪检查：模型加载并预热完成后返回 200，否则 503，供编排系统决定是否转发流量；退出排空期间返回 503"""
+    snapshot = model_status.snapshot()
+    ready = tts_model is not None and model_status.ready and not drainer.draining
+    return jsonify({
+        "ready": ready,
+        "draining": drainer.draining,
+        **snapshot
+    }), 200 if ready else 503
+
 @app.route('/models', methods=['GET'])
 @app.route('/api/models', methods=['GET'])
 def get_models():
@@ -115,11 +910,16 @@ def get_models():
             }), 503
         
         return jsonify({
-            "model_dir": CHECKPOINT_PATH,
-            "config_path": CONFIG_PATH,
-            "device": DEVICE,
-            "use_fp16": USE_FP16,
-            "use_cuda_kernel": USE_CUDA_KERNEL
+            "model_dir": MODEL_KWARGS['model_dir'],
+            "config_path": MODEL_KWARGS['cfg_path'],
+            "device": MODEL_KWARGS['device'],
+            "use_fp16": MODEL_KWARGS['use_fp16'],
+            "use_cuda_kernel": MODEL_KWARGS['use_cuda_kernel'],
+            "load_seconds": model_status.load_seconds,
+            "warmup_seconds": model_status.warmup_seconds,
+            "replicas": len(tts_model.replicas) if isinstance(tts_model, ReplicaPool) else 0,
+            "generation": model_slot.generation,
+            "reload": dict(reload_status)
         }), 200
     except Exception as e:
         logger.error(f"获取模型信息失败: {str(e)}")
@@ -127,12 +927,123 @@ def get_models():
             "error": str(e)
         }), 500
 
+
+def _admin_error(headers, remote_addr, local=False):
+    """
+    管理权限校验：配置了 ADMIN_TOKEN 时校验 X-Admin-Token 或 Authorization: Bearer，
+    未配置时只允许本机访问（回环地址，或 local 为 True：经本机 Unix 套接字到达）；
+    通过返回 None，否则返回 (错误信息, 状态码)
+    """
+    token = ADMIN_CONFIG['token']
+    if not token:
+        if local or remote_addr in ('127.0.0.1', '::1'):
+            return None
+        return "未配置 ADMIN_TOKEN，管理接口只允许本机访问", 403
+    provided = headers.get('X-Admin-Token', '')
+    auth = headers.get('Authorization', '')
+    if not provided and auth.lower().startswith('bearer '):
+        provided = auth[7:].strip()
+    if not hmac.compare_digest(provided.encode('utf-8'), token.encode('utf-8')):
+        return "管理令牌无效", 401
+    return None
+
+
+def _check_admin():
+    """管理接口鉴权：通过返回 None，否则返回错误响应"""
+    error = _admin_error(request.headers, request.remote_addr, _unix_socket_request())
+    if error is None:
+        return None
+    message, status = error
+    return jsonify({"status": "error", "error": message}), status
+
+
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_model():
+    """
+    热重载模型：后台加载新实例并预热，成功后原子切换，旧实例在在途推理结束后释放
+    请求体可选字段：checkpoint_path、config_path、use_fp16、use_cuda_kernel、use_deepspeed、device、purge_cache
+    """
+    denied = _check_admin()
+    if denied is not None:
+        return denied
+    if tts_model is None:
+        return jsonify({"status": "error", "error": "模型未加载，请稍后重试"}), 503
+    
+    data = request.get_json(silent=True) or {}
+    overrides = {}
+    for field, key in RELOAD_FIELDS.items():
+        if data.get(field) is None:
+            continue
+        value = data[field]
+        overrides[key] = _parse_bool(value) if key.startswith('use_') else str(value)
+    purge_cache = _parse_bool(data['purge_cache']) if data.get('purge_cache') is not None else None
+    
+    for key in ('model_dir', 'cfg_path'):
+        if key in overrides and not os.path.exists(overrides[key]):
+            return jsonify({"status": "error", "error": f"路径不存在: {overrides[key]}"}), 400
+    
+    if not start_reload(overrides, purge_cache=purge_cache):
+        return jsonify({"status": "error", "error": "已有热重载在进行中", "reload": dict(reload_status)}), 409
+    return jsonify({"status": "accepted", "reload": dict(reload_status)}), 202
+
+
+@app.route('/api/admin/reload', methods=['GET'])
+def get_reload_status():
+    """查看最近一次热重载的进度"""
+    denied = _check_admin()
+    if denied is not None:
+        return denied
+    return jsonify({"reload": dict(reload_status), "generation": model_slot.generation}), 200
+
+
+@app.route('/api/debug/profiles', methods=['GET'])
+def list_profiles():
+    """最近保存的请求剖析（新的在前）"""
+    denied = _check_admin()
+    if denied is not None:
+        return denied
+    return jsonify({"profiles": profile_store.list(), **profile_store.snapshot()}), 200
+
+
+@app.route('/api/debug/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """单个剖析的概要：请求信息、耗时、累计耗时最高的函数和结果文件列表"""
+    denied = _check_admin()
+    if denied is not None:
+        return denied
+    meta = profile_store.get(profile_id)
+    if meta is None:
+        return jsonify({"status": "error", "error": "剖析不存在或已被淘汰"}), 404
+    return jsonify({
+        **meta,
+        "links": {name: f"/api/debug/profiles/{profile_id}/{name}" for name in meta.get("artifacts", [])}
+    }), 200
+
+
+@app.route('/api/debug/profiles/<profile_id>/<artifact>', methods=['GET'])
+def get_profile_artifact(profile_id, artifact):
+    """下载剖析结果文件：stacks.folded / profile.prof / profile.txt / torch_trace.json"""
+    denied = _check_admin()
+    if denied is not None:
+        return denied
+    path = profile_store.artifact(profile_id, artifact)
+    if path is None:
+        return jsonify({"status": "error", "error": "剖析结果文件不存在"}), 404
+    return send_file(str(path), mimetype=PROFILE_ARTIFACTS[artifact], download_name=f"{profile_id[:12]}-{artifact}")
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 指标"""
+    body, content_type = tts_metrics.render()
+    return Response(body, content_type=content_type)
+
 @app.route('/tts', methods=['POST'])
 @app.route('/api/tts', methods=['POST'])
 def generate_tts():
     """文本转语音接口（兼容官方 API）"""
     try:
-        data = request.get_json()
+        with stage('parse'):
+            data, uploads = _parse_tts_request()
         
         if not data:
             return jsonify({
@@ -140,129 +1051,471 @@ def generate_tts():
                 "error": "请求体不能为空"
             }), 400
         
-        # 必需参数
-        if 'text' not in data:
+        # 检查模型是否已加载
+        if tts_model is None:
+            return jsonify({
+                "status": "error",
+                "error": "模型未加载，请稍后重试"
+            }), 503
+        
+        response_mode = _response_mode(data, request.headers.get('Accept', ''))
+        if response_mode is None:
+            return jsonify({
+                "status": "error",
+                "error": f"无效的 response_mode，可选值: {', '.join(RESPONSE_MODES)}"
+            }), 400
+        if response_mode == 'shm' and not _local_request():
             return jsonify({
                 "status": "error",
-                "error": "缺少必需参数: text"
+                "error": SHM_REMOTE_ERROR
             }), 400
         
-        text = data.get('text', '').strip()
-        if not text:
+        # 上传的音频按内容哈希存入 prompt_store，请求结束时释放占用
+        spec = _parse_tts_spec(data, uploads, _request_prompt_scope())
+        output_format = spec["output_format"]
+        
+        # 命中缓存的请求几乎不占资源，不参与准入
+        if not _is_cached(spec):
+            _admit(_admission_cost(spec))
+        
+        # 流式输出：按句切分，逐句合成逐句发送
+        stream_mode = _stream_mode(data, request.headers.get('Accept', ''))
+        if stream_mode:
+            return _stream_tts_response(stream_mode, spec, g.cancellation)
+        
+        result = synthesize(**spec, cancellation=g.cancellation, pins=_request_result_pins())
+        payload = _result_payload(result, spec)
+        
+        if response_mode == 'binary':
+            # 直接从磁盘流式发送音频，元数据放在响应头
+            response = send_file(
+                result["path"],
+                mimetype=AUDIO_MIMETYPES.get(output_format, 'audio/wav'),
+                as_attachment=False,
+                download_name=payload["filename"]
+            )
+            response.headers['X-Audio-Duration'] = str(payload["duration"])
+            response.headers['X-Cache-Key'] = result["cache_key"]
+            response.headers['X-Cache'] = 'HIT' if result["cached"] else 'MISS'
+            return response
+        
+        if response_mode == 'url':
+            # 只返回下载地址，音频通过 /api/audio/<filename> 获取
+            return jsonify({
+                "status": "success",
+                **payload
+            }), 200
+        
+        if response_mode == 'shm':
+            # 同机调用方直接读取共享内存中的文件；交接区已满时改为内嵌 base64
+            handoff = _handoff(result)
+            if handoff is not None:
+                return jsonify({
+                    "status": "success",
+                    "shm": handoff,
+                    **payload
+                }), 200
+        
+        # 兼容旧客户端：读取生成的音频文件并转换为 base64
+        audio_base64 = _read_base64(result["path"])
+        
+        return jsonify({
+            "status": "success",
+            "audio": f"data:audio/{output_format};base64,{audio_base64}",
+            **payload
+        }), 200
+        
+    except TTSRequestError as e:
+        return jsonify({
+            "status": "error",
+            "error": str(e)
+        }), e.status
+    except (PromptTooLarge, RequestEntityTooLarge):
+        return request_too_large(None)
+    except Overloaded as e:
+        return _overloaded_response(e)
+    except RequestCancelled as e:
+        return _cancelled_response(e)
+    except Exception as e:
+        logger.error(f"生成语音失败: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            "status": "error",
+            "error": str(e)
+        }), 500
+
+@app.route('/api/tts/batch', methods=['POST'])
+def generate_tts_batch():
+    """
+    批量文本转语音
+    共享的参考音频只解析一次，所有条目同时提交给调度器，同音色的条目会被合并成批
+    """
+    try:
+        with stage('parse'):
+            data, uploads = _parse_tts_request()
+        
+        if not data:
             return jsonify({
                 "status": "error",
-                "error": "文本不能为空"
+                "error": "请求体不能为空"
             }), 400
         
-        # 检查模型是否已加载
         if tts_model is None:
             return jsonify({
                 "status": "error",
                 "error": "模型未加载，请稍后重试"
             }), 503
         
-        # 处理音色参考音频（spk_audio_prompt）
-        spk_audio_prompt = None
-        if 'spk_audio_prompt' in data:
-            spk_audio = data['spk_audio_prompt']
-            # 如果是 base64 编码，先解码保存为临时文件
-            if isinstance(spk_audio, str) and spk_audio.startswith('data:audio'):
-                # base64 编码的音频
-                audio_data = spk_audio.split(',')[1] if ',' in spk_audio else spk_audio
-                audio_bytes = base64.b64decode(audio_data)
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
-                    tmp_file.write(audio_bytes)
-                    spk_audio_prompt = tmp_file.name
-            elif isinstance(spk_audio, str) and (spk_audio.startswith('http://') or spk_audio.startswith('https://')):
-                # URL，直接使用
-                spk_audio_prompt = spk_audio
-            elif isinstance(spk_audio, str) and os.path.exists(spk_audio):
-                # 本地文件路径
-                spk_audio_prompt = spk_audio
-            else:
+        items = data.get('items')
+        if isinstance(items, str):
+            # multipart 请求中 items 以 JSON 字符串传递
+            try:
+                items = json.loads(items)
+            except ValueError:
                 return jsonify({
                     "status": "error",
-                    "error": "无效的 spk_audio_prompt 格式"
+                    "error": "无效的参数: items 不是合法的 JSON 数组"
                 }), 400
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                "status": "error",
+                "error": "缺少必需参数: items"
+            }), 400
+        if len(items) > BATCH_CONFIG['max_items']:
+            return jsonify({
+                "status": "error",
+                "error": f"单次最多 {BATCH_CONFIG['max_items']} 条"
+            }), 400
         
-        # 处理情感参考音频（emo_audio_prompt，可选）
-        emo_audio_prompt = None
-        if 'emo_audio_prompt' in data:
-            emo_audio = data['emo_audio_prompt']
-            if isinstance(emo_audio, str) and emo_audio.startswith('data:audio'):
-                audio_data = emo_audio.split(',')[1] if ',' in emo_audio else emo_audio
-                audio_bytes = base64.b64decode(audio_data)
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp_file:
-                    tmp_file.write(audio_bytes)
-                    emo_audio_prompt = tmp_file.name
-            elif isinstance(emo_audio, str) and (emo_audio.startswith('http://') or emo_audio.startswith('https://')):
-                emo_audio_prompt = emo_audio
-            elif isinstance(emo_audio, str) and os.path.exists(emo_audio):
-                emo_audio_prompt = emo_audio
-        
-        # 可选参数
-        output_format = data.get('output_format', 'wav')  # wav 或 mp3
-        emo_alpha = float(data.get('emo_alpha', 0.7))  # 情感强度 0.0~1.0
-        temperature = float(data.get('temperature', 0.3))  # 采样随机性 0.0~1.0
-        top_p = float(data.get('top_p', 0.7))  # 核采样阈值 0.0~1.0
-        top_k = int(data.get('top_k', 20))  # 仅考虑概率最高的k个token
-        num_beams = int(data.get('num_beams', 3))  # 束搜索宽度
-        repetition_penalty = float(data.get('repetition_penalty', 1.2))  # 重复惩罚
-        length_penalty = float(data.get('length_penalty', 1.0))  # 长度惩罚
-        verbose = data.get('verbose', False)
-        
-        logger.info(f"生成语音请求: text={text[:50]}..., spk_audio={bool(spk_audio_prompt)}, emo_audio={bool(emo_audio_prompt)}")
-        
-        # 生成输出文件路径
-        import hashlib
-        text_hash = hashlib.md5(text.encode()).hexdigest()[:8]
-        output_filename = f"tts_{text_hash}.{output_format}"
-        output_path = os.path.join(OUTPUT_PATH, output_filename)
-        
-        # 调用 IndexTTS2 生成语音
-        tts_model.infer(
-            spk_audio_prompt=spk_audio_prompt,
-            text=text,
-            output_path=output_path,
-            emo_audio_prompt=emo_audio_prompt,
-            emo_alpha=emo_alpha,
-            temperature=temperature,
-            top_p=top_p,
-            top_k=top_k,
-            num_beams=num_beams,
-            repetition_penalty=repetition_penalty,
-            length_penalty=length_penalty,
-            verbose=verbose
-        )
+        embed_audio = data.get('response_mode', 'url') == 'base64'
         
-        # 读取生成的音频文件并转换为 base64
-        with open(output_path, 'rb') as f:
-            audio_bytes = f.read()
-            audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
+        # 共享参考音频只解码/保存一次，各条目复用同一路径和内容标识
+        prompt_scope = _request_prompt_scope()
+        shared = {key: value for key, value in data.items() if key not in ('items', 'stream', 'response_mode')}
+        resolved_prompts = {}
+        for field in ('spk_audio_prompt', 'emo_audio_prompt'):
+            if field in shared or field in uploads:
+                resolved = _resolve_prompt(shared.pop(field, None), uploads.get(field), prompt_scope)
+                if resolved is None and field == 'spk_audio_prompt':
+                    raise TTSRequestError("无效的 spk_audio_prompt 格式")
+                if resolved is not None:
+                    resolved_prompts[field] = resolved
         
-        # 获取音频时长（简单估算，实际应该解析音频文件）
-        # 这里使用文本长度估算，实际应该使用 librosa 或 soundfile 解析
-        estimated_duration = len(text) * 0.1  # 粗略估算
+        logger.info(f"批量合成请求: {len(items)} 条, 共享音色={'spk_audio_prompt' in resolved_prompts}")
         
-        # 清理临时文件
-        if spk_audio_prompt and os.path.exists(spk_audio_prompt) and spk_audio_prompt.startswith('/tmp'):
-            try:
-                os.unlink(spk_audio_prompt)
-            except:
-                pass
-        if emo_audio_prompt and os.path.exists(emo_audio_prompt) and emo_audio_prompt.startswith('/tmp'):
+        # 整批按总工作量准入，要么全部接受，要么整批返回 429
+        cost = 0
+        for item in items:
+            fields = {**shared, **item} if isinstance(item, dict) else {**shared, "text": item}
+            cost += estimate_cost(str(fields.get('text', '')), fields.get('num_beams', 3))
+        _admit(cost)
+        cancellation = g.cancellation
+        pins = _request_result_pins()
+        
+        def run_item(index, item):
+            entry = {"index": index}
+            if isinstance(item, dict) and 'id' in item:
+                entry["id"] = item['id']
             try:
-                os.unlink(emo_audio_prompt)
-            except:
-                pass
+                if isinstance(item, str):
+                    item = {"text": item}
+                spec = _parse_tts_spec({**shared, **item}, {}, prompt_scope, resolved_prompts)
+                result = synthesize(**spec, cancellation=cancellation, pins=pins)
+                entry.update({"status": "success", **_result_payload(result, spec)})
+                if embed_audio:
+                    audio_base64 = _read_base64(result["path"])
+                    entry["audio"] = f"data:audio/{spec['output_format']};base64,{audio_base64}"
+            except Exception as e:
+                entry.update({"status": "error", "error": str(e)})
+            return entry
+        
+        # 所有条目同时进入调度队列
+        futures = [
+            batch_executor.submit(request_profiler.wrap(tts_tracing.wrap(run_item)), index, item)
+            for index, item in enumerate(items)
+        ]
+        
+        if _parse_bool(data.get('stream', False)):
+            # NDJSON：每完成一条输出一行
+            def generate_ndjson():
+                for future in as_completed(futures):
+                    yield json.dumps(future.result(), ensure_ascii=False) + "\n"
+            
+            return Response(
+                stream_with_context(generate_ndjson()),
+                mimetype='application/x-ndjson',
+                headers=STREAM_HEADERS
+            )
         
+        results = [future.result() for future in futures]
+        succeeded = sum(1 for entry in results if entry["status"] == "success")
         return jsonify({
             "status": "success",
-            "audio": f"data:audio/{output_format};base64,{audio_base64}",
-            "duration": estimated_duration,
-            "format": output_format
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results
         }), 200
         
+    except TTSRequestError as e:
+        return jsonify({
+            "status": "error",
+            "error": str(e)
+        }), e.status
+    except (PromptTooLarge, RequestEntityTooLarge):
+        return request_too_large(None)
+    except Overloaded as e:
+        return _overloaded_response(e)
+    except RequestCancelled as e:
+        return _cancelled_response(e)
+    except Exception as e:
+        logger.error(f"批量生成语音失败: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            "status": "error",
+            "error": str(e)
+        }), 500
+
+@app.route('/api/tts/jobs', methods=['POST'])
+def create_tts_job():
+    """提交异步 TTS 任务，立即返回任务 ID"""
+    try:
+        with stage('parse'):
+            data, uploads = _parse_tts_request()
+        
+        if not data:
+            return jsonify({
+                "status": "error",
+                "error": "请求体不能为空"
+            }), 400
+        
+        if tts_model is None:
+            return jsonify({
+                "status": "error",
+                "error": "模型未加载，请稍后重试"
+            }), 503
+        
+        webhook_url = data.get('webhook_url')
+        if webhook_url:
+            # 只允许白名单主机或公网地址，防止借回调访问内网服务
+            try:
+                tts_jobs.check_webhook(str(webhook_url))
+            except WebhookRejected as e:
+                return jsonify({
+                    "status": "error",
+                    "error": str(e)
+                }), 400
+        
+        # 任务持有自己的参考音频作用域，任务结束后才释放
+        prompt_scope = PromptScope(prompt_store)
+        try:
+            spec = _parse_tts_spec(data, uploads, prompt_scope)
+            job = tts_jobs.submit(
+                tts_tracing.wrap(lambda job: _run_tts_job(job, spec)),
+                webhook_url=webhook_url,
+                on_finish=prompt_scope.close
+            )
+        except BaseException:
+            prompt_scope.close()
+            raise
+        
+        logger.info(f"已提交异步任务: {job.id}")
+        return jsonify({
+            **job.to_dict(),
+            "status_url": f"/api/tts/jobs/{job.id}"
+        }), 202
+        
+    except TTSRequestError as e:
+        return jsonify({
+            "status": "error",
+            "error": str(e)
+        }), e.status
+    except (PromptTooLarge, RequestEntityTooLarge):
+        return request_too_large(None)
+    except JobQueueFull as e:
+        return jsonify({
+            "status": "error",
+            "error": str(e)
+        }), 429
+    except Exception as e:
+        logger.error(f"提交异步任务失败: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            "status": "error",
+            "error": str(e)
+        }), 500
+
+@app.route('/api/tts/jobs/<job_id>', methods=['GET'])
+def get_tts_job(job_id):
+    """查询异步任务状态"""
+    job = tts_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            "status": "error",
+            "error": "任务不存在或已过期"
+        }), 404
+    return jsonify(job.to_dict()), 200
+
+
+@app.route('/api/voices', methods=['GET'])
+def list_voices():
+    """已注册的音色列表"""
+    return jsonify({
+        "status": "success",
+        "voices": voice_registry.list()
+    }), 200
+
+@app.route('/api/voices', methods=['POST'])
+def create_voice():
+    """
+    注册音色：参考音频（spk_audio_prompt / reference_audio，支持上传、base64、URL）处理后保存，
+    模型已就绪时立即计算条件张量，否则在模型加载完成后补算
+    """
+    try:
+        data, uploads = _parse_tts_request()
+        data = data or {}
+        value = data.get('spk_audio_prompt', data.get('reference_audio'))
+        resolved = _resolve_prompt(value, uploads.get('spk_audio_prompt'), _request_prompt_scope())
+        if resolved is None:
+            return jsonify({
+                "status": "error",
+                "error": "缺少或无效的参考音频: spk_audio_prompt"
+            }), 400
+        
+        voice = voice_registry.create(
+            resolved[0],
+            name=data.get('name'),
+            description=data.get('description'),
+            voice_id=data.get('voice_id') or None
+        )
+        if tts_model is not None:
+            try:
+                precompute_voice(voice["id"])
+            except Exception as e:
+                # 条件计算失败不影响使用，合成时按参考音频现算
+                logger.warning(f"计算音色条件失败: {voice['id']}, {str(e)}")
+        
+        return jsonify({
+            "status": "success",
+            "voice": voice_registry.describe(voice["id"])
+        }), 201
+        
+    except VoiceExists as e:
+        return jsonify({
+            "status": "error",
+            "error": str(e)
+        }), 409
+    except VoiceError as e:
+        return jsonify({
+            "status": "error",
+            "error": str(e)
+        }), 400
+    except TTSRequestError as e:
+        return jsonify({
+            "status": "error",
+            "error": str(e)
+        }), e.status
+    except (PromptTooLarge, RequestEntityTooLarge):
+        return request_too_large(None)
+    except Exception as e:
+        logger.error(f"注册音色失败: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            "status": "error",
+            "error": str(e)
+        }), 500
+
+@app.route('/api/voices/<voice_id>', methods=['GET'])
+def get_voice(voice_id):
+    """查看音色信息"""
+    voice = voice_registry.describe(voice_id)
+    if voice is None:
+        return jsonify({
+            "status": "error",
+            "error": f"音色不存在: {voice_id}"
+        }), 404
+    return jsonify({
+        "status": "success",
+        "voice": voice
+    }), 200
+
+@app.route('/api/voices/<voice_id>', methods=['DELETE'])
+def delete_voice(voice_id):
+    """删除音色"""
+    prompt = voice_registry.delete(voice_id)
+    if prompt is None:
+        return jsonify({
+            "status": "error",
+            "error": f"音色不存在: {voice_id}"
+        }), 404
+    if tts_model is not None and not isinstance(tts_model, ReplicaPool):
+        # 副本进程的缓存无法从这里清理，参考音频按内容命名，重新注册同名音色时路径不同，不会误用
+        forget_prompt(tts_model, prompt)
+    return jsonify({
+        "status": "success",
+        "id": voice_id
+    }), 200
+
+@app.route('/api/tts/generate', methods=['POST'])
+def generate_speech():
+    """
+    按 voice_id 合成（Node 后端 indexTtsService 使用的接口）
+    注册音色直接使用预计算的条件，不再处理参考音频；默认只返回音频地址
+    """
+    try:
+        with stage('parse'):
+            data = request.get_json(silent=True)
+        
+        if not data:
+            return jsonify({
+                "status": "error",
+                "error": "请求体不能为空"
+            }), 400
+        
+        if tts_model is None:
+            return jsonify({
+                "status": "error",
+                "error": "模型未加载，请稍后重试"
+            }), 503
+        
+        if data.get('response_mode') == 'shm' and not _local_request():
+            return jsonify({
+                "status": "error",
+                "error": SHM_REMOTE_ERROR
+            }), 400
+        
+        spec = _parse_tts_spec(_generate_fields(data), {}, _request_prompt_scope())
+        if spec["spk_audio_prompt"] is None:
+            return jsonify({
+                "status": "error",
+                "error": "缺少音色: voice_id 或 reference_audio"
+            }), 400
+        
+        if not _is_cached(spec):
+            _admit(_admission_cost(spec))
+        
+        result = synthesize(**spec, cancellation=g.cancellation, pins=_request_result_pins())
+        payload = {"success": True, "status": "success", **_result_payload(result, spec)}
+        if data.get('response_mode') == 'base64':
+            payload["audio_data"] = f"data:audio/{spec['output_format']};base64,{_read_base64(result['path'])}"
+        elif data.get('response_mode') == 'shm':
+            # 交接区已满时只返回 audio_url
+            handoff = _handoff(result)
+            if handoff is not None:
+                payload["shm"] = handoff
+        return jsonify(payload), 200
+        
+    except TTSRequestError as e:
+        return jsonify({
+            "status": "error",
+            "error": str(e)
+        }), e.status
+    except (PromptTooLarge, RequestEntityTooLarge):
+        return request_too_large(None)
+    except Overloaded as e:
+        return _overloaded_response(e)
+    except RequestCancelled as e:
+        return _cancelled_response(e)
     except Exception as e:
         logger.error(f"生成语音失败: {str(e)}")
         logger.error(traceback.format_exc())
@@ -271,6 +1524,735 @@ def generate_tts():
             "error": str(e)
         }), 500
 
+
+def _generate_fields(data):
+    """
+    /api/tts/generate 的字段（Node 后端命名）转换为 /api/tts 的字段
+    - reference_audio 优先于 voice_id
+    - emotion_control_method: 1=情感参考音频, 2=情感向量, 3=情感描述文本
+    - speed / pitch 模型不支持，忽略
+    """
+    fields = {key: value for key, value in data.items() if key in (
+        'text', 'voice_id', 'temperature', 'top_p', 'top_k', 'num_beams', 'repetition_penalty',
+        'length_penalty', 'sample_rate', 'loudness', 'bitrate', 'verbose',
+    )}
+    fields['output_format'] = data.get('format', data.get('output_format', 'wav'))
+    if data.get('reference_audio'):
+        fields['spk_audio_prompt'] = data['reference_audio']
+    method = data.get('emotion_control_method')
+    if method is not None:
+        method = int(method)
+        if method == 1 and data.get('emotion_reference_audio'):
+            fields['emo_audio_prompt'] = data['emotion_reference_audio']
+        elif method == 2 and data.get('emotion_vectors') is not None:
+            fields['emo_vector'] = data['emotion_vectors']
+            fields['use_random'] = data.get('emotion_random', False)
+        elif method == 3 and data.get('emotion_text') is not None:
+            fields['emo_text'] = data['emotion_text']
+        if method in (1, 2, 3) and data.get('emotion_weight') is not None:
+            fields['emo_alpha'] = data['emotion_weight']
+    return fields
+
+def _run_tts_job(job, spec):
+    """在任务线程中执行合成，长文本按分段完成数汇报进度"""
+    # 超过 JOB_TIMEOUT 后排队中的分段不再合成
+    cancellation = Cancellation.after(JOB_CONFIG['timeout'])
+    result = synthesize(**spec, timeout=JOB_CONFIG['timeout'], progress=job.set_progress, cancellation=cancellation)
+    return _result_payload(result, spec)
+
+
+def _result_payload(result, spec):
+    """合成结果的元数据（不含音频内容）"""
+    output_filename = os.path.basename(result["path"])
+    return {
+        "audio_url": f"/api/audio/{output_filename}",
+        "filename": output_filename,
+        "duration": result["duration"],  # 按采样点数计算的精确时长（秒）
+        "sample_rate": result["sample_rate"],
+        "format": spec["output_format"],
+        "cache_key": result["cache_key"],
+        "cached": result["cached"],
+        "coalesced": result["coalesced"],
+        # 增量模式：总句数和取自缓存的句数
+        **({key: result[key] for key in ('sentences', 'sentences_reused') if key in result})
+    }
+
+
+class TTSRequest(Request):
+    """multipart 上传的文件写入有上限的内存 spool，而不是 Werkzeug 默认的磁盘临时文件"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=PROMPT_CONFIG['spool_max_bytes'])
+
+
+app.request_class = TTSRequest
+app.config['MAX_CONTENT_LENGTH'] = PROMPT_CONFIG['upload_max_bytes']
+
+# 上传参考音频的扩展名（决定解码方式）
+PROMPT_SUFFIXES = {
+    'audio/wav': '.wav',
+    'audio/x-wav': '.wav',
+    'audio/wave': '.wav',
+    'audio/mpeg': '.mp3',
+    'audio/mp3': '.mp3',
+    'audio/flac': '.flac',
+    'audio/ogg': '.ogg',
+    'audio/mp4': '.m4a',
+}
+
+
+class TTSRequestError(Exception):
+    """请求参数错误，携带返回的 HTTP 状态码"""
+    
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _parse_tts_spec(data, uploads, prompt_scope, resolved_prompts=None):
+    """
+    校验请求参数并解析参考音频，返回可直接传给 synthesize() 的参数 dict
+    resolved_prompts 为已解析好的参考音频 {字段名: (路径, 内容标识)}，data 中未指定时使用
+    参数无效时抛出 TTSRequestError
+    """
+    resolved_prompts = resolved_prompts or {}
+    
+    # 必需参数
+    if 'text' not in data:
+        raise TTSRequestError("缺少必需参数: text")
+    
+    text = (data.get('text') or '').strip()
+    if not text:
+        raise TTSRequestError("文本不能为空")
+    
+    # 处理音色参考音频（spk_audio_prompt），其次是注册音色（voice_id）
+    spk_audio_prompt, spk_audio_id = resolved_prompts.get('spk_audio_prompt', (None, None))
+    voice = None
+    if 'spk_audio_prompt' in data or 'spk_audio_prompt' in uploads:
+        resolved = _resolve_prompt(data.get('spk_audio_prompt'), uploads.get('spk_audio_prompt'), prompt_scope)
+        if resolved is None:
+            raise TTSRequestError("无效的 spk_audio_prompt 格式")
+        spk_audio_prompt, spk_audio_id = resolved
+    elif data.get('voice_id'):
+        spk_audio_prompt, spk_audio_id, voice = _resolve_voice(str(data['voice_id']))
+    
+    # 处理情感参考音频（emo_audio_prompt，可选）
+    emo_audio_prompt, emo_audio_id = resolved_prompts.get('emo_audio_prompt', (None, None))
+    if 'emo_audio_prompt' in data or 'emo_audio_prompt' in uploads:
+        resolved = _resolve_prompt(data.get('emo_audio_prompt'), uploads.get('emo_audio_prompt'), prompt_scope)
+        if resolved is not None:
+            emo_audio_prompt, emo_audio_id = resolved
+    
+    # 可选参数
+    output_format = str(data.get('output_format', 'wav')).lower()  # wav / mp3 / ogg / opus
+    if output_format not in SUPPORTED_FORMATS:
+        raise TTSRequestError(f"不支持的 output_format，可选值: {', '.join(SUPPORTED_FORMATS)}")
+    audio_params = _parse_audio_params(data)
+    sampling_params = {
+        "emo_alpha": float(data.get('emo_alpha', 0.7)),  # 情感强度 0.0~1.0
+        "temperature": float(data.get('temperature', 0.3)),  # 采样随机性 0.0~1.0
+        "top_p": float(data.get('top_p', 0.7)),  # 核采样阈值 0.0~1.0
+        "top_k": int(data.get('top_k', 20)),  # 仅考虑概率最高的k个token
+        "num_beams": int(data.get('num_beams', 3)),  # 束搜索宽度
+        "repetition_penalty": float(data.get('repetition_penalty', 1.2)),  # 重复惩罚
+        "length_penalty": float(data.get('length_penalty', 1.0)),  # 长度惩罚
+    }
+    # 情感向量 / 情感描述文本，只在指定时加入（不影响已有请求的缓存键）
+    sampling_params.update(_parse_emotion_params(data))
+    verbose = _parse_bool(data.get('verbose', False))
+    incremental = _parse_bool(data.get('incremental', False))
+    
+    logger.info(f"生成语音请求: text={text[:50]}..., spk_audio={bool(spk_audio_prompt)}, emo_audio={bool(emo_audio_prompt)}")
+    
+    return {
+        "text": text,
+        "spk_audio_prompt": spk_audio_prompt,
+        "spk_audio_id": spk_audio_id,
+        "emo_audio_prompt": emo_audio_prompt,
+        "emo_audio_id": emo_audio_id,
+        "sampling_params": sampling_params,
+        "output_format": output_format,
+        "audio_params": audio_params,
+        "voice": voice,
+        "verbose": verbose,
+        "incremental": incremental,
+    }
+
+
+def _resolve_voice(voice_id):
+    """注册音色 -> (参考音频路径, 内容标识, 推理参数)，不存在时抛出 404"""
+    if voice_id == 'default' and VOICE_CONFIG['default_voice']:
+        voice_id = VOICE_CONFIG['default_voice']
+    voice_spec = voice_registry.infer_spec(voice_id)
+    if voice_spec is None:
+        raise TTSRequestError(f"音色不存在: {voice_id}", 404)
+    return voice_spec
+
+
+def _parse_emotion_params(data):
+    """
+    IndexTTS2 的其他情感控制方式
+    - emo_vector: 8 个情绪强度 [喜, 怒, 哀, 惧, 厌恶, 低落, 惊喜, 平静]
+    - emo_text: 情感描述文本，由模型推断情绪
+    - use_random: 情感随机采样
+    """
+    params = {}
+    try:
+        emo_vector = data.get('emo_vector')
+        if isinstance(emo_vector, str) and emo_vector:
+            # multipart / 查询字符串中以 JSON 字符串传递
+            emo_vector = json.loads(emo_vector)
+        if emo_vector is not None and emo_vector != '':
+            emo_vector = [float(v) for v in emo_vector]
+            if len(emo_vector) != 8:
+                raise ValueError("emo_vector 需要 8 个数值")
+            params["emo_vector"] = emo_vector
+    except (TypeError, ValueError) as e:
+        raise TTSRequestError(f"无效的 emo_vector: {str(e)}")
+    emo_text = data.get('emo_text')
+    if emo_text is not None:
+        params["use_emo_text"] = True
+        if str(emo_text).strip():
+            # 空字符串表示由合成文本本身推断情绪
+            params["emo_text"] = str(emo_text).strip()
+    if _parse_bool(data.get('use_random', False)):
+        params["use_random"] = True
+    return params
+
+
+def _parse_audio_params(data):
+    """
+    后处理参数，只包含请求中指定的项（未指定的不进入缓存键）
+    - sample_rate: 输出采样率
+    - loudness: 目标响度（dBFS），true 表示使用默认目标
+    - bitrate: 有损格式的码率，如 32k
+    """
+    audio_params = {}
+    try:
+        if data.get('sample_rate') not in (None, ''):
+            sample_rate = int(data['sample_rate'])
+            if not 8000 <= sample_rate <= 48000:
+                raise ValueError("sample_rate 需在 8000~48000 之间")
+            audio_params['sample_rate'] = sample_rate
+        loudness = data.get('loudness')
+        if loudness not in (None, '') and loudness is not False:
+            if loudness is True or str(loudness).lower() == 'true':
+                audio_params['loudness'] = AUDIO_CONFIG['loudness_target_db']
+            elif str(loudness).lower() != 'false':
+                audio_params['loudness'] = float(loudness)
+        bitrate = parse_bitrate(data.get('bitrate'))
+        if bitrate is not None:
+            audio_params['bitrate'] = bitrate
+    except ValueError as e:
+        raise TTSRequestError(f"无效的音频参数: {str(e)}")
+    return audio_params
+
+
+def _parse_tts_request():
+    """
+    解析 TTS 请求，返回 (参数 dict, 上传的参考音频 dict)
+    - application/json：参考音频为 base64 data URL、HTTP URL 或本地路径
+    - multipart/form-data：参数为表单字段，spk_audio_prompt/emo_audio_prompt 为文件字段
+    - audio/* 或 application/octet-stream：请求体即音色参考音频，参数放在查询字符串
+    """
+    mimetype = request.mimetype
+    if mimetype == 'multipart/form-data':
+        uploads = {}
+        for field in ('spk_audio_prompt', 'emo_audio_prompt'):
+            upload = request.files.get(field)
+            if upload is not None:
+                suffix = os.path.splitext(upload.filename or '')[1].lower()
+                uploads[field] = (upload.stream, suffix if suffix in PROMPT_SUFFIXES.values() else '.wav')
+        return request.form.to_dict(), uploads
+    if mimetype.startswith('audio/') or mimetype == 'application/octet-stream':
+        return request.args.to_dict(), {
+            'spk_audio_prompt': (request.stream, PROMPT_SUFFIXES.get(mimetype, '.wav'))
+        }
+    return request.get_json(), {}
+
+
+def _read_base64(path):
+    """读取音频文件并做 base64 编码，分别计入 output_read / encode 阶段"""
+    with stage('output_read'):
+        with open(path, 'rb') as f:
+            audio_bytes = f.read()
+    with stage('encode'):
+        return base64.b64encode(audio_bytes).decode('utf-8')
+
+
+def _parse_bool(value):
+    """表单/查询字符串中的布尔值为字符串"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def _request_prompt_scope():
+    """当前请求的参考音频作用域，请求结束（含流式响应结束）时统一释放"""
+    if 'prompt_scope' not in g:
+        g.prompt_scope = PromptScope(prompt_store)
+    return g.prompt_scope
+
+
+@app.teardown_request
+def _release_prompt_scope(error=None):
+    prompt_scope = g.pop('prompt_scope', None)
+    if prompt_scope is not None:
+        prompt_scope.close()
+
+
+def _request_result_pins():
+    """当前请求 pin 住的结果文件，响应发送完毕（含流式响应）后统一释放"""
+    if 'result_pins' not in g:
+        g.result_pins = CachePins(result_cache)
+    return g.result_pins
+
+
+@app.teardown_request
+def _release_result_pins(error=None):
+    pins = g.pop('result_pins', None)
+    if pins is not None:
+        pins.close()
+
+
+def _is_cached(spec):
+    """结果缓存中是否已有该请求的音频"""
+    if not CACHE_CONFIG['result_cache_enabled']:
+        return False
+    audio_params = dict(spec["audio_params"])
+    if spec["output_format"] == 'wav':
+        audio_params.pop('bitrate', None)
+    _, output_filename = _output_name(
+        spec["text"], spec["spk_audio_id"], spec["emo_audio_id"], spec["sampling_params"],
+        spec["output_format"], audio_params, spec.get("incremental", False)
+    )
+    return output_filename in result_cache
+
+
+def _admission_cost(spec):
+    """请求的准入工作量；增量模式下缓存中已有的句子不计入"""
+    text = spec["text"]
+    if spec.get("incremental") and CACHE_CONFIG['result_cache_enabled']:
+        sentence_spec = {**spec, "output_format": 'wav', "audio_params": {}, "incremental": False}
+        text = ''.join(
+            sentence for sentence in _incremental_units(text)
+            if not _is_cached({**sentence_spec, "text": sentence})
+        )
+    return estimate_cost(text, spec["sampling_params"]["num_beams"])
+
+
+def _admit(cost):
+    """
+    申请准入，容量已满时抛出 Overloaded
+    凭证放在 g 中，请求结束（含流式响应发送完毕）时归还
+    """
+    g.admission_ticket = admission.acquire(cost)
+
+
+@app.teardown_request
+def _release_admission(error=None):
+    ticket = g.pop('admission_ticket', None)
+    if ticket is not None:
+        admission.release(ticket)
+
+
+# 请求剖析开关（值为 1 / true），需要管理令牌
+PROFILE_HEADER = 'X-Profile'
+
+# 剖析覆盖的接口：同步合成接口（异步任务在响应之后才执行，不在剖析范围内）
+PROFILED_ENDPOINTS = {name: label for name, label in METERED_ENDPOINTS.items() if name != 'create_tts_job'}
+
+# 退出排空期间拒绝的接口：合成接口和需要推理的音色注册
+DRAINED_ENDPOINTS = set(METERED_ENDPOINTS) | {'create_voice'}
+
+
+@app.before_request
+def _reject_when_draining():
+    if request.endpoint not in DRAINED_ENDPOINTS:
+        return None
+    if drainer.draining:
+        response = jsonify({"status": "error", "error": "服务正在退出，请重试其他实例", "retry_after": 1})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    drainer.enter()
+    g.drain_tracked = True
+    return None
+
+
+@app.teardown_request
+def _finish_draining(error=None):
+    if g.pop('drain_tracked', False):
+        drainer.exit()
+
+
+def _start_profile(headers, remote_addr, endpoint, path, local=False):
+    """
+    请求带 X-Profile 头时开始显式剖析（需要管理权限），否则按抽样比例决定是否剖析
+    返回 (ProfileSession 或 None, 错误 (信息, 状态码) 或 None)
+    """
+    explicit = _parse_bool(headers.get(PROFILE_HEADER, ''))
+    if explicit:
+        error = _admin_error(headers, remote_addr, local)
+        if error is not None:
+            return None, error
+    return profile_store.start(explicit, endpoint=endpoint, path=path), None
+
+
+@app.before_request
+def _start_request_profile():
+    endpoint = PROFILED_ENDPOINTS.get(request.endpoint)
+    if endpoint is None:
+        return None
+    session, error = _start_profile(request.headers, request.remote_addr, endpoint, request.path, _unix_socket_request())
+    if error is not None:
+        message, status = error
+        return jsonify({"status": "error", "error": message}), status
+    if session is not None:
+        g.profile = session
+        g.profile_previous = session.attach()
+    return None
+
+
+@app.after_request
+def _add_profile_header(response):
+    session = g.get('profile')
+    if session is not None:
+        response.headers['X-Profile-Id'] = session.id
+        g.profile_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def _finish_request_profile(error=None):
+    # 流式响应在发送完毕后才会执行 teardown，剖析覆盖整个流
+    session = g.pop('profile', None)
+    if session is None:
+        return
+    session.detach(g.pop('profile_previous', None))
+    profile_store.finish(session, status=g.pop('profile_status', 500))
+
+
+# 响应中返回本服务所在的 trace，便于按 ID 查找
+TRACE_ID_HEADER = 'X-Trace-Id'
+
+
+def _start_trace(headers, method, route, path):
+    """按 traceparent 请求头（或抽样）为请求创建服务端 span，不记录时返回 None"""
+    return tracer.start_request(
+        headers, f"{method} {route}", **{"http.method": method, "http.route": route, "http.target": path}
+    )
+
+
+def _end_trace(span, status, error=None):
+    span.set_attribute("http.status_code", status)
+    if error is not None:
+        span.set_error(error)
+    elif status >= 500:
+        span.error = f"HTTP {status}"
+    span.end()
+
+
+@app.before_request
+def _start_request_trace():
+    if request.endpoint not in METERED_ENDPOINTS:
+        return None
+    span = _start_trace(request.headers, request.method, request.url_rule.rule, request.path)
+    if span is not None:
+        g.trace_span = span
+        g.trace_previous = tts_tracing.attach(span)
+    return None
+
+
+@app.after_request
+def _start_response_trace(response):
+    span = g.get('trace_span')
+    if span is None:
+        return response
+    response.headers[TRACE_ID_HEADER] = span.trace_id
+    # 响应体在 teardown 之后才由服务器发送（流式响应边合成边发送），发送完毕时结束 span
+    write = span.child('response_write')
+    status = response.status_code
+
+    def finish():
+        write.end()
+        _end_trace(span, status)
+    response.call_on_close(finish)
+    g.trace_handed_off = True
+    return response
+
+
+@app.teardown_request
+def _finish_request_trace(error=None):
+    span = g.pop('trace_span', None)
+    if span is None:
+        return
+    tts_tracing.detach(g.pop('trace_previous', None))
+    if not g.pop('trace_handed_off', False):
+        _end_trace(span, 500, error)
+
+
+def _request_cancellation(headers):
+    """
+    按 X-Request-Timeout / X-Request-Deadline 请求头建立请求的截止时间，未指定或更长时为 TIMEOUT
+    请求头格式错误时抛出 TTSRequestError，已过截止时间时抛出 DeadlineExceeded
+    """
+    try:
+        cancellation = parse_deadline(headers, API_CONFIG['timeout'], API_CONFIG['timeout'])
+    except ValueError:
+        raise TTSRequestError("无效的 X-Request-Timeout / X-Request-Deadline")
+    cancellation.check()
+    return cancellation
+
+
+def _cancelled_response(error):
+    """请求被取消（499）或超过截止时间（504）"""
+    return jsonify({"status": "error", "error": str(error)}), error.status
+
+
+@app.before_request
+def _start_request_deadline():
+    if request.endpoint not in PROFILED_ENDPOINTS:
+        return None
+    try:
+        g.cancellation = _request_cancellation(request.headers)
+    except TTSRequestError as e:
+        return jsonify({"status": "error", "error": str(e)}), e.status
+    except RequestCancelled as e:
+        return _cancelled_response(e)
+    # 开发服务器提供底层连接，可以检测客户端断开；经 ASGI 转交时没有
+    sock = request.environ.get('werkzeug.socket')
+    if sock is not None:
+        disconnect_watcher.watch(sock, g.cancellation)
+        g.watched_socket = sock
+    return None
+
+
+@app.teardown_request
+def _finish_request_deadline(error=None):
+    sock = g.pop('watched_socket', None)
+    if sock is not None:
+        disconnect_watcher.unwatch(sock)
+
+
+@app.before_request
+def _start_request_metrics():
+    endpoint = METERED_ENDPOINTS.get(request.endpoint)
+    if endpoint is not None:
+        g.metrics_endpoint = endpoint
+        g.metrics_started = time.perf_counter()
+        tts_metrics.INFLIGHT_REQUESTS.inc()
+
+
+@app.after_request
+def _record_response_status(response):
+    if 'metrics_endpoint' in g:
+        g.metrics_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def _finish_request_metrics(error=None):
+    # 流式响应在发送完毕后才会执行 teardown，耗时包含整个流
+    endpoint = g.pop('metrics_endpoint', None)
+    if endpoint is None:
+        return
+    tts_metrics.INFLIGHT_REQUESTS.dec()
+    tts_metrics.REQUEST_SECONDS.labels(endpoint=endpoint).observe(time.perf_counter() - g.metrics_started)
+    tts_metrics.REQUESTS.labels(endpoint=endpoint, status=str(g.pop('metrics_status', 500))).inc()
+
+
+def _overloaded_response(error):
+    response = jsonify({
+        "status": "error",
+        "error": str(error),
+        "retry_after": error.retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def _resolve_prompt(value, upload, prompt_scope):
+    """
+    解析参考音频，返回 (传给模型的路径或 URL, 内容标识)；格式无效时返回 None
+    """
+    if upload is not None:
+        stream, suffix = upload
+        with stage('prompt_write'):
+            return prompt_scope.put_stream(stream, suffix=suffix)
+    if isinstance(value, str) and value.startswith('data:audio'):
+        # base64 编码的音频
+        audio_data = value.split(',')[1] if ',' in value else value
+        with stage('prompt_decode'):
+            audio_bytes = base64.b64decode(audio_data)
+        with stage('prompt_write'):
+            return prompt_scope.put_bytes(audio_bytes)
+    if isinstance(value, str) and (value.startswith('http://') or value.startswith('https://')):
+        # URL：下载到本地缓存，内容标识为内容哈希
+        try:
+            with stage('prompt_fetch'):
+                return prompt_scope.fetch(prompt_fetcher, value)
+        except URLRejected as e:
+            raise TTSRequestError(str(e))
+        except PromptFetchError as e:
+            raise TTSRequestError(str(e), 502)
+    if isinstance(value, str) and os.path.exists(value):
+        # 本地文件路径
+        return value, _prompt_identity(value)
+    return None
+
+
+def _response_mode(data, accept=''):
+    """
+    非流式响应的返回方式，优先取请求体中的 response_mode，其次看 Accept 头
+    - binary：直接返回音频字节
+    - url：JSON 中只包含 /api/audio/<filename> 地址和元数据
+    - shm：JSON 中包含共享内存中的文件路径和租约，调用方读完后确认释放（仅限 Unix 套接字连接）
+    - base64：JSON 中内嵌 base64 音频（旧版行为，默认）
+    无效取值返回 None
+    """
+    mode = data.get('response_mode')
+    if mode is not None:
+        return mode if mode in RESPONSE_MODES else None
+    if accept.startswith('audio/') or accept.startswith('application/octet-stream'):
+        return 'binary'
+    return 'base64'
+
+
+def _stream_mode(data, accept=''):
+    """
+    判断是否使用流式输出
+    - Accept: text/event-stream 或 stream="sse"：SSE，每句一个 base64 WAV 帧
+    - stream=true：分块传输的 WAV（PCM16）
+    """
+    stream = data.get('stream', False)
+    if isinstance(stream, str) and stream != 'sse':
+        stream = _parse_bool(stream)
+    if stream == 'sse' or (stream and 'text/event-stream' in accept):
+        return 'sse'
+    if stream:
+        return 'wav'
+    return None
+
+
+def _stream_tts_response(stream_mode, spec, cancellation=None):
+    """逐句合成并流式返回"""
+    body, mimetype = _stream_tts_chunks(stream_mode, spec, cancellation)
+    return Response(stream_with_context(body), mimetype=mimetype, headers=STREAM_HEADERS)
+
+
+def _stream_tts_chunks(stream_mode, spec, cancellation=None):
+    """
+    逐句合成，返回 (分块生成器, MIME 类型)
+    生成器与 Web 框架无关，Flask 和 ASGI 入口共用；请求被取消后不再合成后续句子
+    """
+    sentences = split_sentences(spec["text"])
+    logger.info(f"流式合成: {len(sentences)} 句, 模式={stream_mode}")
+    
+    def synthesize_sentences():
+        for index, sentence in enumerate(sentences):
+            # 每句的文件在发送完之前保持 pin 住
+            with CachePins(result_cache) as pins:
+                result = synthesize(
+                    **{**spec, "text": sentence, "output_format": 'wav', "incremental": False},
+                    cancellation=cancellation, pins=pins
+                )
+                yield index, sentence, result
+    
+    def generate_wav():
+        header_sent = None
+        try:
+            for index, sentence, result in synthesize_sentences():
+                sample_rate, channels, pcm = read_pcm16(result["path"])
+                if header_sent is None:
+                    header_sent = (sample_rate, channels)
+                    yield wav_stream_header(sample_rate, channels)
+                elif header_sent != (sample_rate, channels):
+                    raise RuntimeError(f"第 {index + 1} 句的采样格式与首句不一致")
+                yield pcm
+        except Exception as e:
+            # 响应头已发出，只能记录日志并结束流
+            logger.error(f"流式合成失败: {str(e)}")
+            logger.error(traceback.format_exc())
+    
+    def generate_sse():
+        try:
+            total_duration = 0.0
+            for index, sentence, result in synthesize_sentences():
+                audio_base64 = _read_base64(result["path"])
+                duration = result["duration"]
+                total_duration += duration or 0.0
+                frame = {
+                    "index": index,
+                    "total": len(sentences),
+                    "text": sentence,
+                    "audio": f"data:audio/wav;base64,{audio_base64}",
+                    "duration": duration,
+                    "cached": result["cached"]
+                }
+                yield f"event: audio\ndata: {json.dumps(frame, ensure_ascii=False)}\n\n"
+            done = {"status": "success", "sentences": len(sentences), "duration": total_duration}
+            yield f"event: done\ndata: {json.dumps(done)}\n\n"
+        except Exception as e:
+            logger.error(f"流式合成失败: {str(e)}")
+            logger.error(traceback.format_exc())
+            error = {"status": "error", "error": str(e)}
+            yield f"event: error\ndata: {json.dumps(error, ensure_ascii=False)}\n\n"
+    
+    if stream_mode == 'sse':
+        return generate_sse(), 'text/event-stream'
+    return generate_wav(), 'audio/wav'
+
+SHM_REMOTE_ERROR = "shm 返回方式仅支持经 Unix 套接字（UDS_PATH）的同机连接"
+
+
+def _unix_socket_request():
+    """请求是否经本机 Unix 套接字（UDS_PATH）到达"""
+    return bool(request.environ.get(LOCAL_TRANSPORT_KEY))
+
+
+def _local_request():
+    """请求能否使用 shm 返回方式：经本机 Unix 套接字到达且交接区已启用"""
+    return handoff_store is not None and _unix_socket_request()
+
+
+def _handoff(result):
+    """把结果文件放到共享内存交接区，返回 shm 字段（路径、租约、大小）；交接区已满时返回 None"""
+    try:
+        return handoff_store.put(result["path"])
+    except HandoffFull as e:
+        logger.warning(str(e))
+        return None
+
+
+@app.route('/api/tts/leases/<lease>', methods=['DELETE'])
+def release_lease(lease):
+    """确认已读取 shm 返回的音频，释放共享内存中的文件"""
+    if handoff_store is None or not handoff_store.ack(lease):
+        return jsonify({
+            "status": "error",
+            "error": "租约不存在或已过期"
+        }), 404
+    return '', 204
+
+
+def serve_unix_socket(path):
+    """
+    在 Unix 套接字上提供与 TCP 端口相同的接口（后台线程），同机调用方省去回环 TCP
+    经此连接的请求可以使用 response_mode=shm
+    """
+    if os.path.exists(path):
+        # 上次运行遗留的套接字文件
+        os.unlink(path)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    server = make_server(f"unix://{path}", 0, local_transport(app), threaded=True)
+    # 访问权限由挂载套接字所在目录控制，调用方容器的用户可能不同
+    os.chmod(path, 0o666)
+    threading.Thread(target=server.serve_forever, name="uds-server", daemon=True).start()
+    return server
+
+
 @app.route('/api/audio/<filename>', methods=['GET'])
 def get_audio(filename):
     """获取生成的音频文件"""
@@ -284,12 +2266,7 @@ def get_audio(filename):
         
         # 根据文件扩展名确定 MIME 类型
         ext = filename.split('.')[-1].lower()
-        mimetype_map = {
-            'wav': 'audio/wav',
-            'mp3': 'audio/mpeg',
-            'ogg': 'audio/ogg'
-        }
-        mimetype = mimetype_map.get(ext, 'audio/wav')
+        mimetype = AUDIO_MIMETYPES.get(ext, 'audio/wav')
         
         return send_file(
             str(audio_path),
@@ -310,6 +2287,13 @@ def not_found(error):
         "error": "接口不存在"
     }), 404
 
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({
+        "status": "error",
+        "error": f"请求体超过大小限制 {PROMPT_CONFIG['upload_max_bytes'] // 1024 // 1024}MB"
+    }), 413
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({
@@ -326,14 +2310,17 @@ if __name__ == '__main__':
     logger.info(f"设备: {DEVICE}, FP16: {USE_FP16}")
     logger.info("=" * 50)
     
-    # 加载模型
-    if load_model():
-        logger.info("✅ 服务启动成功")
-        logger.info(f"API 地址: http://0.0.0.0:{PORT}")
-        logger.info(f"健康检查: http://0.0.0.0:{PORT}/health")
-        logger.info(f"TTS 接口: http://0.0.0.0:{PORT}/tts")
-        app.run(host='0.0.0.0', port=PORT, debug=False, threaded=True)
-    else:
-        logger.error("❌ 服务启动失败：模型加载失败")
-        sys.exit(1)
-
+    # 后台加载模型，HTTP 服务立即启动，/health 可以反映加载进度
+    tts_scheduler.start()
+    threading.Thread(target=load_model_in_background, name="model-loader", daemon=True).start()
+    logger.info(f"API 地址: http://0.0.0.0:{PORT}")
+    logger.info(f"健康检查: http://0.0.0.0:{PORT}/health")
+    logger.info(f"就绪检查: http://0.0.0.0:{PORT}/ready")
+    logger.info(f"TTS 接口: http://0.0.0.0:{PORT}/tts")
+    if LOCAL_CONFIG['socket_path']:
+        serve_unix_socket(LOCAL_CONFIG['socket_path'])
+        logger.info(f"Unix 套接字: {LOCAL_CONFIG['socket_path']}（共享内存交接: {LOCAL_CONFIG['handoff_dir']}）")
+    # SIGTERM 排空在途请求后退出，SIGHUP 按当前参数热重载模型
+    signal.signal(signal.SIGTERM, graceful_shutdown)
+    signal.signal(signal.SIGHUP, lambda *_: start_reload())
+    app.run(host='0.0.0.0', port=PORT, debug=False, threaded=True)
@@ -0,0 +1,330 @@
+"""
+IndexTTS2.5 API 服务（ASGI 入口）
+/tts、/api/tts、/api/audio/<filename> 由 Starlette 原生异步处理：请求体和响应体在事件循环中收发，
+参考音频处理和合成等阻塞操作在专用线程池中执行；其余接口转交给 Flask 应用
+启动：python asgi_app.py 或 uvicorn asgi_app:app
+"""
+
+import os
+import json
+import time
+import signal
+import asyncio
+import logging
+import tempfile
+import threading
+import traceback
+import functools
+from pathlib import Path
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.datastructures import UploadFile
+from starlette.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as tts_service
+import tts_metrics
+import tts_tracing
+from config import ASGI_CONFIG, PROMPT_CONFIG, LIFECYCLE_CONFIG
+from admission import Overloaded
+from prompt_store import PromptScope, PromptTooLarge
+from tts_cache import CachePins
+from request_deadline import RequestCancelled
+from tts_metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+# 阻塞操作专用线程池：线程只在解析参考音频和等待合成结果时占用，空闲连接不占线程
+executor = ThreadPoolExecutor(max_workers=ASGI_CONFIG['workers'], thread_name_prefix='asgi-tts')
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """在专用线程池中执行阻塞调用"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+
+async def iterate_blocking(iterator, wrap=None):
+    """逐块在线程池中驱动同步生成器，供 StreamingResponse 使用；wrap 用于把每次调用纳入请求剖析"""
+    done = object()
+    step = wrap(next) if wrap is not None else next
+    while True:
+        chunk = await run_blocking(step, iterator, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+async def _watch_disconnect(request, cancellation, interval=0.5):
+    """客户端断开连接时取消请求，撤回排队中的推理任务"""
+    while not cancellation.cancelled:
+        if await request.is_disconnected():
+            cancellation.cancel()
+            return
+        await asyncio.sleep(interval)
+
+
+def _error(message, status):
+    return JSONResponse({"status": "error", "error": message}, status_code=status)
+
+
+def _too_large():
+    return _error(f"请求体超过大小限制 {PROMPT_CONFIG['upload_max_bytes'] // 1024 // 1024}MB", 413)
+
+
+async def _spool_body(request):
+    """把请求体异步读入有上限的内存 spool，超过上限抛出 PromptTooLarge"""
+    spool = tempfile.SpooledTemporaryFile(max_size=PROMPT_CONFIG['spool_max_bytes'])
+    total = 0
+    try:
+        async for chunk in request.stream():
+            total += len(chunk)
+            if total > PROMPT_CONFIG['upload_max_bytes']:
+                raise PromptTooLarge(f"请求体超过大小限制 {PROMPT_CONFIG['upload_max_bytes'] // 1024 // 1024}MB")
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+async def _parse_request(request, cleanup):
+    """
+    异步读取请求体，返回 (参数 dict, 上传的参考音频 dict)，与 Flask 入口的 _parse_tts_request 对应
+    需要关闭的临时文件登记到 cleanup
+    """
+    content_length = request.headers.get('content-length')
+    if content_length and int(content_length) > PROMPT_CONFIG['upload_max_bytes']:
+        raise PromptTooLarge("请求体超过大小限制")
+
+    mimetype = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    if mimetype == 'multipart/form-data':
+        form = await request.form()
+        data, uploads = {}, {}
+        for key, value in form.multi_items():
+            if isinstance(value, UploadFile):
+                if key in ('spk_audio_prompt', 'emo_audio_prompt'):
+                    suffix = os.path.splitext(value.filename or '')[1].lower()
+                    uploads[key] = (value.file, suffix if suffix in tts_service.PROMPT_SUFFIXES.values() else '.wav')
+                cleanup.append(value.file.close)
+            else:
+                data[key] = value
+        return data, uploads
+    if mimetype.startswith('audio/') or mimetype == 'application/octet-stream':
+        spool = await _spool_body(request)
+        cleanup.append(spool.close)
+        return dict(request.query_params), {
+            'spk_audio_prompt': (spool, tts_service.PROMPT_SUFFIXES.get(mimetype, '.wav'))
+        }
+    body = await request.body()
+    return (json.loads(body) if body else None), {}
+
+
+async def generate_tts(request):
+    """文本转语音接口（与 Flask 入口的 /api/tts 行为一致）"""
+    if tts_service.drainer.draining:
+        return JSONResponse(
+            {"status": "error", "error": "服务正在退出，请重试其他实例", "retry_after": 1},
+            status_code=503,
+            headers={'Retry-After': '1'}
+        )
+    # 请求剖析：阻塞调用在线程池中执行，逐个调用纳入剖析
+    profile, denied = tts_service._start_profile(
+        request.headers, request.client.host if request.client else None, 'tts', request.url.path
+    )
+    if denied is not None:
+        return _error(*denied)
+    profiled = profile.wrap if profile is not None else (lambda fn: fn)
+    # 请求追踪：事件循环线程同时处理多个请求，span 不挂在线程上，而是绑定到各个阻塞调用
+    span = tts_service._start_trace(request.headers, request.method, request.url.path, request.url.path)
+    if span is not None:
+        traced = lambda fn: profiled(tts_tracing.wrap(fn, span))
+    else:
+        traced = profiled
+
+    started = time.perf_counter()
+    tts_metrics.INFLIGHT_REQUESTS.inc()
+    tts_service.drainer.enter()
+    status = [500]
+    cleanup = [tts_service.drainer.exit]
+    if profile is not None:
+        # 最后执行：剖析覆盖整个响应（包括流式输出）
+        cleanup.insert(0, lambda: tts_service.profile_store.finish(profile, status=status[0]))
+    if span is not None:
+        cleanup.insert(0, lambda: tts_service._end_trace(span, status[0]))
+
+    def finish():
+        for fn in reversed(cleanup):
+            try:
+                fn()
+            except Exception as e:
+                logger.warning(f"请求清理失败: {str(e)}")
+        tts_metrics.INFLIGHT_REQUESTS.dec()
+        tts_metrics.REQUEST_SECONDS.labels(endpoint='tts').observe(time.perf_counter() - started)
+        tts_metrics.REQUESTS.labels(endpoint='tts', status=str(status[0])).inc()
+
+    def respond(response, deferred=False):
+        status[0] = response.status_code
+        if profile is not None:
+            response.headers['X-Profile-Id'] = profile.id
+        if span is not None:
+            response.headers[tts_service.TRACE_ID_HEADER] = span.trace_id
+            # 最先执行：响应发送完毕即结束 response_write span
+            cleanup.append(span.child('response_write').end)
+            deferred = True
+        if deferred:
+            # 流式/文件响应发送完毕后再释放参考音频和准入凭证
+            response.background = BackgroundTask(finish)
+        else:
+            finish()
+        return response
+
+    try:
+        cancellation = tts_service._request_cancellation(request.headers)
+        t0 = time.perf_counter()
+        t0_ns = time.time_ns()
+        data, uploads = await _parse_request(request, cleanup)
+        observe_stage('parse', time.perf_counter() - t0)
+        tts_tracing.record(span, 'parse', t0_ns)
+        watcher = asyncio.create_task(_watch_disconnect(request, cancellation))
+        cleanup.append(watcher.cancel)
+
+        if not data:
+            return respond(_error("请求体不能为空", 400))
+        if tts_service.tts_model is None:
+            return respond(_error("模型未加载，请稍后重试", 503))
+
+        accept = request.headers.get('accept', '')
+        response_mode = tts_service._response_mode(data, accept)
+        if response_mode is None:
+            return respond(_error(f"无效的 response_mode，可选值: {', '.join(tts_service.RESPONSE_MODES)}", 400))
+        if response_mode == 'shm':
+            # ASGI 入口只监听 TCP
+            return respond(_error(tts_service.SHM_REMOTE_ERROR, 400))
+
+        prompt_scope = PromptScope(tts_service.prompt_store)
+        cleanup.append(prompt_scope.close)
+        spec = await run_blocking(traced(tts_service._parse_tts_spec), data, uploads, prompt_scope)
+        output_format = spec["output_format"]
+
+        if not tts_service._is_cached(spec):
+            ticket = tts_service.admission.acquire(tts_service._admission_cost(spec))
+            cleanup.append(lambda: tts_service.admission.release(ticket))
+
+        stream_mode = tts_service._stream_mode(data, accept)
+        if stream_mode:
+            body, mimetype = tts_service._stream_tts_chunks(stream_mode, spec, cancellation)
+            return respond(StreamingResponse(
+                iterate_blocking(body, wrap=traced), media_type=mimetype, headers=tts_service.STREAM_HEADERS
+            ), deferred=True)
+
+        # 结果文件在响应发送完毕前保持 pin 住
+        pins = CachePins(tts_service.result_cache)
+        cleanup.append(pins.close)
+        result = await run_blocking(traced(tts_service.synthesize), **spec, cancellation=cancellation, pins=pins)
+        payload = tts_service._result_payload(result, spec)
+
+        if response_mode == 'binary':
+            return respond(FileResponse(
+                result["path"],
+                media_type=tts_service.AUDIO_MIMETYPES.get(output_format, 'audio/wav'),
+                filename=payload["filename"],
+                content_disposition_type='inline',
+                headers={
+                    'X-Audio-Duration': str(payload["duration"]),
+                    'X-Cache-Key': result["cache_key"],
+                    'X-Cache': 'HIT' if result["cached"] else 'MISS',
+                }
+            ), deferred=True)
+
+        if response_mode == 'url':
+            return respond(JSONResponse({"status": "success", **payload}))
+
+        audio_base64 = await run_blocking(traced(tts_service._read_base64), result["path"])
+        return respond(JSONResponse({
+            "status": "success",
+            "audio": f"data:audio/{output_format};base64,{audio_base64}",
+            **payload
+        }))
+
+    except tts_service.TTSRequestError as e:
+        return respond(_error(str(e), e.status))
+    except PromptTooLarge:
+        return respond(_too_large())
+    except Overloaded as e:
+        response = JSONResponse(
+            {"status": "error", "error": str(e), "retry_after": e.retry_after},
+            status_code=429,
+            headers={'Retry-After': str(e.retry_after)}
+        )
+        return respond(response)
+    except RequestCancelled as e:
+        return respond(_error(str(e), e.status))
+    except Exception as e:
+        logger.error(f"生成语音失败: {str(e)}")
+        logger.error(traceback.format_exc())
+        return respond(_error(str(e), 500))
+
+
+async def get_audio(request):
+    """获取生成的音频文件"""
+    filename = request.path_params['filename']
+    audio_path = Path(tts_service.OUTPUT_PATH) / filename
+    if not audio_path.is_file():
+        return _error("音频文件不存在", 404)
+    ext = filename.split('.')[-1].lower()
+    return FileResponse(str(audio_path), media_type=tts_service.AUDIO_MIMETYPES.get(ext, 'audio/wav'))
+
+
+@asynccontextmanager
+async def lifespan(_):
+    logger.info("=" * 50)
+    logger.info("IndexTTS2.5 API 服务（ASGI）启动中...")
+    logger.info(f"阻塞操作线程数: {ASGI_CONFIG['workers']}")
+    logger.info("=" * 50)
+    tts_service.tts_scheduler.start()
+    threading.Thread(target=tts_service.load_model_in_background, name="model-loader", daemon=True).start()
+    # SIGHUP 按当前参数热重载模型；SIGTERM 由 uvicorn 处理，停止接收新连接后等待在途请求
+    asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, tts_service.start_reload)
+    yield
+    # uvicorn 已等待 HTTP 请求结束，这里再等待异步任务完成
+    tts_service.drainer.start()
+    await run_blocking(
+        tts_service.drainer.wait,
+        LIFECYCLE_CONFIG['drain_timeout'],
+        busy=lambda: tts_service.tts_jobs.stats()['active'] > 0
+    )
+    tts_service.tts_scheduler.stop(timeout=5)
+    if isinstance(tts_service.tts_model, tts_service.ReplicaPool):
+        tts_service.tts_model.close()
+    await run_blocking(tts_service.tracer.flush)
+    executor.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route('/tts', generate_tts, methods=['POST']),
+        Route('/api/tts', generate_tts, methods=['POST']),
+        Route('/api/audio/{filename}', get_audio, methods=['GET']),
+        # 其余接口（健康检查、模型信息、批量、异步任务、监控指标等）沿用 Flask 实现
+        Mount('/', WSGIMiddleware(tts_service.app, workers=ASGI_CONFIG['wsgi_workers'])),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(
+        app,
+        host='0.0.0.0',
+        port=tts_service.PORT,
+        log_config=None,  # 沿用 app.py 中的日志配置
+        timeout_keep_alive=ASGI_CONFIG['keep_alive'],
+        timeout_graceful_shutdown=LIFECYCLE_CONFIG['drain_timeout'],
+    )
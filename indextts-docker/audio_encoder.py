@@ -0,0 +1,113 @@
+"""
+音频编码
+把内存中的波形编码为 wav/mp3/ogg/opus 字节；指定码率时优先用 ffmpeg，
+否则使用 libsndfile（soundfile），libsndfile 不支持的格式回退到 ffmpeg
+"""
+
+import io
+import shutil
+import logging
+import subprocess
+
+import numpy as np
+import soundfile as sf
+
+logger = logging.getLogger(__name__)
+
+# 输出格式 -> (libsndfile 容器, 编码)
+SOUNDFILE_FORMATS = {
+    'wav': ('WAV', 'PCM_16'),
+    'mp3': ('MP3', 'MPEG_LAYER_III'),
+    'ogg': ('OGG', 'VORBIS'),
+    'opus': ('OGG', 'OPUS'),
+}
+
+# 输出格式 -> ffmpeg 参数
+FFMPEG_CODECS = {
+    'wav': ['-f', 'wav', '-c:a', 'pcm_s16le'],
+    'mp3': ['-f', 'mp3', '-c:a', 'libmp3lame'],
+    'ogg': ['-f', 'ogg', '-c:a', 'libvorbis'],
+    'opus': ['-f', 'ogg', '-c:a', 'libopus', '-application', 'voip'],
+}
+
+SUPPORTED_FORMATS = tuple(SOUNDFILE_FORMATS)
+
+# Opus 只支持这几种采样率
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+_FFMPEG = shutil.which('ffmpeg')
+
+
+class EncodeError(RuntimeError):
+    """编码失败或格式不受支持"""
+
+
+def opus_sample_rate(sample_rate):
+    """不低于原采样率的最小 Opus 采样率"""
+    for rate in OPUS_SAMPLE_RATES:
+        if rate >= sample_rate:
+            return rate
+    return OPUS_SAMPLE_RATES[-1]
+
+
+def parse_bitrate(value):
+    """'32k' / '32' / 32000 -> kbps 整数；None 表示使用编码器默认码率"""
+    if value in (None, ''):
+        return None
+    text = str(value).strip().lower()
+    if text.endswith('k'):
+        kbps = float(text[:-1])
+    else:
+        kbps = float(text)
+        if kbps >= 1000:
+            # 按 bps 传入
+            kbps /= 1000
+    if not 6 <= kbps <= 512:
+        raise ValueError(f"码率超出范围: {value}")
+    return int(kbps)
+
+
+def encode(data, sample_rate, output_format, bitrate=None):
+    """
+    编码 float32 波形 [采样点, 声道]，返回音频文件字节
+    bitrate 单位 kbps，仅对有损格式生效
+    """
+    if output_format not in SOUNDFILE_FORMATS:
+        raise EncodeError(f"不支持的输出格式: {output_format}")
+    data = np.clip(data, -1.0, 1.0)
+    if output_format != 'wav' and bitrate and _FFMPEG:
+        return _encode_ffmpeg(data, sample_rate, output_format, bitrate)
+    try:
+        return _encode_soundfile(data, sample_rate, output_format, bitrate)
+    except (sf.LibsndfileError, RuntimeError, TypeError, ValueError) as e:
+        if not _FFMPEG:
+            raise EncodeError(f"编码 {output_format} 失败: {str(e)}")
+        logger.info(f"libsndfile 编码 {output_format} 失败，改用 ffmpeg: {str(e)}")
+        return _encode_ffmpeg(data, sample_rate, output_format, bitrate)
+
+
+def _encode_soundfile(data, sample_rate, output_format, bitrate):
+    container, subtype = SOUNDFILE_FORMATS[output_format]
+    kwargs = {}
+    if bitrate and output_format != 'wav':
+        # libsndfile 没有直接的码率参数，按 8~320kbps 线性映射到压缩等级（0 为最高质量）
+        kwargs['compression_level'] = float(min(1.0, max(0.0, 1.0 - (bitrate - 8) / 312.0)))
+    buffer = io.BytesIO()
+    sf.write(buffer, data, sample_rate, format=container, subtype=subtype, **kwargs)
+    return buffer.getvalue()
+
+
+def _encode_ffmpeg(data, sample_rate, output_format, bitrate):
+    pcm = (data * 32767.0).astype('<i2').tobytes()
+    cmd = [
+        _FFMPEG, '-hide_banner', '-loglevel', 'error',
+        '-f', 's16le', '-ar', str(sample_rate), '-ac', str(data.shape[1]), '-i', 'pipe:0',
+        *FFMPEG_CODECS[output_format],
+    ]
+    if bitrate and output_format != 'wav':
+        cmd += ['-b:a', f'{bitrate}k']
+    cmd.append('pipe:1')
+    proc = subprocess.run(cmd, input=pcm, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise EncodeError(f"ffmpeg 编码 {output_format} 失败: {proc.stderr.decode('utf-8', 'replace').strip()}")
+    return proc.stdout
@@ -0,0 +1,134 @@
+"""
+音频处理工具
+"""
+
+import struct
+from math import gcd
+
+import numpy as np
+import soundfile as sf
+
+# 流式 WAV 头中未知长度的占位值
+_STREAM_SIZE = 0xFFFFFFFF
+
+
+def read_pcm16(path):
+    """读取音频文件，返回 (采样率, 声道数, PCM16 小端字节)"""
+    data, sample_rate = sf.read(path, dtype='int16', always_2d=True)
+    return sample_rate, data.shape[1], data.tobytes()
+
+
+def audio_duration(path):
+    """按采样点数计算精确时长（秒）"""
+    info = sf.info(path)
+    return info.frames / float(info.samplerate)
+
+
+def audio_info(path):
+    """返回 (精确时长（秒）, 采样率)"""
+    info = sf.info(str(path))
+    return info.frames / float(info.samplerate), info.samplerate
+
+
+def wav_stream_header(sample_rate, channels, bits_per_sample=16):
+    """
+    流式 WAV 头：总长度未知，RIFF/data 块大小写成 0xFFFFFFFF
+    主流播放器和 ffmpeg 会一直读到连接关闭
+    """
+    block_align = channels * bits_per_sample // 8
+    byte_rate = sample_rate * block_align
+    return (
+        b'RIFF' + struct.pack('<I', _STREAM_SIZE) + b'WAVE'
+        + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, channels, sample_rate, byte_rate, block_align, bits_per_sample)
+        + b'data' + struct.pack('<I', _STREAM_SIZE)
+    )
+
+
+def read_float(path):
+    """读取音频文件，返回 (采样率, float32 数组 [采样点, 声道])"""
+    data, sample_rate = sf.read(path, dtype='float32', always_2d=True)
+    return sample_rate, data
+
+
+def resample(data, src_rate, dst_rate):
+    """多相滤波重采样，data 为 [采样点, 声道]"""
+    if src_rate == dst_rate:
+        return data
+    # scipy.signal 导入需要 1 秒左右，推迟到第一次重采样，不拖慢服务启动
+    from scipy.signal import resample_poly
+
+    g = gcd(int(src_rate), int(dst_rate))
+    return resample_poly(data, dst_rate // g, src_rate // g, axis=0).astype(np.float32)
+
+
+def crossfade_concat(waves, sample_rate, crossfade_ms=30):
+    """
+    拼接多段波形，相邻两段在衔接处做线性交叉淡化
+    waves 为 [采样点, 声道] 的 float32 数组列表，声道数需一致
+    """
+    if not waves:
+        return np.zeros((0, 1), dtype=np.float32)
+    if len(waves) == 1:
+        return waves[0]
+
+    fade = int(sample_rate * crossfade_ms / 1000)
+    # 淡化长度不能超过任何一段的一半
+    fade = max(0, min([fade] + [len(w) // 2 for w in waves]))
+    channels = waves[0].shape[1]
+    total = sum(len(w) for w in waves) - fade * (len(waves) - 1)
+    out = np.zeros((total, channels), dtype=np.float32)
+
+    fade_in = np.linspace(0.0, 1.0, fade, dtype=np.float32)[:, None]
+    fade_out = 1.0 - fade_in
+
+    pos = 0
+    for i, wave in enumerate(waves):
+        wave = wave.astype(np.float32, copy=False)
+        if i == 0 or fade == 0:
+            out[pos:pos + len(wave)] = wave
+        else:
+            out[pos:pos + fade] = out[pos:pos + fade] * fade_out + wave[:fade] * fade_in
+            out[pos + fade:pos + len(wave)] = wave[fade:]
+        pos += len(wave) - fade
+    return out
+
+
+def write_audio(path, data, sample_rate):
+    """写出音频文件，格式由扩展名决定；WAV 使用 PCM16"""
+    subtype = 'PCM_16' if str(path).lower().endswith('.wav') else None
+    sf.write(str(path), np.clip(data, -1.0, 1.0), sample_rate, subtype=subtype)
+
+
+def pcm16_to_float(data):
+    """模型输出的 int16 波形转为 float32 [采样点, 声道]"""
+    data = np.asarray(data)
+    if data.ndim == 1:
+        data = data[:, None]
+    if data.dtype == np.int16:
+        return data.astype(np.float32) / 32768.0
+    return data.astype(np.float32, copy=False)
+
+
+def loudness_normalize(data, sample_rate, target_db=-16.0, peak_db=-1.0, gate_db=-50.0):
+    """
+    响度归一化：按 100ms 分块计算均方功率，去掉低于 gate_db 的静音块后求整体响度，
+    增益到 target_db（dBFS），再限制峰值不超过 peak_db
+    """
+    if len(data) == 0:
+        return data
+    mono = data.mean(axis=1)
+    block = max(1, int(sample_rate * 0.1))
+    usable = len(mono) // block * block
+    if usable:
+        power = np.mean(mono[:usable].reshape(-1, block) ** 2, axis=1)
+    else:
+        power = np.array([np.mean(mono ** 2)])
+    voiced = power[power > 10 ** (gate_db / 10)]
+    if voiced.size == 0:
+        return data
+    gain = 10 ** ((target_db - 10 * np.log10(voiced.mean())) / 20)
+    ceiling = 10 ** (peak_db / 20)
+    peak = np.abs(data).max() * gain
+    if peak > ceiling:
+        gain *= ceiling / peak
+    return (data * gain).astype(np.float32)
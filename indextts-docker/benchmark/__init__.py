@@ -0,0 +1,6 @@
+"""
+TTS 服务基准测试
+fake_model: 不依赖 GPU 和权重的确定性 IndexTTS2 替身
+loadgen:    闭环/开环压测，统计延迟分位数、吞吐、实时率和内存
+run:        启动服务并按并发 × 文本长度矩阵压测，结果输出为 JSON
+"""
@@ -0,0 +1,69 @@
+"""
+确定性的 IndexTTS2 替身
+推理耗时与文本长度成正比，输出真实的 PCM16 波形；同一时刻只执行一个推理，与单卡模型一致
+通过 MODEL_CLASS=benchmark.fake_model:FakeIndexTTS2 注入 load_model() 和推理副本
+
+耗时参数（环境变量）：
+  FAKE_BASE_SECONDS       每次推理的固定耗时（默认 0.05）
+  FAKE_SECONDS_PER_CHAR   每个字符的推理耗时（默认 0.01）
+  FAKE_PROMPT_SECONDS     换参考音频时提取音色条件的耗时（默认 0.1）
+  FAKE_AUDIO_PER_CHAR     每个字符对应的音频时长（默认 0.2 秒，约每秒 5 字）
+  FAKE_LOAD_SECONDS       模型加载耗时（默认 0）
+"""
+
+import os
+import time
+import zlib
+import threading
+
+import numpy as np
+import soundfile as sf
+
+SAMPLE_RATE = 22050
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+class FakeIndexTTS2:
+    """接口与 IndexTTS2 一致：infer() 写文件时返回路径，output_path 为 None 时返回 (采样率, int16 波形)"""
+
+    def __init__(self, cfg_path=None, model_dir=None, use_fp16=False, use_cuda_kernel=False, use_deepspeed=False,
+                 device='cpu', **kwargs):
+        self.device = device
+        self.base_seconds = _env_float('FAKE_BASE_SECONDS', 0.05)
+        self.seconds_per_char = _env_float('FAKE_SECONDS_PER_CHAR', 0.01)
+        self.prompt_seconds = _env_float('FAKE_PROMPT_SECONDS', 0.1)
+        self.audio_per_char = _env_float('FAKE_AUDIO_PER_CHAR', 0.2)
+        self._lock = threading.Lock()
+        # 与 IndexTTS2 同名的参考音频缓存，音色注册表可以照常装入/导出
+        self.cache_spk_cond = None
+        self.cache_s2mel_style = None
+        self.cache_s2mel_prompt = None
+        self.cache_mel = None
+        self.cache_emo_cond = None
+        self.cache_spk_audio_prompt = None
+        self.cache_emo_audio_prompt = None
+        self.calls = 0
+        time.sleep(_env_float('FAKE_LOAD_SECONDS', 0))
+
+    def infer(self, spk_audio_prompt, text, output_path=None, emo_audio_prompt=None, verbose=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+            if self.cache_spk_audio_prompt != spk_audio_prompt:
+                time.sleep(self.prompt_seconds)
+                self.cache_spk_audio_prompt = spk_audio_prompt
+            time.sleep(self.base_seconds + self.seconds_per_char * len(text))
+            wave = self.waveform(text)
+        if output_path:
+            sf.write(output_path, wave, SAMPLE_RATE, subtype='PCM_16')
+            return output_path
+        return SAMPLE_RATE, wave[:, None]
+
+    def waveform(self, text):
+        """由文本确定的正弦波：同一文本总是得到相同的音频"""
+        samples = max(1, int(SAMPLE_RATE * self.audio_per_char * len(text)))
+        frequency = 120 + zlib.crc32(text.encode('utf-8')) % 200
+        t = np.arange(samples, dtype=np.float32) / SAMPLE_RATE
+        return (np.sin(2 * np.pi * frequency * t) * 8000).astype(np.int16)
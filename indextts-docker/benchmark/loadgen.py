@@ -0,0 +1,277 @@
+"""
+压测负载生成
+- 闭环：固定并发数，每个客户端收到响应后立即发下一个请求，测服务的饱和吞吐
+- 开环：按泊松过程以固定速率发请求，不受响应快慢影响，延迟从计划发出时刻算起（避免协调遗漏）
+"""
+
+import io
+import os
+import time
+import base64
+import random
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+import soundfile as sf
+
+# 文本长度分布：名称 -> [(权重, 最短, 最长)]
+TEXT_DISTRIBUTIONS = {
+    'short': [(1.0, 5, 20)],
+    'medium': [(1.0, 30, 80)],
+    'long': [(1.0, 150, 400)],
+    'mixed': [(0.6, 5, 20), (0.3, 30, 80), (0.1, 150, 400)],
+}
+
+_CORPUS = (
+    '在很久很久以前，有一座美丽的小城，城里住着一位善良的老人。他每天清晨都会到河边散步，和路过的每一个人打招呼。'
+    '春天的时候，河岸上开满了野花，孩子们在草地上追逐嬉戏；夏天的傍晚，人们搬出竹椅在门口乘凉，听老人讲过去的故事。'
+    '秋天稻谷成熟，整座小城都弥漫着丰收的香气；到了冬天，雪花静静地落在屋顶上，炉火映红了每一扇窗户。'
+    '今天天气不错，我们一起去公园散步吧。请在听到提示音后留言，我们会尽快给您回复。'
+)
+
+# 单个请求的结果：计划发出时刻、延迟、HTTP 状态码、音频时长、错误信息
+Sample = namedtuple('Sample', ['started', 'latency', 'status', 'audio_seconds', 'error'])
+
+
+class Workload:
+    """
+    按长度分布从语料中截取文本，种子固定时序列可复现
+    repeat_ratio 为重复已发过文本的比例，用于测结果缓存；其余文本带序号保证不重复
+    """
+
+    def __init__(self, distribution='mixed', seed=0, repeat_ratio=0.0):
+        if distribution not in TEXT_DISTRIBUTIONS:
+            raise ValueError(f"未知的文本分布: {distribution}，可选: {', '.join(TEXT_DISTRIBUTIONS)}")
+        self.distribution = distribution
+        self.repeat_ratio = repeat_ratio
+        self.seed = seed
+        self._buckets = TEXT_DISTRIBUTIONS[distribution]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._sent = []
+        self._count = 0
+
+    def next_text(self):
+        with self._lock:
+            if self._sent and self._rng.random() < self.repeat_ratio:
+                return self._rng.choice(self._sent)
+            weights = [bucket[0] for bucket in self._buckets]
+            _, low, high = self._rng.choices(self._buckets, weights=weights)[0]
+            length = self._rng.randint(low, high)
+            start = self._rng.randrange(len(_CORPUS))
+            text = (_CORPUS * (length // len(_CORPUS) + 2))[start:start + length]
+            self._count += 1
+            text = f"{text}（{self.seed}.{self._count}）"
+            if len(self._sent) < 1000:
+                self._sent.append(text)
+            return text
+
+
+def make_prompt_audio(seconds=3.0, sample_rate=22050):
+    """生成一段参考音频（WAV 字节），没有真实录音时使用"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    wave = 0.3 * np.sin(2 * np.pi * 180 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+    buffer = io.BytesIO()
+    sf.write(buffer, wave.astype(np.float32), sample_rate, format='WAV', subtype='PCM_16')
+    return buffer.getvalue()
+
+
+class Client:
+    """
+    向 /api/tts 发请求，每个线程一个 keep-alive 会话
+    voice_id 为空时每个请求都携带 base64 参考音频（与未注册音色的调用方式一致）
+    """
+
+    def __init__(self, base_url, prompt_audio=None, voice_id=None, extra=None, timeout=300):
+        self.url = base_url.rstrip('/') + '/api/tts'
+        self.timeout = timeout
+        self.payload = {"response_mode": "url", **(extra or {})}
+        if voice_id:
+            self.payload["voice_id"] = voice_id
+        else:
+            audio = prompt_audio or make_prompt_audio()
+            self.payload["spk_audio_prompt"] = "data:audio/wav;base64," + base64.b64encode(audio).decode('ascii')
+        self._local = threading.local()
+
+    def send(self, text, started=None):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        if started is None:
+            started = time.perf_counter()
+        try:
+            resp = session.post(self.url, json={**self.payload, "text": text}, timeout=self.timeout)
+            latency = time.perf_counter() - started
+            audio_seconds = None
+            if resp.status_code == 200:
+                audio_seconds = resp.json().get('duration')
+            return Sample(started, latency, resp.status_code, audio_seconds, None if resp.ok else resp.text[:200])
+        except requests.RequestException as e:
+            return Sample(started, time.perf_counter() - started, 0, None, str(e))
+
+
+def run_closed_loop(client, workload, concurrency, duration=None, requests_total=None):
+    """concurrency 个客户端背靠背发请求，直到 duration 秒或共 requests_total 个请求"""
+    samples = []
+    lock = threading.Lock()
+    stop = threading.Event()
+    issued = [0]
+
+    def worker():
+        while not stop.is_set():
+            with lock:
+                if requests_total is not None and issued[0] >= requests_total:
+                    return
+                issued[0] += 1
+            sample = client.send(workload.next_text())
+            with lock:
+                samples.append(sample)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    if duration is not None:
+        stop.wait(duration)
+        stop.set()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def run_open_loop(client, workload, rate, duration, max_inflight=512, seed=0):
+    """
+    以平均 rate 个/秒的泊松到达发请求，持续 duration 秒
+    在途请求达到 max_inflight 时新请求记为丢弃（状态码 -1），不阻塞发送节奏
+    """
+    rng = random.Random(seed)
+    samples = []
+    lock = threading.Lock()
+    inflight = [0]
+
+    def issue(text, scheduled):
+        sample = client.send(text, started=scheduled)
+        with lock:
+            samples.append(sample)
+            inflight[0] -= 1
+
+    executor = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix='loadgen')
+    started = time.perf_counter()
+    next_at = started
+    try:
+        while True:
+            next_at += rng.expovariate(rate)
+            if next_at - started >= duration:
+                break
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            text = workload.next_text()
+            with lock:
+                if inflight[0] >= max_inflight:
+                    samples.append(Sample(next_at, 0.0, -1, None, "在途请求已达上限"))
+                    continue
+                inflight[0] += 1
+            executor.submit(issue, text, next_at)
+    finally:
+        executor.shutdown(wait=True)
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    """
+    汇总一组请求结果
+    realtime_factor 与服务端指标一致：音频时长 / 请求耗时，大于 1 表示比实时快
+    """
+    ok = [s for s in samples if s.status == 200]
+    latencies = np.array([s.latency for s in ok]) if ok else np.zeros(0)
+    audio = [s.audio_seconds or 0.0 for s in ok]
+    rtf = np.array([a / s.latency for a, s in zip(audio, ok) if s.latency > 0]) if ok else np.zeros(0)
+
+    def percentiles(values):
+        if values.size == 0:
+            return None
+        return {
+            "p50": round(float(np.percentile(values, 50)), 4),
+            "p95": round(float(np.percentile(values, 95)), 4),
+            "p99": round(float(np.percentile(values, 99)), 4),
+            "mean": round(float(values.mean()), 4),
+            "max": round(float(values.max()), 4),
+        }
+
+    errors = {}
+    for sample in samples:
+        if sample.status not in (200, 429, -1):
+            errors[str(sample.status)] = errors.get(str(sample.status), 0) + 1
+    return {
+        "requests": len(samples),
+        "succeeded": len(ok),
+        "rejected": sum(1 for s in samples if s.status == 429),  # 准入控制返回 429
+        "dropped": sum(1 for s in samples if s.status == -1),  # 开环模式下客户端在途上限
+        "errors": errors,
+        "elapsed": round(elapsed, 3),
+        "rps": round(len(ok) / elapsed, 3) if elapsed > 0 else None,
+        "audio_seconds_per_second": round(sum(audio) / elapsed, 3) if elapsed > 0 else None,
+        "latency": percentiles(latencies),
+        "realtime_factor": percentiles(rtf),
+    }
+
+
+def process_tree_rss(pid):
+    """进程及其所有子进程（推理副本）的常驻内存之和（字节）"""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status', 'r') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for tid in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{tid}/children', 'r') as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+class MemorySampler:
+    """后台定时采样服务进程树的内存，记录起止值和峰值"""
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self._values = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='memory-sampler', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            self._values.append(process_tree_rss(self.pid))
+            if self._stop.wait(self.interval):
+                self._values.append(process_tree_rss(self.pid))
+                return
+
+    def result(self):
+        values = [v for v in self._values if v]
+        if not values:
+            return None
+        mb = 1024 * 1024
+        return {
+            "rss_start_mb": round(values[0] / mb, 1),
+            "rss_end_mb": round(values[-1] / mb, 1),
+            "rss_peak_mb": round(max(values) / mb, 1),
+        }
@@ -0,0 +1,241 @@
+"""
+基准测试入口
+启动使用假模型的服务（或连接已有服务），按 并发/速率 × 文本分布 的矩阵压测，结果输出为 JSON
+
+示例（在 indextts-docker 目录下执行）：
+  # 闭环，对比不同并发
+  python -m benchmark.run --concurrency 1,4,16 --texts short,mixed --duration 20
+  # 开环，固定到达速率
+  python -m benchmark.run --mode open --rate 2,5,10 --duration 30
+  # 对比服务模式：凑批 / 关闭缓存 / 多副本 / ASGI 入口
+  python -m benchmark.run --env BATCH_SIZE=4 --env REPLICAS=2 --output replicas.json
+  python -m benchmark.run --entry asgi_app.py --output asgi.json
+  # 压测已经在运行的服务（传 --server-pid 时统计其内存）
+  python -m benchmark.run --url http://127.0.0.1:8000 --server-pid 1234
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+
+import requests
+
+from benchmark.loadgen import (
+    TEXT_DISTRIBUTIONS, Client, MemorySampler, Workload, make_prompt_audio,
+    run_closed_loop, run_open_loop, summarize,
+)
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+# 托管服务的默认环境：假模型、关闭预热，所有目录放在临时目录中
+FAKE_MODEL_ENV = {
+    'MODEL_CLASS': 'benchmark.fake_model:FakeIndexTTS2',
+    'WARMUP_TEXTS': '',
+    'DEVICE': 'cpu',
+    'EXIT_ON_LOAD_FAILURE': 'True',
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class ManagedServer:
+    """在子进程中启动 app.py / asgi_app.py，模型替换为假模型，退出时清理临时目录"""
+
+    def __init__(self, entry='app.py', env=None, ready_timeout=120):
+        self.entry = entry
+        self.ready_timeout = ready_timeout
+        self.workdir = Path(tempfile.mkdtemp(prefix='indextts-bench-'))
+        self.port = _free_port()
+        self.url = f'http://127.0.0.1:{self.port}'
+        checkpoints = self.workdir / 'checkpoints'
+        checkpoints.mkdir()
+        # load_model() 要求配置文件存在，假模型不读取内容
+        (checkpoints / 'config.yaml').write_text('# benchmark\n')
+        self.env = {
+            **FAKE_MODEL_ENV,
+            'PORT': str(self.port),
+            'MODEL_PATH': str(self.workdir / 'models'),
+            'CHECKPOINT_PATH': str(checkpoints),
+            'CONFIG_PATH': str(checkpoints / 'config.yaml'),
+            'OUTPUT_PATH': str(self.workdir / 'outputs'),
+            'PROMPT_CACHE_DIR': str(self.workdir / 'prompts'),
+            'PROMPT_URL_CACHE_DIR': str(self.workdir / 'url-prompts'),
+            'VOICE_DIR': str(self.workdir / 'voices'),
+            **(env or {}),
+        }
+        self.process = None
+        self.log_path = self.workdir / 'server.log'
+
+    def __enter__(self):
+        self._log = open(self.log_path, 'wb')
+        self.process = subprocess.Popen(
+            [sys.executable, self.entry],
+            cwd=str(APP_DIR),
+            env={**os.environ, **self.env},
+            stdout=self._log,
+            stderr=subprocess.STDOUT,
+        )
+        deadline = time.monotonic() + self.ready_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"服务启动失败，日志: {self.log_path}")
+            try:
+                if requests.get(self.url + '/ready', timeout=1).status_code == 200:
+                    return self
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"服务在 {self.ready_timeout}s 内未就绪，日志: {self.log_path}")
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self._log.close()
+        if exc_type is None:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+
+def _server_stats(url):
+    """压测后读取服务端的缓存、请求合并和副本统计"""
+    try:
+        health = requests.get(url.rstrip('/') + '/health', timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return None
+    return {key: health.get(key) for key in ('cache', 'singleflight', 'queue', 'replicas', 'voices')}
+
+
+def _register_voice(url, prompt_audio):
+    """注册压测用音色，返回 voice_id"""
+    resp = requests.post(
+        url.rstrip('/') + '/api/voices',
+        files={'spk_audio_prompt': ('bench.wav', prompt_audio, 'audio/wav')},
+        data={'name': 'benchmark'},
+        timeout=300,
+    )
+    resp.raise_for_status()
+    return resp.json()['voice']['id']
+
+
+def run_matrix(url, pid, args):
+    prompt_audio = Path(args.prompt).read_bytes() if args.prompt else make_prompt_audio()
+    voice_id = _register_voice(url, prompt_audio) if args.voice else None
+    client = Client(url, prompt_audio=prompt_audio, voice_id=voice_id, timeout=args.timeout)
+    levels = args.rate if args.mode == 'open' else args.concurrency
+
+    runs = []
+    for distribution in args.texts:
+        for level in levels:
+            # 每组使用不同的种子，前一组的结果缓存不会让后一组命中
+            workload = Workload(distribution, seed=args.seed + len(runs), repeat_ratio=args.repeat_ratio)
+            print(f"[{args.mode}] texts={distribution} {'rate' if args.mode == 'open' else 'concurrency'}={level}",
+                  file=sys.stderr, flush=True)
+            with MemorySampler(pid) if pid else _NullSampler() as sampler:
+                if args.mode == 'open':
+                    samples, elapsed = run_open_loop(
+                        client, workload, level, args.duration, max_inflight=args.max_inflight, seed=args.seed
+                    )
+                else:
+                    samples, elapsed = run_closed_loop(
+                        client, workload, int(level), duration=args.duration, requests_total=args.requests
+                    )
+            runs.append({
+                "mode": args.mode,
+                "texts": distribution,
+                ("rate" if args.mode == 'open' else "concurrency"): level,
+                **summarize(samples, elapsed),
+                "memory": sampler.result(),
+                "server": _server_stats(url),
+            })
+            if args.pause:
+                time.sleep(args.pause)
+    return runs
+
+
+class _NullSampler:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def result(self):
+        return None
+
+
+def _parse_list(cast):
+    return lambda value: [cast(item) for item in value.split(',') if item.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='IndexTTS API 基准测试')
+    parser.add_argument('--url', help='压测已有服务；不指定时启动使用假模型的服务')
+    parser.add_argument('--server-pid', type=int, help='已有服务的进程号，用于统计内存')
+    parser.add_argument('--entry', default='app.py', help='托管服务的入口：app.py 或 asgi_app.py')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='托管服务的环境变量，如 BATCH_SIZE=4、REPLICAS=2、RESULT_CACHE_ENABLED=False')
+    parser.add_argument('--mode', choices=('closed', 'open'), default='closed')
+    parser.add_argument('--concurrency', type=_parse_list(int), default=[1, 4, 16], help='闭环并发数列表')
+    parser.add_argument('--rate', type=_parse_list(float), default=[1.0, 4.0], help='开环到达速率列表（请求/秒）')
+    parser.add_argument('--texts', type=_parse_list(str), default=['mixed'],
+                        help=f"文本长度分布列表，可选: {', '.join(TEXT_DISTRIBUTIONS)}")
+    parser.add_argument('--duration', type=float, default=20.0, help='每组压测时长（秒）')
+    parser.add_argument('--requests', type=int, help='闭环模式下每组的请求总数（代替 --duration）')
+    parser.add_argument('--repeat-ratio', type=float, default=0.0, help='重复文本比例，用于测结果缓存')
+    parser.add_argument('--voice', action='store_true', help='先注册音色，请求使用 voice_id 而不是携带参考音频')
+    parser.add_argument('--prompt', help='参考音频文件，不指定时使用生成的音频')
+    parser.add_argument('--max-inflight', type=int, default=512, help='开环模式下客户端在途请求上限')
+    parser.add_argument('--timeout', type=float, default=300.0, help='单个请求超时（秒）')
+    parser.add_argument('--pause', type=float, default=1.0, help='两组压测之间的间隔（秒）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='结果 JSON 文件，不指定时输出到标准输出')
+    args = parser.parse_args(argv)
+    if args.requests is not None and args.mode == 'closed':
+        args.duration = None
+
+    env = dict(item.split('=', 1) for item in args.env)
+    result = {
+        "started_at": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "target": {"url": args.url} if args.url else {"entry": args.entry, "env": env, "model": FAKE_MODEL_ENV['MODEL_CLASS']},
+        "workload": {
+            "mode": args.mode, "duration": args.duration, "requests": args.requests,
+            "repeat_ratio": args.repeat_ratio, "voice": args.voice, "seed": args.seed,
+        },
+    }
+    if args.url:
+        result["runs"] = run_matrix(args.url, args.server_pid, args)
+    else:
+        with ManagedServer(args.entry, env) as server:
+            result["runs"] = run_matrix(server.url, server.pid, args)
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
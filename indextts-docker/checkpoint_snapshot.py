@@ -0,0 +1,210 @@
+"""
+检查点快照
+- 模型首次加载时，把 CHECKPOINT_PATH 下经 torch.load 读取的权重另存为 safetensors 快照（SNAPSHOT_DIR）
+- 之后的加载直接内存映射快照：不经过 pickle 反序列化，页面按需从页缓存载入，同机多个副本共享同一份物理内存
+源文件大小或修改时间变化时重新生成；含非张量对象、无法转换的文件照常走 torch.load
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import threading
+import importlib
+from pathlib import Path
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 'indextts-snapshot-1'
+
+# torch.load 在进程内是全局的，同一时刻只替换一次
+_patch_lock = threading.Lock()
+
+
+class Unsupported(Exception):
+    """检查点包含无法保存到 safetensors 的对象"""
+
+
+def _flatten(obj, path, tensors, layout, seen):
+    """
+    把嵌套 dict 中的张量拆出来：tensors 为 {名称: 张量}，layout 按原顺序记录 [路径, 张量名称或 {"value": 值}]
+    同一个张量对象（共享权重）只保存一份；seen 记录已保存的张量对象和存储
+    """
+    torch = importlib.import_module('torch')
+    if isinstance(obj, torch.Tensor):
+        name = seen.get(id(obj))
+        if name is None:
+            name = f"t{len(tensors)}"
+            tensor = obj.detach().cpu()
+            # safetensors 不允许多个张量共享存储：视图和与其他张量共享存储的张量单独复制一份
+            storage = tensor.untyped_storage()
+            if (not tensor.is_contiguous() or storage.nbytes() != tensor.nbytes
+                    or ('storage', storage.data_ptr()) in seen):
+                tensor = tensor.clone(memory_format=torch.contiguous_format)
+            tensors[name] = tensor
+            seen[id(obj)] = name
+            seen[('storage', tensor.untyped_storage().data_ptr())] = name
+        layout.append([path, name])
+    elif isinstance(obj, dict):
+        if not obj:
+            layout.append([path, {"value": {}}])
+        for key, value in obj.items():
+            if not isinstance(key, str):
+                raise Unsupported(f"非字符串键: {key!r}")
+            _flatten(value, path + [key], tensors, layout, seen)
+    elif obj is None or isinstance(obj, (bool, int, float, str)):
+        layout.append([path, {"value": obj}])
+    else:
+        raise Unsupported(f"不支持的对象类型: {type(obj).__name__}")
+
+
+def _unflatten(layout, get_tensor):
+    root = {}
+    for path, item in layout:
+        value = get_tensor(item) if isinstance(item, str) else item["value"]
+        if not path:
+            return value
+        node = root
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    return root
+
+
+class CheckpointSnapshots:
+    """
+    roots 下的检查点文件与 snapshot_dir 中快照的对应关系
+    快照文件名由源文件的绝对路径决定，元数据中记录源文件的大小和修改时间
+    """
+
+    def __init__(self, snapshot_dir, roots):
+        self.dir = Path(snapshot_dir)
+        self.roots = [os.path.realpath(root) for root in roots]
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "converted": 0, "skipped": 0, "failed": 0}
+
+    def covers(self, path):
+        path = os.path.realpath(path)
+        return any(path.startswith(root + os.sep) for root in self.roots)
+
+    def snapshot_path(self, path):
+        digest = hashlib.sha1(os.path.realpath(path).encode('utf-8')).hexdigest()[:16]
+        return self.dir / f"{Path(path).stem}-{digest}.safetensors"
+
+    @staticmethod
+    def _source_meta(path):
+        st = os.stat(path)
+        return {"source_size": str(st.st_size), "source_mtime_ns": str(st.st_mtime_ns)}
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def load(self, path, device):
+        """读取 path 的快照，快照不存在或已过期时返回 None"""
+        from safetensors import safe_open
+
+        snapshot = self.snapshot_path(path)
+        if not snapshot.is_file():
+            return None
+        try:
+            with safe_open(str(snapshot), framework='pt', device=device) as f:
+                meta = f.metadata() or {}
+                if meta.get("format") != SNAPSHOT_FORMAT or any(
+                    meta.get(key) != value for key, value in self._source_meta(path).items()
+                ):
+                    return None
+                loaded = {}
+                state = _unflatten(
+                    json.loads(meta["layout"]),
+                    lambda name: loaded[name] if name in loaded else loaded.setdefault(name, f.get_tensor(name))
+                )
+        except Exception as e:
+            logger.warning(f"读取检查点快照失败，改用原文件: {snapshot}, {str(e)}")
+            return None
+        self._count("hits")
+        return state
+
+    def save(self, path, state):
+        """把 torch.load 读出的 state 保存为快照；无法转换或写入失败时只记录日志"""
+        from safetensors.torch import save_file
+
+        tensors, layout = {}, []
+        try:
+            _flatten(state, [], tensors, layout, {})
+        except Unsupported as e:
+            logger.info(f"检查点不转换为快照: {path}, {str(e)}")
+            self._count("skipped")
+            return False
+        snapshot = self.snapshot_path(path)
+        tmp = snapshot.with_name(f".{snapshot.name}.{os.getpid()}.tmp")
+        try:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            t0 = time.perf_counter()
+            save_file(tensors, str(tmp), metadata={
+                "format": SNAPSHOT_FORMAT,
+                "source": os.path.realpath(path),
+                "layout": json.dumps(layout, ensure_ascii=False),
+                **self._source_meta(path),
+            })
+            os.replace(tmp, snapshot)
+        except Exception as e:
+            tmp.unlink(missing_ok=True)
+            logger.warning(f"保存检查点快照失败: {path}, {str(e)}")
+            self._count("failed")
+            return False
+        logger.info(f"已生成检查点快照: {path} -> {snapshot.name} ({len(tensors)} 个张量, {time.perf_counter() - t0:.2f}s)")
+        self._count("converted")
+        return True
+
+    def snapshot(self):
+        with self._lock:
+            return {"dir": str(self.dir), **self.stats}
+
+
+def _device_name(map_location):
+    """torch.load 的 map_location 对应的 safetensors 设备，无法对应（dict / 函数）时返回 None"""
+    if map_location is None:
+        # load_state_dict 会复制到参数所在设备，统一读到 CPU
+        return 'cpu'
+    if isinstance(map_location, str):
+        return map_location
+    if type(map_location).__name__ == 'device':
+        return str(map_location)
+    return None
+
+
+@contextmanager
+def snapshot_loading(snapshots):
+    """
+    在此范围内，对 snapshots 覆盖目录下文件的 torch.load 改为读取快照，没有快照时读取原文件并生成快照
+    snapshots 为 None 或模型代码没有用到 torch 时不做任何事
+    """
+    torch = sys.modules.get('torch')
+    if snapshots is None or torch is None:
+        yield
+        return
+    with _patch_lock:
+        original = torch.load
+
+        def load(f, map_location=None, *args, **kwargs):
+            if not isinstance(f, (str, os.PathLike)) or not snapshots.covers(f):
+                return original(f, map_location, *args, **kwargs)
+            device = _device_name(map_location)
+            if device is None:
+                return original(f, map_location, *args, **kwargs)
+            state = snapshots.load(f, device)
+            if state is not None:
+                return state
+            state = original(f, map_location, *args, **kwargs)
+            snapshots.save(f, state)
+            return state
+
+        torch.load = load
+        try:
+            yield
+        finally:
+            torch.load = original
@@ -16,6 +16,26 @@ MODEL_DIR.mkdir(parents=True, exist_ok=True)
 CHECKPOINT_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+
+def _shm_bytes():
+    """/dev/shm 的容量（字节），不存在时为 0"""
+    try:
+        st = os.statvfs('/dev/shm')
+    except OSError:
+        return 0
+    return st.f_blocks * st.f_frsize
+
+
+# 上传参考音频、URL 参考音频和同机交接的目录默认放在 /dev/shm，但只在其容量容纳得下这些目录的配额之和时才用；
+# Docker 容器默认只有 64MB（见 docker-compose.yml 的 shm_size），容量不够时默认放在磁盘上，以免写满后报 ENOSPC
+_SHM_STORES = [
+    ('PROMPT_CACHE_DIR', 'PROMPT_CACHE_MAX_MB'),
+    ('PROMPT_URL_CACHE_DIR', 'PROMPT_URL_CACHE_MAX_MB'),
+] + ([('SHM_HANDOFF_DIR', 'SHM_HANDOFF_MAX_MB')] if os.getenv('UDS_PATH') else [])
+USE_SHM = _shm_bytes() >= sum(
+    float(os.getenv(quota, 512)) * 1024 * 1024 for directory, quota in _SHM_STORES if not os.getenv(directory)
+)
+
 # IndexTTS2.5 配置
 INDEXTTS_CONFIG = {
     'model_path': str(MODEL_DIR),
@@ -23,7 +43,143 @@ INDEXTTS_CONFIG = {
     'output_path': str(OUTPUT_DIR),
     'device': os.getenv('DEVICE', 'cpu'),  # 'cpu' 或 'cuda'
     'batch_size': int(os.getenv('BATCH_SIZE', 1)),
-    'max_text_length': int(os.getenv('MAX_TEXT_LENGTH', 500)),
+    'batch_max_wait_ms': int(os.getenv('BATCH_MAX_WAIT_MS', 20)),  # 凑批最长等待时间
+    'max_text_length': int(os.getenv('MAX_TEXT_LENGTH', 500)),  # 单次推理的最大文本长度，超过则分段
+    'segment_crossfade_ms': int(os.getenv('SEGMENT_CROSSFADE_MS', 30)),  # 分段拼接的交叉淡化时长
+    'segment_workers': int(os.getenv('SEGMENT_WORKERS', 16)),  # 同时进入调度队列的分段数
+    # 预热文本，多段用 | 分隔；设为空字符串可关闭预热
+    'warmup_texts': [t for t in os.getenv(
+        'WARMUP_TEXTS',
+        '你好。|今天天气不错，我们一起去公园散步吧。|在很久很久以前，有一座美丽的小城，城里住着一位善良的老人，他每天清晨都会到河边散步，和路过的每一个人打招呼。'
+    ).split('|') if t.strip()],
+    'warmup_spk_prompt': os.getenv('WARMUP_SPK_PROMPT', ''),  # 预热用参考音频，不设置时自动生成
+    'exit_on_load_failure': os.getenv('EXIT_ON_LOAD_FAILURE', 'True').lower() == 'true',
+    # 模型类（模块:类名），基准测试时可替换为 benchmark.fake_model:FakeIndexTTS2
+    'model_class': os.getenv('MODEL_CLASS', 'indextts.infer_v2:IndexTTS2'),
+    # 检查点快照：首次加载时把权重转换为 safetensors，之后内存映射加载
+    'snapshot_enabled': os.getenv('CHECKPOINT_SNAPSHOT', 'True').lower() == 'true',
+    'snapshot_dir': os.getenv('SNAPSHOT_DIR', str(BASE_DIR / 'checkpoint-snapshots')),
+}
+
+# 结果缓存配置
+CACHE_CONFIG = {
+    'result_cache_enabled': os.getenv('RESULT_CACHE_ENABLED', 'True').lower() == 'true',
+    'result_cache_max_bytes': int(os.getenv('RESULT_CACHE_MAX_MB', 2048)) * 1024 * 1024,
+}
+
+# 参考音频存储配置
+PROMPT_CONFIG = {
+    # 优先放在内存文件系统中（见 USE_SHM）
+    'cache_dir': os.getenv('PROMPT_CACHE_DIR', '/dev/shm/indextts-prompts' if USE_SHM else str(BASE_DIR / 'prompts')),
+    'cache_max_bytes': int(os.getenv('PROMPT_CACHE_MAX_MB', 512)) * 1024 * 1024,
+    'spool_max_bytes': int(os.getenv('PROMPT_SPOOL_MAX_MB', 16)) * 1024 * 1024,  # 上传时内存缓冲上限
+    'upload_max_bytes': int(os.getenv('PROMPT_UPLOAD_MAX_MB', 64)) * 1024 * 1024,
+    # URL 参考音频的本地缓存，与上传的参考音频分开计算配额
+    'url_cache_dir': os.getenv('PROMPT_URL_CACHE_DIR', '/dev/shm/indextts-url-prompts' if USE_SHM else str(BASE_DIR / 'url-prompts')),
+    'url_cache_max_bytes': int(os.getenv('PROMPT_URL_CACHE_MAX_MB', 512)) * 1024 * 1024,
+    'url_revalidate_after': int(os.getenv('PROMPT_URL_REVALIDATE_AFTER', 300)),  # 多久后重新验证（秒）
+    'fetch_per_host': int(os.getenv('PROMPT_FETCH_PER_HOST', 4)),  # 每个主机同时下载数
+    'fetch_pool_size': int(os.getenv('PROMPT_FETCH_POOL_SIZE', 32)),  # 连接池大小
+    'fetch_timeout': int(os.getenv('PROMPT_FETCH_TIMEOUT', 30)),  # 下载超时（秒）
+    # 允许下载参考音频的主机，白名单外的主机必须解析到公网地址
+    'fetch_allowed_hosts': [h.strip() for h in os.getenv('PROMPT_FETCH_ALLOWED_HOSTS', '').split(',') if h.strip()],
+    'fetch_allow_private': os.getenv('PROMPT_FETCH_ALLOW_PRIVATE', 'False').lower() == 'true',  # 允许从任意内网地址下载
+}
+
+# 异步任务配置
+JOB_CONFIG = {
+    'workers': int(os.getenv('JOB_WORKERS', 4)),
+    'max_pending': int(os.getenv('JOB_MAX_PENDING', 256)),  # 排队 + 执行中的任务上限
+    'result_ttl': int(os.getenv('JOB_RESULT_TTL', 3600)),  # 结束后保留多久（秒）
+    'timeout': int(os.getenv('JOB_TIMEOUT', 1800)),  # 单个任务最长合成时间（秒）
+    'webhook_timeout': int(os.getenv('JOB_WEBHOOK_TIMEOUT', 10)),
+    # 回调地址的主机白名单（逗号分隔，如 "backend,api.example.com"），白名单外的主机只能解析到公网地址
+    'webhook_allowed_hosts': [h.strip() for h in os.getenv('JOB_WEBHOOK_ALLOWED_HOSTS', '').split(',') if h.strip()],
+    'webhook_allow_private': os.getenv('JOB_WEBHOOK_ALLOW_PRIVATE', 'False').lower() == 'true',  # 允许回调任意内网地址
+    'webhook_workers': int(os.getenv('JOB_WEBHOOK_WORKERS', 2)),  # 发送回调的线程数
+}
+
+# 批量接口配置
+BATCH_CONFIG = {
+    'max_items': int(os.getenv('BATCH_MAX_ITEMS', 500)),  # 单次请求最多条目数
+    'workers': int(os.getenv('BATCH_WORKERS', 32)),  # 同时进入调度队列的条目数
+}
+
+# 输出音频后处理配置
+AUDIO_CONFIG = {
+    'loudness_target_db': float(os.getenv('LOUDNESS_TARGET_DB', -16)),  # loudness=true 时的目标响度（dBFS）
+}
+
+# 准入控制配置
+ADMISSION_CONFIG = {
+    # 同时处理中的工作量上限（字符数 × num_beams 之和），0 表示不限制
+    'max_cost': int(os.getenv('ADMISSION_MAX_COST', 30000)),
+    'window': float(os.getenv('ADMISSION_WINDOW', 60)),  # 统计消化速度的时间窗口（秒）
+    'max_retry_after': int(os.getenv('ADMISSION_MAX_RETRY_AFTER', 60)),  # Retry-After 上限（秒）
+}
+
+# 多副本配置（REPLICAS=0 时在 API 进程内加载单个模型）
+REPLICA_CONFIG = {
+    'replicas': int(os.getenv('REPLICAS', 0)),
+    'cpu_pinning': os.getenv('REPLICA_CPU_PINNING', 'True').lower() == 'true',  # 仅 DEVICE=cpu 时生效
+    'torch_threads': int(os.getenv('REPLICA_TORCH_THREADS', 0)),  # 0 表示等于分到的核数
+    # GPU 模式下各副本轮流使用的 CUDA 设备，如 "0,1"；不设置时所有副本共用可见设备
+    'cuda_devices': [d.strip() for d in os.getenv('REPLICA_CUDA_DEVICES', '').split(',') if d.strip()],
+    'restart_delay': float(os.getenv('REPLICA_RESTART_DELAY', 5)),  # 副本意外退出后的重启间隔（秒）
+}
+
+# 热重载与优雅退出配置
+LIFECYCLE_CONFIG = {
+    'drain_timeout': float(os.getenv('DRAIN_TIMEOUT', 30)),  # SIGTERM 后等待在途请求和异步任务的最长时间（秒）
+    'reload_drain_timeout': float(os.getenv('RELOAD_DRAIN_TIMEOUT', 300)),  # 热重载后等待旧模型在途推理的最长时间（秒）
+}
+
+# 管理接口配置
+ADMIN_CONFIG = {
+    'token': os.getenv('ADMIN_TOKEN', ''),  # 未设置时管理接口只允许本机访问
+}
+
+# 请求剖析配置
+PROFILE_CONFIG = {
+    'dir': os.getenv('PROFILE_DIR', '/tmp/indextts-profiles'),  # 剖析结果目录，重启后删除上次的剖析
+    'max_entries': int(os.getenv('PROFILE_MAX_ENTRIES', 50)),  # 最多保留的剖析数
+    'sample_rate': float(os.getenv('PROFILE_SAMPLE_RATE', 0)),  # 抽样剖析的请求比例（0 ~ 1），0 为关闭
+    'interval': float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 5)) / 1000,  # 调用栈采样间隔
+    'torch_trace': os.getenv('PROFILE_TORCH_TRACE', 'True').lower() == 'true',  # 显式剖析时记录 torch profiler 追踪
+}
+
+# 同机快速通道配置：Unix 套接字 + 共享内存交接
+LOCAL_CONFIG = {
+    'socket_path': os.getenv('UDS_PATH', ''),  # 额外监听的 Unix 套接字路径，空为不监听
+    'handoff_dir': os.getenv('SHM_HANDOFF_DIR', '/dev/shm/indextts-handoff' if USE_SHM else str(BASE_DIR / 'handoff')),
+    'lease_ttl': float(os.getenv('SHM_LEASE_TTL', 60)),  # 未确认的交接文件保留时长（秒）
+    'max_bytes': int(float(os.getenv('SHM_HANDOFF_MAX_MB', 512)) * 1024 * 1024),  # 未确认的交接文件总大小上限
+}
+
+# 分布式追踪配置
+TRACE_CONFIG = {
+    'exporter': os.getenv('TRACE_EXPORTER', '').lower(),  # span 导出方式：jsonl / otlp，空为关闭
+    'file': os.getenv('TRACE_FILE', str(BASE_DIR / 'traces' / 'spans.jsonl')),  # jsonl 导出文件
+    'file_max_bytes': int(float(os.getenv('TRACE_FILE_MAX_MB', 100)) * 1024 * 1024),  # 超过后轮转为 .1
+    'otlp_endpoint': os.getenv('TRACE_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces'),  # OTLP/HTTP 收集器地址
+    'service_name': os.getenv('TRACE_SERVICE_NAME', 'indextts'),
+    'sample_rate': float(os.getenv('TRACE_SAMPLE_RATE', 0)),  # 没有 traceparent 的请求开启新 trace 的比例（0 ~ 1）
+}
+
+# 音色注册表配置
+VOICE_CONFIG = {
+    'dir': os.getenv('VOICE_DIR', str(BASE_DIR / 'voices')),
+    'sample_rate': int(os.getenv('VOICE_SAMPLE_RATE', 22050)),  # 处理后参考音频的采样率
+    'max_seconds': float(os.getenv('VOICE_MAX_SECONDS', 15)),  # 参考音频最长保留时长（秒）
+    'trim_db': float(os.getenv('VOICE_TRIM_DB', -40)),  # 首尾低于峰值该分贝数的部分视为静音
+    'default_voice': os.getenv('VOICE_DEFAULT', ''),  # voice_id 为 default 时使用的音色
+}
+
+# ASGI 入口配置（asgi_app.py）
+ASGI_CONFIG = {
+    'workers': int(os.getenv('ASGI_WORKERS', 64)),  # 阻塞操作（参考音频处理、等待合成）线程数
+    'wsgi_workers': int(os.getenv('ASGI_WSGI_WORKERS', 16)),  # 转交给 Flask 的接口使用的线程数
+    'keep_alive': int(os.getenv('ASGI_KEEP_ALIVE', 30)),  # 空闲 keep-alive 连接保持时间（秒）
 }
 
 # API 配置
@@ -0,0 +1,258 @@
+"""
+模型生命周期
+记录加载/预热阶段和耗时，执行预热推理；热重载时切换模型实例，退出时排空在途请求
+启动按阶段计时：进程启动（解释器和服务模块导入）、导入模型代码、加载权重、预热
+"""
+
+import os
+import time
+import logging
+import tempfile
+import threading
+import importlib
+from contextlib import contextmanager
+
+import numpy as np
+
+from audio_utils import write_audio
+from checkpoint_snapshot import CheckpointSnapshots, snapshot_loading
+
+logger = logging.getLogger(__name__)
+
+
+def import_model_class(spec):
+    """按 '模块:类名' 导入模型类"""
+    module_name, _, class_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), class_name or 'IndexTTS2')
+
+
+def process_uptime():
+    """当前进程已运行的秒数（含解释器启动和模块导入），无法从 /proc 读取时返回 None"""
+    try:
+        with open('/proc/self/stat') as f:
+            # 第 22 个字段为进程启动时刻（开机后的时钟滴答数），进程名可能含空格，从右括号之后开始数
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return round(uptime - start_ticks / os.sysconf('SC_CLK_TCK'), 2)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class PhaseTimer:
+    """按阶段记录耗时（秒）：with timer.phase('load_weights'): ..."""
+
+    def __init__(self):
+        self.phases = {}
+
+    def record(self, name, seconds):
+        if seconds is not None:
+            self.phases[name] = round(seconds, 2)
+
+    @contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def summary(self):
+        return ', '.join(f"{name} {seconds}s" for name, seconds in self.phases.items())
+
+
+def construct_model(spec, model_kwargs, snapshot_dir=None, timer=None):
+    """
+    导入模型类并构造实例，分别计入 timer 的 import_model 和 load_weights 阶段
+    snapshot_dir 不为空时，model_dir 下的权重经 safetensors 快照加载（首次加载时生成快照）
+    """
+    timer = timer or PhaseTimer()
+    with timer.phase('import_model'):
+        model_class = import_model_class(spec)
+    snapshots = CheckpointSnapshots(snapshot_dir, [model_kwargs['model_dir']]) if snapshot_dir else None
+    with timer.phase('load_weights'), snapshot_loading(snapshots):
+        model = model_class(**model_kwargs)
+    if snapshots is not None:
+        stats = snapshots.snapshot()
+        if any(stats[key] for key in ('hits', 'converted', 'skipped', 'failed')):
+            logger.info(
+                f"检查点快照: 命中 {stats['hits']}, 新生成 {stats['converted']}, "
+                f"未转换 {stats['skipped']}, 失败 {stats['failed']}"
+            )
+    return model
+
+
+class ModelStatus:
+    """
+    模型状态
+
+    phase: starting -> loading -> warming_up -> ready，失败时为 failed
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phase = 'starting'
+        self.started_at = time.time()
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.phases = {}
+        self.warmup_done = 0
+        self.warmup_total = 0
+        self.ready_at = None
+        self.error = None
+        self.warmup_error = None
+
+    def update(self, **fields):
+        with self._lock:
+            for key, value in fields.items():
+                setattr(self, key, value)
+
+    @property
+    def ready(self):
+        return self.phase == 'ready'
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "phase": self.phase,
+                "load_seconds": self.load_seconds,
+                "warmup_seconds": self.warmup_seconds,
+                "startup_phases": dict(self.phases),
+                "warmup_progress": f"{self.warmup_done}/{self.warmup_total}",
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "ready_seconds": round(self.ready_at - self.started_at, 1) if self.ready_at else None,
+                "error": self.error,
+                "warmup_error": self.warmup_error,
+            }
+
+
+class ModelSlot:
+    """
+    当前生效的模型实例，以及各实例的在途推理数
+    swap() 之后的推理都拿到新实例，旧实例可以等在途推理结束（wait_idle）后再释放
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.current = None
+        self.generation = 0
+        self._inflight = {}  # id(实例) -> 在途推理数
+
+    def acquire(self):
+        with self._cond:
+            model = self.current
+            if model is None:
+                raise RuntimeError("模型未加载")
+            self._inflight[id(model)] = self._inflight.get(id(model), 0) + 1
+            return model
+
+    def release(self, model):
+        with self._cond:
+            count = self._inflight.get(id(model), 0) - 1
+            if count > 0:
+                self._inflight[id(model)] = count
+            else:
+                self._inflight.pop(id(model), None)
+                self._cond.notify_all()
+
+    def swap(self, model):
+        """原子地切换到新实例，返回旧实例"""
+        with self._cond:
+            old, self.current = self.current, model
+            self.generation += 1
+            return old
+
+    def inflight(self, model):
+        with self._cond:
+            return self._inflight.get(id(model), 0)
+
+    def wait_idle(self, model, timeout=None):
+        """等待实例的在途推理全部结束，超时返回 False"""
+        with self._cond:
+            return self._cond.wait_for(lambda: id(model) not in self._inflight, timeout)
+
+
+class Drainer:
+    """
+    在途请求计数，用于优雅退出
+    start() 之后 draining 为 True，调用方据此拒绝新请求；wait() 等到计数归零或超时
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._active = 0
+        self.draining = False
+
+    def enter(self):
+        with self._cond:
+            self._active += 1
+
+    def exit(self):
+        with self._cond:
+            self._active -= 1
+            if self._active <= 0:
+                self._cond.notify_all()
+
+    @property
+    def active(self):
+        with self._cond:
+            return self._active
+
+    def start(self):
+        with self._cond:
+            self.draining = True
+
+    def wait(self, timeout, busy=None):
+        """
+        等待在途请求结束；busy() 返回 True 表示还有其他未完成的工作（如异步任务）
+        全部完成返回 True，超时返回 False
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._active > 0 or (busy is not None and busy()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                # 异步任务没有通知，按固定间隔轮询
+                self._cond.wait(min(remaining, 0.2))
+            return True
+
+
+def make_warmup_prompt(directory, sample_rate=22050, seconds=3.0):
+    """
+    未配置预热用参考音频时，生成一段合成的参考音频
+    预热只为触发 CUDA kernel 编译/JIT 和显存分配，不关心音色
+    """
+    path = os.path.join(directory, 'warmup_prompt.wav')
+    if os.path.exists(path):
+        return path
+    rng = np.random.default_rng(0)
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    # 带包络的谐波 + 少量噪声，近似人声的频谱范围
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+    wave = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 420, 560)))
+    wave = 0.2 * envelope * wave + 0.01 * rng.standard_normal(len(t))
+    write_audio(path, wave.astype(np.float32)[:, None], sample_rate)
+    return path
+
+
+def warm_up(model, texts, spk_audio_prompt, status=None):
+    """
+    依次合成几段不同长度的文本，返回总耗时（秒）
+    """
+    if status is not None:
+        status.update(warmup_total=len(texts), warmup_done=0)
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix='indextts-warmup-') as tmp_dir:
+        for index, text in enumerate(texts):
+            t0 = time.perf_counter()
+            model.infer(
+                spk_audio_prompt=spk_audio_prompt,
+                text=text,
+                output_path=os.path.join(tmp_dir, f'warmup_{index}.wav'),
+                verbose=False
+            )
+            logger.info(f"预热 {index + 1}/{len(texts)}: {len(text)} 字, {time.perf_counter() - t0:.2f}s")
+            if status is not None:
+                status.update(warmup_done=index + 1)
+    return time.perf_counter() - start
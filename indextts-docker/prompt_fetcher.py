@@ -0,0 +1,208 @@
+"""
+URL 参考音频下载
+keep-alive 连接池 + 每个主机的并发上限，下载结果按内容哈希存入 PromptStore，
+按 URL 记录 ETag/Last-Modified，过期后用条件请求重新验证
+只下载白名单主机或公网地址上的文件，重定向逐跳检查
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import mimetypes
+from pathlib import Path
+from urllib.parse import urlsplit, urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from tts_scheduler import SingleFlight
+from url_guard import check_public_url
+
+logger = logging.getLogger(__name__)
+
+# Content-Type -> 扩展名，URL 路径里没有扩展名时使用
+CONTENT_TYPE_SUFFIXES = {
+    'audio/wav': '.wav',
+    'audio/x-wav': '.wav',
+    'audio/wave': '.wav',
+    'audio/mpeg': '.mp3',
+    'audio/mp3': '.mp3',
+    'audio/ogg': '.ogg',
+    'audio/flac': '.flac',
+    'audio/x-flac': '.flac',
+}
+
+AUDIO_SUFFIXES = ('.wav', '.mp3', '.ogg', '.flac', '.m4a', '.opus')
+
+# 最多跟随的重定向次数
+MAX_REDIRECTS = 5
+
+
+class PromptFetchError(RuntimeError):
+    """下载参考音频失败且没有可用的缓存"""
+
+
+class PromptFetcher:
+    """
+    参考音频下载器
+
+    - 同一 URL 在 revalidate_after 秒内直接使用本地文件，不发请求
+    - 超过时间后带 If-None-Match / If-Modified-Since 重新验证，304 时继续使用本地文件
+    - 同一 URL 的并发下载合并为一次；每个主机同时最多 per_host 个下载
+    - 源站不可用时，已有的本地文件继续使用
+    - URL 的元数据保存在存储目录旁的 JSON 文件中，重启后仍可做条件请求
+    - URL 及每次重定向的目标须在 allowed_hosts 中或解析到公网地址（allow_private 时不限），否则抛出 URLRejected
+    """
+
+    def __init__(self, store, per_host=4, pool_size=32, timeout=30, revalidate_after=300,
+                 allowed_hosts=(), allow_private=False):
+        self.store = store
+        self.per_host = per_host
+        self.timeout = timeout
+        self.revalidate_after = revalidate_after
+        self.allowed_hosts = {host.lower() for host in allowed_hosts}
+        self.allow_private = allow_private
+
+        self._http = requests.Session()
+        retry = Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504), allowed_methods=('GET',))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self._http.mount('http://', adapter)
+        self._http.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._host_slots = {}
+        self._inflight = SingleFlight()
+        self._meta_path = Path(str(store.root) + '.index.json')
+        self._entries = self._load_entries()
+        self.stats = {"hits": 0, "revalidated": 0, "downloaded": 0, "stale": 0, "errors": 0}
+
+    def fetch(self, url):
+        """
+        返回 (本地路径, 内容标识, 存储名)，文件已 pin 住，用完后需调用 store.unpin(存储名)
+        """
+        # 命中本地缓存时也检查，白名单收紧后旧 URL 不能继续使用
+        self.check_url(url)
+        for _ in range(2):
+            with self._lock:
+                entry = self._entries.get(url)
+            if entry is not None and time.time() - entry["checked_at"] < self.revalidate_after:
+                path = self.store.get(entry["name"], pin=True)
+                if path is not None:
+                    self.stats["hits"] += 1
+                    return str(path), entry["identity"], entry["name"]
+
+            entry, _ = self._inflight.do(url, lambda: self._refresh(url), timeout=self.timeout * 2)
+            path = self.store.get(entry["name"], pin=True)
+            if path is not None:
+                return str(path), entry["identity"], entry["name"]
+            # 刚下载的文件在 pin 之前被淘汰（配额过小时才会发生），重新下载一次
+            with self._lock:
+                self._entries.pop(url, None)
+        raise PromptFetchError(f"参考音频缓存空间不足: {url}")
+
+    def check_url(self, url):
+        check_public_url(url, self.allowed_hosts, self.allow_private, field='参考音频 URL')
+
+    def snapshot(self):
+        with self._lock:
+            return {"urls": len(self._entries), **self.stats, "store": self.store.snapshot()}
+
+    def _refresh(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+        if entry is not None and entry["name"] not in self.store:
+            entry = None
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers['If-None-Match'] = entry["etag"]
+            if entry.get("last_modified"):
+                headers['If-Modified-Since'] = entry["last_modified"]
+
+        try:
+            with self._host_slot(urlsplit(url).netloc):
+                with self._get(url, headers) as resp:
+                    if resp.status_code == 304 and entry is not None:
+                        self.stats["revalidated"] += 1
+                        return self._save_entry(url, {**entry, "checked_at": time.time()})
+                    resp.raise_for_status()
+                    resp.raw.decode_content = True
+                    _, identity, name = self.store.put_stream(resp.raw, suffix=self._suffix(url, resp))
+                    # 调用方各自再 pin 一次
+                    self.store.unpin(name)
+                    self.stats["downloaded"] += 1
+                    logger.info(f"已下载参考音频: {url} -> {name}")
+                    return self._save_entry(url, {
+                        "name": name,
+                        "identity": identity,
+                        "etag": resp.headers.get('ETag'),
+                        "last_modified": resp.headers.get('Last-Modified'),
+                        "checked_at": time.time(),
+                    })
+        except requests.RequestException as e:
+            self.stats["errors"] += 1
+            if entry is not None:
+                self.stats["stale"] += 1
+                logger.warning(f"重新验证参考音频失败，继续使用本地缓存: {url}, {str(e)}")
+                return entry
+            raise PromptFetchError(f"下载参考音频失败: {url}, {str(e)}")
+
+    def _get(self, url, headers):
+        """GET url，手动跟随重定向，每个目标地址先经过 check_url"""
+        for _ in range(MAX_REDIRECTS):
+            resp = self._http.get(url, headers=headers, stream=True, timeout=self.timeout, allow_redirects=False)
+            if not resp.is_redirect:
+                return resp
+            resp.close()
+            url = urljoin(url, resp.headers['Location'])
+            self.check_url(url)
+        raise PromptFetchError(f"参考音频 URL 重定向次数过多: {url}")
+
+    def _host_slot(self, host):
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    @staticmethod
+    def _suffix(url, resp):
+        suffix = os.path.splitext(urlsplit(url).path)[1].lower()
+        if suffix in AUDIO_SUFFIXES:
+            return suffix
+        content_type = resp.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        return CONTENT_TYPE_SUFFIXES.get(content_type) or mimetypes.guess_extension(content_type) or '.wav'
+
+    def _load_entries(self):
+        try:
+            with open(self._meta_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取参考音频 URL 索引失败: {str(e)}")
+            return {}
+        # 文件已不在存储中的条目丢弃
+        return {url: entry for url, entry in entries.items() if entry.get("name") in self.store}
+
+    def _save_entry(self, url, entry):
+        # 写文件串行进行，保证后写入的总是较新的快照
+        with self._save_lock:
+            with self._lock:
+                self._entries[url] = entry
+                # 顺便清理文件已被淘汰的 URL
+                self._entries = {u: e for u, e in self._entries.items() if e["name"] in self.store}
+                snapshot = dict(self._entries)
+            tmp_path = self._meta_path.with_suffix('.tmp')
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, ensure_ascii=False)
+                os.replace(tmp_path, self._meta_path)
+            except OSError as e:
+                logger.warning(f"保存参考音频 URL 索引失败: {str(e)}")
+        return entry
@@ -0,0 +1,111 @@
+"""
+参考音频存储
+上传的音色/情感参考音频按内容哈希落盘，相同音频只保存一份
+路径稳定，IndexTTS2 内部按路径缓存的音色条件可以跨请求复用
+"""
+
+import io
+import shutil
+import hashlib
+import logging
+import tempfile
+
+from tts_cache import DiskLRUCache
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class PromptTooLarge(ValueError):
+    """参考音频超过大小限制"""
+
+
+class PromptStore(DiskLRUCache):
+    """
+    内容寻址的参考音频存储
+
+    - 上传流边读边计算 sha256，数据先进入有上限的内存 spool，超过上限才落到匿名临时文件
+    - 已存在的音频直接复用，不再写盘
+    - 正在被请求使用的文件会被 pin 住，不参与 LRU 淘汰
+    """
+
+    def __init__(self, root, max_bytes, spool_max_bytes, upload_max_bytes):
+        super().__init__(root, max_bytes)
+        self.spool_max_bytes = spool_max_bytes
+        self.upload_max_bytes = upload_max_bytes
+
+    def put_bytes(self, audio_bytes, suffix='.wav'):
+        return self.put_stream(io.BytesIO(audio_bytes), suffix=suffix)
+
+    def put_stream(self, stream, suffix='.wav'):
+        """
+        保存参考音频并 pin 住
+        返回 (文件路径, 内容标识, 存储名)；用完后需调用 unpin(存储名)
+        """
+        digest = hashlib.sha256()
+        total = 0
+        with tempfile.SpooledTemporaryFile(max_size=self.spool_max_bytes) as spool:
+            while True:
+                chunk = stream.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                total += len(chunk)
+                if total > self.upload_max_bytes:
+                    raise PromptTooLarge(f"参考音频超过大小限制 {self.upload_max_bytes // 1024 // 1024}MB")
+                digest.update(chunk)
+                spool.write(chunk)
+
+            sha = digest.hexdigest()
+            name = f"prompt_{sha}{suffix}"
+            path = self.get(name, pin=True)
+            if path is None:
+                spool.seek(0)
+                staging_path = self.staging_path(name)
+                try:
+                    with open(staging_path, 'wb') as f:
+                        shutil.copyfileobj(spool, f, _CHUNK_SIZE)
+                    path = self.commit(name, staging_path, pin=True)
+                except BaseException:
+                    if staging_path.exists():
+                        staging_path.unlink()
+                    raise
+        return str(path), 'sha256:' + sha, name
+
+
+class PromptScope:
+    """
+    单个请求使用的参考音频集合
+    退出时释放所有 pin，保证任何返回路径上都不会残留占用
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._pins = []  # (存储, 存储名)
+
+    def put_bytes(self, audio_bytes, suffix='.wav'):
+        path, identity, name = self.store.put_bytes(audio_bytes, suffix=suffix)
+        self._pins.append((self.store, name))
+        return path, identity
+
+    def put_stream(self, stream, suffix='.wav'):
+        path, identity, name = self.store.put_stream(stream, suffix=suffix)
+        self._pins.append((self.store, name))
+        return path, identity
+
+    def fetch(self, fetcher, url):
+        """通过 PromptFetcher 获取 URL 参考音频，返回 (本地路径, 内容标识)"""
+        path, identity, name = fetcher.fetch(url)
+        self._pins.append((fetcher.store, name))
+        return path, identity
+
+    def close(self):
+        pins, self._pins = self._pins, []
+        for store, name in pins:
+            store.unpin(name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,306 @@
+"""
+多副本推理进程池
+启动 N 个工作进程，每个进程持有独立的 IndexTTS2 实例
+CPU 模式下每个进程绑定到各自的 CPU 核，并使用独立的 torch 线程数
+"""
+
+import os
+import sys
+import time
+import socket
+import logging
+import threading
+import itertools
+import subprocess
+from concurrent.futures import Future
+from multiprocessing.connection import Connection
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'replica_worker.py')
+
+
+class ReplicaError(RuntimeError):
+    """工作进程推理失败或已退出"""
+
+
+def partition_cpus(replicas, cpus=None):
+    """把可用 CPU 核平均分给各副本，返回每个副本的核列表"""
+    cpus = sorted(cpus if cpus is not None else os.sched_getaffinity(0))
+    per_replica = len(cpus) // replicas
+    if per_replica == 0:
+        # 核数少于副本数时不绑核，交给系统调度
+        return [None] * replicas
+    return [cpus[i * per_replica:(i + 1) * per_replica] for i in range(replicas)]
+
+
+def _format_cpus(cpus):
+    return ','.join(str(cpu) for cpu in cpus)
+
+
+class Replica:
+    """单个工作进程及其在途任务"""
+
+    def __init__(self, index, cpus=None, threads=None, env=None):
+        self.index = index
+        self.cpus = cpus
+        self.threads = threads
+        self.env = env or {}
+        self.process = None
+        self.conn = None
+        self.alive = False
+        self.ready = False
+        self.inflight = 0
+        self.completed = 0
+        self.failed = 0
+        self.last_prompt = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._pending = {}
+        self._send_lock = threading.Lock()
+
+    def snapshot(self):
+        return {
+            "index": self.index,
+            "pid": self.process.pid if self.process else None,
+            "cpus": _format_cpus(self.cpus) if self.cpus else None,
+            "threads": self.threads,
+            "alive": self.alive,
+            "ready": self.ready,
+            "inflight": self.inflight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+        }
+
+
+class ReplicaPool:
+    """
+    前端进程中的副本调度
+
+    - 每个副本通过一对 Unix socket 收发任务，任务和结果以 pickle 传输，音频经共享文件系统落盘
+    - 每次派发选在途任务最少的副本；负载相同时优先选上次处理过同一参考音频的副本，
+      复用该进程内 IndexTTS2 缓存的音色条件
+    - 工作进程意外退出时，在途任务以异常结束，并在后台重新拉起该副本
+    """
+
+    def __init__(self, replicas, model_kwargs, model_class='indextts.infer_v2:IndexTTS2', snapshot_dir=None,
+                 warmup=None, cpu_pinning=True, torch_threads=0, cuda_devices=None, restart_delay=5.0):
+        self.model_kwargs = model_kwargs
+        self.model_class = model_class
+        self.snapshot_dir = snapshot_dir
+        self.warmup = warmup or {}
+        self.restart_delay = restart_delay
+        self._task_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._closing = False
+
+        cpu_sets = partition_cpus(replicas) if cpu_pinning else [None] * replicas
+        self.replicas = []
+        for index, cpus in enumerate(cpu_sets):
+            threads = torch_threads or (len(cpus) if cpus else None)
+            env = {}
+            if threads:
+                # 必须在工作进程导入 numpy/torch 之前设置，OpenMP/MKL 线程池只在初始化时读取
+                env.update(OMP_NUM_THREADS=str(threads), MKL_NUM_THREADS=str(threads))
+            if cuda_devices:
+                env['CUDA_VISIBLE_DEVICES'] = cuda_devices[index % len(cuda_devices)]
+            self.replicas.append(Replica(index, cpus, threads, env))
+
+    def start(self, timeout=None):
+        """启动所有副本并等待加载/预热完成，返回就绪的副本数"""
+        for replica in self.replicas:
+            self._spawn(replica)
+        deadline = time.monotonic() + timeout if timeout else None
+        for replica in self.replicas:
+            self._wait_ready(replica, deadline)
+        ready = sum(1 for replica in self.replicas if replica.ready)
+        logger.info(f"推理副本已就绪: {ready}/{len(self.replicas)}")
+        return ready
+
+    @property
+    def load_seconds(self):
+        values = [r.load_seconds for r in self.replicas if r.load_seconds is not None]
+        return max(values) if values else None
+
+    @property
+    def warmup_seconds(self):
+        values = [r.warmup_seconds for r in self.replicas if r.warmup_seconds is not None]
+        return max(values) if values else None
+
+    def infer(self, **infer_kwargs):
+        """与 IndexTTS2.infer 相同的调用方式"""
+        result = self.infer_batch([infer_kwargs])[0]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    def infer_batch(self, batch, timeout=None):
+        """
+        把一批任务整体派发给一个副本，副本内背靠背执行
+        返回等长结果列表，失败的任务对应位置为异常实例
+        """
+        affinity = batch[0].get('spk_audio_prompt') if batch else None
+        task_id = next(self._task_ids)
+        future = Future()
+        replica = self._pick(affinity, len(batch), task_id, future)
+        try:
+            with replica._send_lock:
+                replica.conn.send((task_id, batch))
+        except (OSError, ValueError) as e:
+            self._finish(replica, task_id, len(batch), failed=True)
+            raise ReplicaError(f"副本 {replica.index} 不可用: {str(e)}")
+        try:
+            results = future.result(timeout=timeout)
+        finally:
+            self._finish(replica, task_id, len(batch))
+        outcomes = []
+        for ok, value in results:
+            if ok:
+                replica.completed += 1
+                outcomes.append(value)
+            else:
+                replica.failed += 1
+                outcomes.append(ReplicaError(value))
+        return outcomes
+
+    def inflight(self):
+        with self._lock:
+            return sum(replica.inflight for replica in self.replicas)
+
+    def snapshot(self):
+        with self._lock:
+            return [replica.snapshot() for replica in self.replicas]
+
+    def close(self, timeout=10):
+        """通知所有副本退出"""
+        self._closing = True
+        for replica in self.replicas:
+            if replica.conn is not None:
+                try:
+                    with replica._send_lock:
+                        replica.conn.send(None)
+                except (OSError, ValueError):
+                    pass
+        for replica in self.replicas:
+            if replica.process is not None:
+                try:
+                    replica.process.wait(timeout)
+                except subprocess.TimeoutExpired:
+                    replica.process.kill()
+
+    def _pick(self, affinity, size, task_id, future):
+        with self._lock:
+            candidates = [r for r in self.replicas if r.alive and r.ready]
+            if not candidates:
+                raise ReplicaError("没有可用的推理副本")
+            replica = min(candidates, key=lambda r: (r.inflight, r.last_prompt != affinity, r.index))
+            replica.inflight += size
+            replica.last_prompt = affinity
+            replica._pending[task_id] = future
+            return replica
+
+    def _finish(self, replica, task_id, size, failed=False):
+        with self._lock:
+            if replica._pending.pop(task_id, None) is not None:
+                replica.inflight -= size
+                if failed:
+                    replica.failed += size
+
+    def _spawn(self, replica):
+        parent_sock, child_sock = socket.socketpair()
+        cmd = [sys.executable, WORKER_SCRIPT, '--index', str(replica.index), '--fd', str(child_sock.fileno())]
+        if replica.cpus:
+            cmd += ['--cpus', _format_cpus(replica.cpus)]
+        if replica.threads:
+            cmd += ['--threads', str(replica.threads)]
+        replica.process = subprocess.Popen(
+            cmd,
+            pass_fds=(child_sock.fileno(),),
+            env={**os.environ, **replica.env},
+        )
+        child_sock.close()
+        replica.conn = Connection(parent_sock.detach())
+        replica.conn.send({
+            "model_kwargs": self.model_kwargs,
+            "model_class": self.model_class,
+            "snapshot_dir": self.snapshot_dir,
+            "warmup": self.warmup,
+        })
+        replica.alive = True
+        replica.ready = False
+        logger.info(
+            f"推理副本 {replica.index} 已启动: pid={replica.process.pid}, "
+            f"cpus={_format_cpus(replica.cpus) if replica.cpus else '-'}, threads={replica.threads or '-'}"
+        )
+
+    def _wait_ready(self, replica, deadline=None):
+        """读取副本的就绪消息，随后转入结果接收线程"""
+        try:
+            while not replica.conn.poll(1.0):
+                if replica.process.poll() is not None:
+                    raise EOFError(f"进程已退出，返回码 {replica.process.returncode}")
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError("等待副本就绪超时")
+            ok, info = replica.conn.recv()
+        except (EOFError, OSError, TimeoutError) as e:
+            logger.error(f"推理副本 {replica.index} 启动失败: {str(e)}")
+            self._on_exit(replica)
+            return
+        if not ok:
+            logger.error(f"推理副本 {replica.index} 加载模型失败: {info}")
+            self._on_exit(replica)
+            return
+        replica.load_seconds = info.get("load_seconds")
+        replica.warmup_seconds = info.get("warmup_seconds")
+        replica.ready = True
+        threading.Thread(
+            target=self._receive_loop, args=(replica, replica.conn),
+            name=f"replica-{replica.index}-recv", daemon=True
+        ).start()
+
+    def _receive_loop(self, replica, conn):
+        while True:
+            try:
+                task_id, results = conn.recv()
+            except (EOFError, OSError):
+                break
+            future = replica._pending.get(task_id)
+            if future is not None:
+                future.set_result(results)
+        if not self._closing:
+            logger.error(f"推理副本 {replica.index} 意外退出")
+        self._on_exit(replica)
+
+    def _on_exit(self, replica):
+        with self._lock:
+            replica.alive = False
+            replica.ready = False
+            replica.inflight = 0
+            pending, replica._pending = replica._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(ReplicaError(f"推理副本 {replica.index} 已退出"))
+        if replica.conn is not None:
+            replica.conn.close()
+            replica.conn = None
+        if not self._closing:
+            threading.Thread(target=self._restart, args=(replica,), name=f"replica-{replica.index}-restart",
+                             daemon=True).start()
+
+    def _restart(self, replica):
+        time.sleep(self.restart_delay)
+        if self._closing:
+            return
+        if replica.process is not None and replica.process.poll() is None:
+            replica.process.kill()
+            replica.process.wait()
+        logger.info(f"正在重启推理副本 {replica.index}")
+        try:
+            self._spawn(replica)
+        except OSError as e:
+            logger.error(f"推理副本 {replica.index} 重启失败: {str(e)}")
+            self._on_exit(replica)
+            return
+        self._wait_ready(replica)
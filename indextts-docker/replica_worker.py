@@ -0,0 +1,103 @@
+"""
+推理副本工作进程
+由 replica_pool 启动：绑定 CPU 核、加载 IndexTTS2、预热，然后循环执行前端派发的任务
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import traceback
+from multiprocessing.connection import Connection
+
+
+def pin_process(cpus):
+    """
+    把进程内所有线程绑定到指定 CPU 核
+    sched_setaffinity(0) 只作用于调用线程，已创建的线程需要逐个设置
+    """
+    os.sched_setaffinity(0, cpus)
+    for tid in os.listdir('/proc/self/task'):
+        try:
+            os.sched_setaffinity(int(tid), cpus)
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--index', type=int, required=True)
+    parser.add_argument('--fd', type=int, required=True)
+    parser.add_argument('--cpus', default='')
+    parser.add_argument('--threads', type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - replica-{args.index} - %(name)s - %(levelname)s - %(message)s'
+    )
+    logger = logging.getLogger(__name__)
+
+    # 先绑核再导入 torch，之后创建的计算线程都继承这组核
+    if args.cpus:
+        pin_process({int(cpu) for cpu in args.cpus.split(',')})
+
+    conn = Connection(args.fd)
+    init = conn.recv()
+
+    try:
+        if args.threads:
+            import torch
+            torch.set_num_threads(args.threads)
+            torch.set_num_interop_threads(1)
+
+        from model_lifecycle import PhaseTimer, construct_model, make_warmup_prompt, warm_up
+        from voice_registry import run_infer
+
+        t0 = time.perf_counter()
+        timer = PhaseTimer()
+        model = construct_model(init["model_class"], init["model_kwargs"], init.get("snapshot_dir"), timer)
+        load_seconds = round(time.perf_counter() - t0, 2)
+        logger.info(
+            f"模型加载完成: {load_seconds}s ({timer.summary()}), "
+            f"cpus={args.cpus or '-'}, threads={args.threads or '-'}"
+        )
+
+        warmup_seconds = None
+        warmup = init.get("warmup") or {}
+        if warmup.get("texts"):
+            spk_audio_prompt = warmup.get("spk_prompt") or make_warmup_prompt(tempfile.gettempdir())
+            try:
+                warmup_seconds = round(warm_up(model, warmup["texts"], spk_audio_prompt), 2)
+            except Exception as e:
+                logger.warning(f"模型预热失败: {str(e)}")
+    except Exception as e:
+        logger.error(traceback.format_exc())
+        conn.send((False, f"{type(e).__name__}: {str(e)}"))
+        return 1
+
+    conn.send((True, {"load_seconds": load_seconds, "warmup_seconds": warmup_seconds}))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        task_id, batch = message
+        results = []
+        for infer_kwargs in batch:
+            try:
+                results.append((True, run_infer(model, infer_kwargs)))
+            except Exception as e:
+                logger.error(f"推理失败: {str(e)}")
+                results.append((False, f"{type(e).__name__}: {str(e)}"))
+        conn.send((task_id, results))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
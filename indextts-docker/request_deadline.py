@@ -0,0 +1,165 @@
+"""
+请求截止时间与取消
+- 调用方通过 X-Request-Timeout（剩余秒数）或 X-Request-Deadline（Unix 时间戳，秒）传递截止时间
+- 排队中的推理任务过了截止时间直接丢弃，不再交给模型
+- 客户端断开连接时取消请求：排队中的任务撤回，分段合成在段与段之间停止
+正在执行的 infer() 无法中途打断，其结果照常写入缓存，客户端重试时直接命中
+"""
+
+import time
+import select
+import socket
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT_HEADER = 'X-Request-Timeout'
+DEADLINE_HEADER = 'X-Request-Deadline'
+
+
+class RequestCancelled(Exception):
+    """请求已被取消（客户端断开连接）"""
+    status = 499
+
+
+class DeadlineExceeded(RequestCancelled):
+    """请求已超过截止时间"""
+    status = 504
+
+
+class Cancellation:
+    """
+    单个请求的截止时间和取消状态，可以跨线程共享
+    deadline 为 time.monotonic() 时间；on_cancel() 登记的回调在取消时调用（用于撤回排队中的任务）
+    """
+
+    def __init__(self, deadline=None):
+        self.deadline = deadline
+        self.reason = None
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @classmethod
+    def after(cls, seconds):
+        return cls(time.monotonic() + seconds if seconds is not None else None)
+
+    def remaining(self):
+        """距截止时间的秒数，没有截止时间时返回 None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def limit(self, timeout):
+        """取 timeout 与剩余时间中较小的一个"""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return remaining if timeout is None else min(timeout, remaining)
+
+    @property
+    def cancelled(self):
+        return self.reason is not None or (self.deadline is not None and time.monotonic() >= self.deadline)
+
+    def cancel(self, reason="客户端已断开连接"):
+        with self._lock:
+            if self.reason is not None:
+                return
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        logger.info(f"请求已取消: {reason}")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"取消回调失败: {str(e)}")
+
+    def on_cancel(self, callback):
+        """登记取消回调；已取消时立即调用"""
+        with self._lock:
+            if self.reason is None:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def check(self):
+        """已取消或超过截止时间时抛出异常"""
+        if self.reason is not None:
+            raise RequestCancelled(self.reason)
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise DeadlineExceeded("请求已超过截止时间")
+
+    def error(self):
+        """与当前状态对应的异常实例（用于替换等待被中断时的 CancelledError / TimeoutError）"""
+        if self.reason is not None:
+            return RequestCancelled(self.reason)
+        return DeadlineExceeded("请求已超过截止时间")
+
+
+def parse_deadline(headers, default_timeout=None, max_timeout=None):
+    """
+    从请求头解析截止时间，返回 Cancellation
+    未指定时使用 default_timeout；超过 max_timeout 的截止时间按 max_timeout 截断；格式错误抛出 ValueError
+    """
+    timeout = default_timeout
+    if headers.get(TIMEOUT_HEADER):
+        timeout = float(headers[TIMEOUT_HEADER])
+    elif headers.get(DEADLINE_HEADER):
+        # 绝对时间依赖双方时钟同步，优先使用 X-Request-Timeout
+        timeout = float(headers[DEADLINE_HEADER]) - time.time()
+    if timeout is not None and max_timeout is not None:
+        timeout = min(timeout, max_timeout)
+    return Cancellation.after(timeout)
+
+
+class DisconnectWatcher:
+    """
+    检测同步（WSGI）请求的客户端是否已断开连接
+    后台线程定时用 select 检查登记的连接：可读且读到 EOF 表示对端已关闭，取消对应的请求
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._watched = {}  # socket -> Cancellation
+        self._thread = None
+        self.stats = {"disconnects": 0}
+
+    def watch(self, sock, cancellation):
+        with self._lock:
+            self._watched[sock] = cancellation
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="disconnect-watcher", daemon=True)
+                self._thread.start()
+
+    def unwatch(self, sock):
+        with self._lock:
+            self._watched.pop(sock, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                watched = dict(self._watched)
+            if not watched:
+                continue
+            try:
+                readable, _, _ = select.select(list(watched), [], [], 0)
+            except (OSError, ValueError):
+                # 有连接已关闭，逐个检查
+                readable = [sock for sock in watched if sock.fileno() >= 0]
+            for sock in readable:
+                if self._closed(sock):
+                    with self._lock:
+                        self._watched.pop(sock, None)
+                    self.stats["disconnects"] += 1
+                    watched[sock].cancel()
+
+    @staticmethod
+    def _closed(sock):
+        try:
+            return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b''
+        except (BlockingIOError, InterruptedError):
+            return False
+        except OSError:
+            return True
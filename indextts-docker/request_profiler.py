@@ -0,0 +1,353 @@
+"""
+按请求的性能剖析
+- 显式剖析：请求带 X-Profile 头（需要管理令牌），采集 cProfile、调用栈采样，以及 infer() 的 torch profiler 追踪
+- 抽样剖析：按比例随机选取请求，只做调用栈采样，开销很低，可以常开
+剖析覆盖处理请求的线程和执行推理的调度线程，结果保存在 PROFILE_DIR 下，超过数量上限时淘汰最旧的
+调用栈采样输出为 folded 格式，可直接交给 flamegraph.pl / speedscope 生成火焰图
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import re
+import random
+import pstats
+import shutil
+import cProfile
+import logging
+import threading
+from pathlib import Path
+from collections import Counter, OrderedDict
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+# 剖析结果文件
+PROFILE_ARTIFACTS = {
+    'stacks.folded': 'text/plain; charset=utf-8',  # 调用栈采样（火焰图输入）
+    'profile.prof': 'application/octet-stream',  # cProfile 原始数据，可用 snakeviz / pstats 打开
+    'profile.txt': 'text/plain; charset=utf-8',  # cProfile 按累计耗时排序的文本报告
+    'torch_trace.json': 'application/json',  # torch profiler 的 Chrome trace，可用 chrome://tracing / Perfetto 打开
+}
+
+# 剖析目录名（uuid4 十六进制）
+_PROFILE_ID = re.compile(r'^[0-9a-f]{32}$')
+
+# 当前线程正在采集的剖析
+_local = threading.local()
+
+# torch profiler 同一时刻只能有一个在运行
+_torch_lock = threading.Lock()
+
+
+def current():
+    """当前线程所属请求的剖析，没有时返回 None"""
+    return getattr(_local, 'session', None)
+
+
+def wrap(fn):
+    """把 fn 绑定到当前请求的剖析上，用于提交到其他线程执行的任务"""
+    session = current()
+    return fn if session is None else session.wrap(fn)
+
+
+def annotate(**fields):
+    """
+    给当前请求的剖析记录附加信息（文本长度、音色等），便于定位慢请求
+    已有的字段不覆盖：长文本分段合成时保留整段请求的信息
+    """
+    session = current()
+    if session is not None:
+        session.annotate(**{key: value for key, value in fields.items() if key not in session.meta})
+
+
+def profiling(session, trace=False):
+    """在当前线程中采集 session 的剖析；trace=True 时同时记录 torch profiler 追踪"""
+    if session is None:
+        return nullcontext()
+    return session.infer() if trace else session.activate()
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfileSession:
+    """
+    一个请求的剖析
+    attach()/detach() 把线程加入/移出剖析范围，可以嵌套；explicit 为 True 时每个线程各自运行 cProfile
+    """
+
+    def __init__(self, profile_id, explicit, interval=0.005, torch_trace=True, meta=None):
+        self.id = profile_id
+        self.explicit = explicit
+        self.interval = interval
+        self.torch_trace = explicit and torch_trace
+        self.meta = {
+            "id": profile_id,
+            "mode": "explicit" if explicit else "sampled",
+            "started_at": time.time(),
+            **(meta or {}),
+        }
+        self.stacks = Counter()
+        self.samples = 0
+        self.torch_profile = None
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._threads = {}  # 线程 id -> 嵌套层数
+        self._profilers = {}  # 线程 id -> cProfile.Profile
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name=f"profiler-{profile_id[:8]}", daemon=True)
+        self._sampler.start()
+
+    def annotate(self, **fields):
+        with self._lock:
+            self.meta.update(fields)
+
+    def attach(self):
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._threads.get(ident, 0)
+            self._threads[ident] = depth + 1
+        previous = current()
+        _local.session = self
+        if depth == 0 and self.explicit:
+            profiler = self._profilers.get(ident)
+            if profiler is None:
+                profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                self._profilers[ident] = profiler
+            except ValueError:
+                # Python 3.12+ 同一时刻只允许一个 cProfile，已有其他请求在剖析时只做调用栈采样
+                pass
+        return previous
+
+    def detach(self, previous=None):
+        ident = threading.get_ident()
+        with self._lock:
+            depth = self._threads.get(ident, 0) - 1
+            if depth > 0:
+                self._threads[ident] = depth
+            else:
+                self._threads.pop(ident, None)
+        if depth <= 0 and ident in self._profilers:
+            self._profilers[ident].disable()
+        _local.session = previous
+
+    @contextmanager
+    def activate(self):
+        previous = self.attach()
+        try:
+            yield self
+        finally:
+            self.detach(previous)
+
+    def wrap(self, fn):
+        def run(*args, **kwargs):
+            with self.activate():
+                return fn(*args, **kwargs)
+        return run
+
+    @contextmanager
+    def infer(self):
+        """剖析一次 infer() 调用：显式剖析且安装了 torch 时同时记录 torch profiler 追踪"""
+        with self.activate():
+            torch = sys.modules.get('torch')
+            if not self.torch_trace or torch is None or not _torch_lock.acquire(blocking=False):
+                yield self
+                return
+            try:
+                activities = [torch.profiler.ProfilerActivity.CPU]
+                if torch.cuda.is_available():
+                    activities.append(torch.profiler.ProfilerActivity.CUDA)
+                with torch.profiler.profile(activities=activities, record_shapes=True) as prof:
+                    yield self
+                self.torch_profile = prof
+            finally:
+                _torch_lock.release()
+
+    def _sample(self):
+        """后台线程：定时抓取所属线程的调用栈，按栈累计次数"""
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                idents = list(self._threads)
+            if not idents:
+                continue
+            frames = sys._current_frames()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def finish(self, **fields):
+        """停止采样，返回 {文件名: 内容}"""
+        self._stop.set()
+        self._sampler.join()
+        self.annotate(
+            duration=round(time.perf_counter() - self._started, 4),
+            samples=self.samples,
+            sample_interval_ms=self.interval * 1000,
+            threads=len(self._profilers) or None,
+            **fields
+        )
+
+        artifacts = {
+            'stacks.folded': ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()).encode('utf-8')
+        }
+        if self._profilers:
+            stats = None
+            for profiler in self._profilers.values():
+                # 各线程在 detach() 时已停止 cProfile；disable() 只作用于调用线程，这里不能再调用
+                profiler.snapshot_stats()
+                if not profiler.stats:
+                    continue
+                if stats is None:
+                    stats = pstats.Stats(_StatsSnapshot(profiler.stats))
+                else:
+                    stats.add(_StatsSnapshot(profiler.stats))
+            if stats is not None:
+                report = io.StringIO()
+                stats.stream = report
+                stats.sort_stats('cumulative').print_stats(60)
+                artifacts['profile.txt'] = report.getvalue().encode('utf-8')
+                artifacts['profile.prof'] = stats
+                self.meta['top_functions'] = _top_functions(stats, 20)
+        return artifacts
+
+
+class _StatsSnapshot:
+    """供 pstats.Stats 读取的已采集数据（pstats 对 Profile 对象会调用 disable()）"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def _top_functions(stats, limit):
+    """按累计耗时取前 limit 个函数"""
+    rows = []
+    for (filename, lineno, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{name} ({os.path.basename(filename)}:{lineno})",
+            "calls": ncalls,
+            "tottime": round(tottime, 4),
+            "cumtime": round(cumtime, 4),
+        })
+    rows.sort(key=lambda row: row["cumtime"], reverse=True)
+    return rows[:limit]
+
+
+class ProfileStore:
+    """
+    剖析结果存储：每个剖析一个目录（meta.json 和各结果文件），最多保留 max_entries 个
+    sample_rate 为抽样剖析的请求比例（0 ~ 1）
+    """
+
+    def __init__(self, root, max_entries=50, sample_rate=0.0, interval=0.005, torch_trace=True):
+        self.root = Path(root)
+        self.max_entries = max(1, int(max_entries))
+        self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        self.interval = interval
+        self.torch_trace = torch_trace
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # id -> meta
+        self.stats = {"explicit": 0, "sampled": 0, "evicted": 0}
+        # 剖析只用于排查问题，重启后不保留
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._remove_stale()
+
+    def _remove_stale(self):
+        """
+        删除上次运行留下的剖析：只处理剖析 ID 命名的目录和其中的结果文件，
+        PROFILE_DIR 指向共享目录时不会误删其他文件
+        """
+        names = set(PROFILE_ARTIFACTS) | {'meta.json'}
+        for directory in self.root.iterdir():
+            if not directory.is_dir() or directory.is_symlink() or not _PROFILE_ID.match(directory.name):
+                continue
+            for path in directory.iterdir():
+                if path.name in names and path.is_file():
+                    path.unlink(missing_ok=True)
+            try:
+                directory.rmdir()
+            except OSError:
+                logger.warning(f"剖析目录中有其他文件，未删除: {directory}")
+
+    def start(self, explicit=False, **meta):
+        """显式剖析或按 sample_rate 抽中时返回 ProfileSession，否则返回 None"""
+        if not explicit and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return None
+        with self._lock:
+            self.stats["explicit" if explicit else "sampled"] += 1
+        return ProfileSession(
+            uuid.uuid4().hex, explicit, interval=self.interval, torch_trace=self.torch_trace, meta=meta
+        )
+
+    def finish(self, session, **fields):
+        """结束剖析并保存结果"""
+        try:
+            artifacts = session.finish(**fields)
+            directory = self.root / session.id
+            directory.mkdir(parents=True, exist_ok=True)
+            for name, content in artifacts.items():
+                if isinstance(content, pstats.Stats):
+                    content.dump_stats(str(directory / name))
+                else:
+                    (directory / name).write_bytes(content)
+            if session.torch_profile is not None:
+                session.torch_profile.export_chrome_trace(str(directory / 'torch_trace.json'))
+            meta = dict(session.meta)
+            meta["artifacts"] = sorted(p.name for p in directory.iterdir())
+            (directory / 'meta.json').write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding='utf-8')
+        except Exception as e:
+            logger.warning(f"保存剖析结果失败: {session.id}, {str(e)}")
+            return None
+
+        evicted = []
+        with self._lock:
+            self._entries[session.id] = meta
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+                self.stats["evicted"] += 1
+        for profile_id in evicted:
+            shutil.rmtree(self.root / profile_id, ignore_errors=True)
+        logger.info(f"已保存剖析: {session.id} ({meta['mode']}, {meta['duration']}s, {meta['samples']} 次采样)")
+        return meta
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._entries.get(profile_id)
+
+    def artifact(self, profile_id, name):
+        """结果文件路径，不存在时返回 None"""
+        if name not in PROFILE_ARTIFACTS or self.get(profile_id) is None:
+            return None
+        path = self.root / profile_id / name
+        return path if path.is_file() else None
+
+    def list(self):
+        """最近的剖析，新的在前（不含函数明细）"""
+        with self._lock:
+            entries = list(self._entries.values())
+        return [
+            {key: value for key, value in meta.items() if key != 'top_functions'}
+            for meta in reversed(entries)
+        ]
+
+    def snapshot(self):
+        with self._lock:
+            return {"stored": len(self._entries), "sample_rate": self.sample_rate, **self.stats}
@@ -0,0 +1,138 @@
+"""
+同机共享内存交接
+- 经 Unix 套接字连接的同机调用方可以请求 response_mode=shm：结果音频放到 /dev/shm 下，响应中只返回路径和元数据
+- 调用方直接读取（或 mmap）该文件，读完后确认（ack）释放；音频不再经过 base64 编码和回环 TCP
+- 交接目录与结果目录在同一文件系统时用硬链接，不复制；默认结果在磁盘上而交接目录在 /dev/shm，每次交接复制一次文件
+- 每次交接是一个租约：未确认的租约超过 ttl 自动回收，防止调用方异常退出时占满共享内存
+"""
+
+import os
+import re
+import time
+import uuid
+import shutil
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# 标记请求来自本机 Unix 套接字的 WSGI environ 键
+LOCAL_TRANSPORT_KEY = 'indextts.local_transport'
+
+# 交接文件名：租约 id（uuid4 十六进制）+ 原扩展名，复制中的临时文件以 . 开头、.tmp 结尾
+_LEASE_FILE = re.compile(r'^\.?[0-9a-f]{32}(\.[A-Za-z0-9]+)?(\.tmp)?$')
+
+
+class HandoffFull(Exception):
+    """交接区已满（未确认的租约过多）"""
+
+
+def local_transport(wsgi_app):
+    """包装 WSGI 应用：经此进入的请求标记为本机连接，可以使用 shm 返回方式"""
+    def run(environ, start_response):
+        environ[LOCAL_TRANSPORT_KEY] = True
+        return wsgi_app(environ, start_response)
+    return run
+
+
+class HandoffStore:
+    """
+    交接区：root 下每个租约一个文件，总大小不超过 max_bytes
+    与源文件在同一文件系统时用硬链接（不复制），否则复制一次（shutil.copyfile，Linux 上为内核内的 sendfile）
+    source_dir 为结果文件所在目录，用于启动时说明交接是否需要复制
+    """
+
+    def __init__(self, root, ttl=60.0, max_bytes=512 * 1024 * 1024, source_dir=None):
+        self.root = Path(root)
+        self.ttl = ttl
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._leases = {}  # 租约 id -> (路径, 大小, 过期时刻)
+        self._total = 0
+        self._reaper = None
+        self.stats = {"handoffs": 0, "linked": 0, "copied": 0, "acked": 0, "expired": 0, "rejected": 0}
+        self.root.mkdir(parents=True, exist_ok=True)
+        os.chmod(self.root, 0o755)
+        # 上次运行遗留的交接文件没有租约，启动时删除；只删除租约文件，SHM_HANDOFF_DIR 中的其他文件不动
+        for entry in os.scandir(self.root):
+            if _LEASE_FILE.match(entry.name) and entry.is_file(follow_symlinks=False):
+                os.unlink(entry.path)
+        if source_dir is not None and os.stat(source_dir).st_dev != os.stat(self.root).st_dev:
+            logger.info(f"交接目录 {self.root} 与结果目录 {source_dir} 不在同一文件系统，每次交接复制一次文件")
+
+    def put(self, source):
+        """为 source 建立租约，返回 dict: lease / path / size / expires_in；交接区已满时抛出 HandoffFull"""
+        size = os.path.getsize(source)
+        lease = uuid.uuid4().hex
+        with self._lock:
+            if self._total + size > self.max_bytes:
+                self.stats["rejected"] += 1
+                raise HandoffFull(f"共享内存交接区已满（{self._total} 字节未确认）")
+            self._total += size
+        path = self.root / f"{lease}{Path(source).suffix}"
+        try:
+            try:
+                os.link(source, path)
+                linked = True
+            except OSError:
+                tmp = path.with_name(f".{path.name}.tmp")
+                shutil.copyfile(source, tmp)
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, path)
+                linked = False
+        except BaseException:
+            with self._lock:
+                self._total -= size
+            raise
+        with self._lock:
+            self._leases[lease] = (path, size, time.monotonic() + self.ttl)
+            self.stats["handoffs"] += 1
+            self.stats["linked" if linked else "copied"] += 1
+        self._ensure_reaper()
+        return {"lease": lease, "path": str(path), "size": size, "expires_in": self.ttl}
+
+    def ack(self, lease):
+        """调用方读完后释放租约，租约不存在（已确认或已过期）时返回 False"""
+        with self._lock:
+            entry = self._leases.pop(lease, None)
+            if entry is None:
+                return False
+            self._total -= entry[1]
+            self.stats["acked"] += 1
+        entry[0].unlink(missing_ok=True)
+        return True
+
+    def _ensure_reaper(self):
+        if self._reaper is not None:
+            return
+        with self._lock:
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, name="shm-handoff-reaper", daemon=True)
+                self._reaper.start()
+
+    def _reap(self):
+        """后台线程：回收过期未确认的租约"""
+        while True:
+            time.sleep(max(1.0, self.ttl / 4))
+            now = time.monotonic()
+            with self._lock:
+                expired = [lease for lease, (_, _, deadline) in self._leases.items() if deadline <= now]
+                entries = [self._leases.pop(lease) for lease in expired]
+                for _, size, _ in entries:
+                    self._total -= size
+                self.stats["expired"] += len(entries)
+            for path, _, _ in entries:
+                path.unlink(missing_ok=True)
+            if entries:
+                logger.warning(f"回收 {len(entries)} 个未确认的共享内存租约")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "dir": str(self.root),
+                "leases": len(self._leases),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                **self.stats,
+            }
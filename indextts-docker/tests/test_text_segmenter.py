@@ -0,0 +1,34 @@
+"""
+文本切分：合并句子、拼接片段时保留原文空白，中文切分结果不变
+运行：cd indextts-docker && python -m pytest tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_segmenter import segment_text, split_sentences  # noqa: E402
+
+
+def test_english_segments_keep_spaces():
+    text = 'Hello there. How are you today? I am fine thanks.'
+    assert segment_text(text, 40) == ['Hello there. How are you today?', 'I am fine thanks.']
+
+
+def test_english_short_sentences_merge_with_space():
+    assert split_sentences('Hi. Hello world.') == ['Hi. Hello world.']
+    assert split_sentences('Hello world. Ok.') == ['Hello world. Ok.']
+
+
+def test_long_english_sentence_split_at_clauses():
+    text = 'First clause here, second clause here, third clause here.'
+    segments = segment_text(text, 25)
+    assert all(len(segment) <= 25 for segment in segments)
+    assert ' '.join(segments) == text
+
+
+def test_chinese_segments_unchanged():
+    text = '今天天气很好。我们去公园散步吧！你觉得怎么样？'
+    assert split_sentences(text) == ['今天天气很好。', '我们去公园散步吧！', '你觉得怎么样？']
+    assert segment_text(text, 16) == ['今天天气很好。我们去公园散步吧！', '你觉得怎么样？']
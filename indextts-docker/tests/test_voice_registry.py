@@ -0,0 +1,82 @@
+"""
+音色注册表：删除后重新注册同名音色不能沿用旧音色的条件
+运行：cd indextts-docker && python -m pytest tests
+"""
+
+import os
+import sys
+import json
+import types
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_utils import write_audio  # noqa: E402
+from voice_registry import VoiceRegistry, LEGACY_PROMPT_FILE, capture_conditioning, forget_prompt  # noqa: E402
+
+SAMPLE_RATE = 22050
+
+
+def _tone(path, frequency, seconds=1.0):
+    t = np.arange(int(SAMPLE_RATE * seconds), dtype=np.float32) / SAMPLE_RATE
+    write_audio(path, (0.5 * np.sin(2 * np.pi * frequency * t))[:, None], SAMPLE_RATE)
+    return str(path)
+
+
+def _cached_model(prompt):
+    """模拟已按 prompt 提取过条件的 IndexTTS2"""
+    return types.SimpleNamespace(
+        cache_spk_cond=object(),
+        cache_spk_audio_prompt=prompt,
+        cache_emo_audio_prompt=prompt,
+    )
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return VoiceRegistry(tmp_path / 'voices', sample_rate=SAMPLE_RATE)
+
+
+def test_recreated_voice_gets_new_prompt_path(registry, tmp_path):
+    first = registry.create(_tone(tmp_path / 'a.wav', 220), voice_id='narrator')
+    old_prompt, old_id, _ = registry.infer_spec('narrator')
+    model = _cached_model(old_prompt)
+
+    assert registry.delete('narrator') == old_prompt
+    assert forget_prompt(model, old_prompt)
+    assert model.cache_spk_audio_prompt is None and model.cache_emo_audio_prompt is None
+
+    second = registry.create(_tone(tmp_path / 'b.wav', 440), voice_id='narrator')
+    new_prompt, new_id, voice = registry.infer_spec('narrator')
+    assert first["id"] == second["id"]
+    assert new_prompt != old_prompt
+    assert new_id != old_id
+    assert os.path.exists(new_prompt) and not os.path.exists(old_prompt)
+    assert voice["conditioning"] is None
+
+
+def test_stale_model_cache_is_not_captured_for_recreated_voice(registry, tmp_path):
+    registry.create(_tone(tmp_path / 'a.wav', 220), voice_id='narrator')
+    old_prompt = registry.prompt_path('narrator')
+    # 副本进程中的模型无法清理缓存，仍指向旧音色的参考音频
+    model = _cached_model(old_prompt)
+    registry.delete('narrator')
+
+    registry.create(_tone(tmp_path / 'b.wav', 440), voice_id='narrator')
+    path = registry.conditioning_path('narrator')
+    assert not capture_conditioning(model, registry.prompt_path('narrator'), path)
+    assert not os.path.exists(path)
+
+
+def test_legacy_prompt_file_is_loaded(tmp_path):
+    voice_dir = tmp_path / 'voices' / 'old'
+    voice_dir.mkdir(parents=True)
+    _tone(voice_dir / LEGACY_PROMPT_FILE, 220)
+    with open(voice_dir / 'voice.json', 'w', encoding='utf-8') as f:
+        json.dump({"id": "old", "name": "old", "sha256": "0" * 64, "conditioning": False, "created_at": 0}, f)
+
+    registry = VoiceRegistry(tmp_path / 'voices', sample_rate=SAMPLE_RATE)
+    assert registry.prompt_path('old') == str(voice_dir / LEGACY_PROMPT_FILE)
+    assert 'prompt_file' not in registry.describe('old')
@@ -0,0 +1,99 @@
+"""
+文本切分工具
+按句末标点把长文本切成句子，供流式合成等场景使用
+"""
+
+import re
+
+# 句末标点（含紧随其后的引号/括号）、英文句点 + 空白、换行
+_SENTENCE_END = re.compile(r'([。！？!?；;…]+[”’"\'』」）)]*|\.(?=\s|$)[”’"\')]*|\n+)')
+
+
+def _sentence_chunks(text, min_length=4):
+    """
+    按句末标点切分，返回原文片段（含句间空白，依次拼接即为原文）
+    短于 min_length 的片段并入相邻的句子
+    """
+    parts = _SENTENCE_END.split(text)
+    chunks = []
+    buf = ''
+    for i, part in enumerate(parts):
+        buf += part
+        # split 带捕获组时，奇数下标是分隔符
+        if i % 2 == 1 and len(buf.strip()) >= min_length:
+            chunks.append(buf)
+            buf = ''
+    if buf.strip():
+        if chunks and len(buf.strip()) < min_length:
+            chunks[-1] += buf
+        else:
+            chunks.append(buf)
+    elif chunks:
+        chunks[-1] += buf
+    return chunks
+
+
+def split_sentences(text, min_length=4):
+    """
+    按句末标点切分文本，标点保留在句尾
+    短于 min_length 的片段并入下一句，避免对只有一两个字的片段单独推理；合并时保留原文中的空白（英文句间的空格）
+    """
+    return [chunk.strip() for chunk in _sentence_chunks(text, min_length)]
+
+
+# 句内停顿标点，句子过长时在这里断开
+_CLAUSE_END = re.compile(r'([，,、：:—]+)')
+
+
+def _split_long(sentence, max_length):
+    """把超长句子在分句标点处断开，仍然过长的片段按长度硬切；返回原文片段（保留空白）"""
+    pieces = []
+    buf = ''
+    parts = _CLAUSE_END.split(sentence)
+    for i, part in enumerate(parts):
+        if i % 2 == 0 and buf and len(buf) + len(part) > max_length:
+            pieces.append(buf)
+            buf = ''
+        buf += part
+    if buf:
+        pieces.append(buf)
+
+    result = []
+    for piece in pieces:
+        while len(piece) > max_length:
+            result.append(piece[:max_length])
+            piece = piece[max_length:]
+        if piece.strip():
+            result.append(piece)
+    return [piece for piece in result if piece.strip()]
+
+
+def segment_text(text, max_length):
+    """
+    把长文本切成不超过 max_length 的片段，优先在句末、其次在分句标点处断开
+    片段长度尽量均衡，便于并行合成时各片段耗时接近；片段由原文切出，句间空白保持不变
+    """
+    text = text.strip()
+    if len(text) <= max_length:
+        return [text]
+
+    units = []
+    for sentence in _sentence_chunks(text, min_length=1):
+        if len(sentence) > max_length:
+            units.extend(_split_long(sentence, max_length))
+        else:
+            units.append(sentence)
+
+    # 目标长度按片段数平均分配，避免出现 500 + 500 + 20 这样的切法
+    count = -(-len(text) // max_length)
+    target = -(-len(text) // count)
+    segments = []
+    buf = ''
+    for unit in units:
+        if buf.strip() and (len(buf) + len(unit) > max_length or len(buf) >= target):
+            segments.append(buf.strip())
+            buf = ''
+        buf += unit
+    if buf.strip():
+        segments.append(buf.strip())
+    return segments
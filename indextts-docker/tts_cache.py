@@ -0,0 +1,225 @@
+"""
+TTS 结果缓存
+按内容寻址：缓存键覆盖文本、参考音频内容哈希和全部采样参数
+输出目录受字节配额约束，超出时按 LRU 淘汰
+"""
+
+import os
+import json
+import uuid
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# 写入中的临时文件标记，启动扫描时会被清理
+STAGING_MARK = '.part.'
+
+
+def make_cache_key(text, spk_audio_id, emo_audio_id, params, output_format, audio_params=None):
+    """计算结果缓存键（sha256 十六进制）"""
+    payload = {
+        "text": text,
+        "spk": spk_audio_id,
+        "emo": emo_audio_id,
+        "params": params,
+        "format": output_format,
+    }
+    if audio_params:
+        # 未指定后处理参数时键与旧版本一致，已有缓存继续有效
+        payload["audio"] = audio_params
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class DiskLRUCache:
+    """
+    目录级 LRU 缓存
+
+    - 内存中维护 文件名 -> 字节数 的有序索引，查询时不扫描目录
+    - 仅在启动时扫描一次目录重建索引（按修改时间排序）
+    - 总字节数超过 max_bytes 时从最久未使用的文件开始删除，被 pin 住的文件跳过
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self._index = OrderedDict()
+        self._pins = {}
+        self._total = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._rebuild_index()
+
+    def _rebuild_index(self):
+        entries = []
+        for entry in os.scandir(self.root):
+            if not entry.is_file():
+                continue
+            if STAGING_MARK in entry.name:
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+                continue
+            st = entry.stat()
+            entries.append((st.st_mtime, entry.name, st.st_size))
+        entries.sort()
+        for _, name, size in entries:
+            self._index[name] = size
+            self._total += size
+        logger.info(f"缓存索引已加载: {self.root}, {len(self._index)} 个文件, {self._total / 1024 / 1024:.1f}MB")
+        with self._lock:
+            self._evict_locked()
+
+    def path_for(self, name):
+        return self.root / name
+
+    def staging_path(self, name):
+        """返回写入用的临时路径（保留原扩展名，方便按扩展名推断格式）"""
+        stem, dot, ext = name.rpartition('.')
+        if not dot:
+            stem, ext = name, ''
+        return self.root / f"{stem}.{uuid.uuid4().hex[:8]}{STAGING_MARK}{ext}"
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._index
+
+    def get(self, name, pin=False):
+        """命中时返回文件路径并标记为最近使用，否则返回 None"""
+        with self._lock:
+            if name not in self._index:
+                self.stats["misses"] += 1
+                return None
+            self._index.move_to_end(name)
+            self.stats["hits"] += 1
+            if pin:
+                self._pins[name] = self._pins.get(name, 0) + 1
+        return self.path_for(name)
+
+    def unpin(self, name):
+        """释放 get/commit 时加的 pin，文件重新参与淘汰"""
+        with self._lock:
+            count = self._pins.get(name, 0) - 1
+            if count > 0:
+                self._pins[name] = count
+            else:
+                self._pins.pop(name, None)
+            self._evict_locked()
+
+    def discard(self, name):
+        """从索引中移除（文件已被外部删除时使用）"""
+        with self._lock:
+            size = self._index.pop(name, None)
+            if size is not None:
+                self._total -= size
+
+    def commit(self, name, staging_path, pin=False):
+        """把写好的临时文件原子地移动到缓存位置并登记"""
+        final_path = self.path_for(name)
+        os.replace(staging_path, final_path)
+        size = final_path.stat().st_size
+        with self._lock:
+            old = self._index.pop(name, None)
+            if old is not None:
+                self._total -= old
+            self._index[name] = size
+            self._total += size
+            if pin:
+                self._pins[name] = self._pins.get(name, 0) + 1
+            self._evict_locked(keep=name)
+        return final_path
+
+    def clear(self):
+        """删除所有未被 pin 住的文件，返回删除的文件数"""
+        with self._lock:
+            names = [name for name in self._index if name not in self._pins]
+            for name in names:
+                self._total -= self._index.pop(name)
+                try:
+                    os.unlink(self.path_for(name))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"删除缓存文件失败: {name}, {str(e)}")
+        return len(names)
+
+    def _evict_locked(self, keep=None):
+        if self._total <= self.max_bytes:
+            return
+        for name in list(self._index):
+            if self._total <= self.max_bytes:
+                break
+            if name == keep or name in self._pins:
+                continue
+            self._total -= self._index.pop(name)
+            try:
+                os.unlink(self.path_for(name))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"删除缓存文件失败: {name}, {str(e)}")
+            self.stats["evictions"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            hits, misses = self.stats["hits"], self.stats["misses"]
+            return {
+                "files": len(self._index),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                **self.stats,
+            }
+
+
+class CachePins:
+    """
+    一次请求（或一次分段拼接）对缓存文件加的 pin，close() 时统一释放
+    读取、发送、拼接结果文件期间文件不会被其他请求的写入淘汰；可在多个线程中共用
+    close() 之后才完成的 get/commit（如已被取消、仍在运行的分段）不再保留 pin
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._names = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """同 DiskLRUCache.get，命中时 pin 住"""
+        path = self.cache.get(name, pin=True)
+        if path is not None:
+            self._hold(name)
+        return path
+
+    def commit(self, name, staging_path):
+        """同 DiskLRUCache.commit，登记后 pin 住"""
+        path = self.cache.commit(name, staging_path, pin=True)
+        self._hold(name)
+        return path
+
+    def _hold(self, name):
+        with self._lock:
+            if not self._closed:
+                self._names.append(name)
+                return
+        self.cache.unpin(name)
+
+    def close(self):
+        with self._lock:
+            names, self._names = self._names, []
+            self._closed = True
+        for name in names:
+            self.cache.unpin(name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,178 @@
+"""
+异步 TTS 任务
+提交后立即返回任务 ID，由有界工作线程池执行，支持轮询进度和完成回调
+完成回调只发往白名单主机或公网地址，由单独的线程发送，回调慢不占用任务线程
+"""
+
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from url_guard import check_public_url, URLRejected
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """排队中的任务数已达上限"""
+
+
+class WebhookRejected(ValueError):
+    """webhook_url 不允许使用"""
+
+
+class TTSJob:
+    """单个异步任务的状态"""
+
+    def __init__(self, webhook_url=None):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'  # queued / running / done / failed
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.webhook_url = webhook_url
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def set_progress(self, done, total):
+        if total > 0:
+            self.progress = round(min(1.0, done / float(total)), 4)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    任务管理器
+
+    - max_workers 个工作线程执行任务，HTTP 线程只负责提交
+    - 排队 + 执行中的任务超过 max_pending 时拒绝新任务
+    - 已结束的任务保留 result_ttl 秒供查询
+    - webhook_url 的主机在 webhook_allowed_hosts 中时直接放行，否则必须解析到公网地址（webhook_allow_private 时不限）
+    """
+
+    def __init__(self, max_workers=4, max_pending=256, result_ttl=3600, webhook_timeout=10,
+                 webhook_allowed_hosts=(), webhook_allow_private=False, webhook_workers=2):
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.webhook_timeout = webhook_timeout
+        self.webhook_allowed_hosts = {host.lower() for host in webhook_allowed_hosts}
+        self.webhook_allow_private = webhook_allow_private
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tts-job')
+        self._webhook_executor = ThreadPoolExecutor(max_workers=webhook_workers, thread_name_prefix='tts-webhook')
+        self._jobs = {}
+        self._active = 0
+        self._webhooks_pending = 0
+        self._lock = threading.Lock()
+        self._http = requests.Session()
+
+    def submit(self, fn, webhook_url=None, on_finish=None):
+        """
+        提交任务；fn(job) 返回结果 dict，可调用 job.set_progress() 汇报进度
+        on_finish 在任务结束（无论成功失败）后调用，用于释放资源
+        webhook_url 应已经过 check_webhook() 检查
+        """
+        job = TTSJob(webhook_url)
+        with self._lock:
+            self._purge_locked()
+            if self._active >= self.max_pending:
+                raise JobQueueFull(f"排队任务数已达上限 {self.max_pending}")
+            self._active += 1
+            self._jobs[job.id] = job
+        try:
+            self._executor.submit(self._run, job, fn, on_finish)
+        except BaseException:
+            with self._lock:
+                self._active -= 1
+                self._jobs.pop(job.id, None)
+            raise
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {
+                "active": self._active, "max_pending": self.max_pending,
+                "webhooks_pending": self._webhooks_pending, **counts
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        self._webhook_executor.shutdown(wait=wait)
+
+    def check_webhook(self, url):
+        """检查 webhook_url：HTTP(S)、主机在白名单中或解析到的地址全部为公网地址"""
+        try:
+            check_public_url(url, self.webhook_allowed_hosts, self.webhook_allow_private, field='webhook_url')
+        except URLRejected as e:
+            raise WebhookRejected(str(e))
+
+    def _run(self, job, fn, on_finish):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = fn(job)
+            job.progress = 1.0
+            job.status = 'done'
+        except Exception as e:
+            logger.error(f"异步任务失败: {job.id}, {str(e)}")
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._active -= 1
+            if on_finish is not None:
+                try:
+                    on_finish()
+                except Exception as e:
+                    logger.warning(f"任务清理失败: {job.id}, {str(e)}")
+        if job.webhook_url:
+            with self._lock:
+                self._webhooks_pending += 1
+            self._webhook_executor.submit(self._notify, job)
+
+    def _notify(self, job):
+        """完成回调：向 webhook_url POST 任务状态；发送前重新检查地址（DNS 可能已变化），不跟随重定向"""
+        try:
+            self.check_webhook(job.webhook_url)
+            resp = self._http.post(
+                job.webhook_url, json=job.to_dict(), timeout=self.webhook_timeout, allow_redirects=False
+            )
+            if resp.status_code >= 400:
+                logger.warning(f"任务回调返回错误: {job.id}, HTTP {resp.status_code}")
+        except Exception as e:
+            logger.warning(f"任务回调失败: {job.id}, {str(e)}")
+        finally:
+            with self._lock:
+                self._webhooks_pending -= 1
+
+    def _purge_locked(self):
+        deadline = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < deadline
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
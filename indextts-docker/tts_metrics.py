@@ -0,0 +1,127 @@
+"""
+Prometheus 监控指标
+按阶段统计 TTS 请求耗时，区分推理本身和包裹在外面的 I/O
+"""
+
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+import tts_tracing
+
+# 请求各阶段：
+#   parse          解析请求体（JSON / multipart / 原始音频）
+#   prompt_decode  参考音频 base64 解码
+#   prompt_write   参考音频写入 prompt_store
+#   prompt_fetch   获取 URL 参考音频（含缓存命中和条件请求）
+#   queue_wait     在调度队列中等待
+#   infer          模型推理
+#   postprocess    重采样、响度归一化
+#   audio_encode   编码为 wav/mp3/ogg/opus
+#   output_read    读取生成的音频文件
+#   encode         音频 base64 编码
+STAGE_SECONDS = Histogram(
+    'indextts_stage_seconds',
+    'TTS 请求各阶段耗时（秒）',
+    ['stage'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+REQUEST_SECONDS = Histogram(
+    'indextts_request_seconds',
+    'TTS 接口端到端耗时（秒）',
+    ['endpoint'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+REQUESTS = Counter(
+    'indextts_requests_total',
+    'TTS 接口请求数',
+    ['endpoint', 'status'],
+)
+
+INFLIGHT_REQUESTS = Gauge(
+    'indextts_inflight_requests',
+    '正在处理的 TTS 请求数（含流式响应）',
+)
+
+REALTIME_FACTOR = Histogram(
+    'indextts_realtime_factor',
+    '单次合成的实时率：音频时长 / 合成耗时',
+    buckets=(0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10, 20),
+)
+
+AUDIO_SECONDS = Counter(
+    'indextts_audio_seconds_total',
+    '合成的音频总时长（秒），不含缓存命中',
+)
+
+SYNTHESIS_SECONDS = Counter(
+    'indextts_synthesis_seconds_total',
+    '合成的总耗时（秒），不含缓存命中',
+)
+
+INCREMENTAL_SENTENCES = Counter(
+    'indextts_incremental_sentences_total',
+    '增量合成的句子数（reused 为取自缓存，synthesized 为重新合成）',
+    ['result'],
+)
+
+QUEUE_DEPTH = Gauge(
+    'indextts_queue_depth',
+    '调度队列中等待推理的任务数',
+)
+
+INFLIGHT_COST = Gauge(
+    'indextts_admission_inflight_cost',
+    '已准入请求的估算工作量（字符数 × num_beams）',
+)
+
+CACHE_HIT_RATIO = Gauge(
+    'indextts_cache_hit_ratio',
+    '结果缓存命中率',
+)
+
+CACHE_BYTES = Gauge(
+    'indextts_cache_bytes',
+    '结果缓存占用字节数',
+)
+
+MODEL_LOAD_SECONDS = Gauge(
+    'indextts_model_load_seconds',
+    '模型加载耗时（秒）',
+)
+
+MODEL_WARMUP_SECONDS = Gauge(
+    'indextts_model_warmup_seconds',
+    '模型预热耗时（秒）',
+)
+
+MODEL_READY = Gauge(
+    'indextts_model_ready',
+    '模型是否就绪（1 / 0）',
+)
+
+
+@contextmanager
+def stage(name):
+    """计时上下文管理器：with stage('infer'): ...；请求在追踪中时同时记录同名 span"""
+    with STAGE_SECONDS.labels(stage=name).time(), tts_tracing.span(name):
+        yield
+
+
+def observe_stage(name, seconds):
+    STAGE_SECONDS.labels(stage=name).observe(seconds)
+
+
+def observe_synthesis(audio_seconds, wall_seconds):
+    """记录一次实际合成（非缓存命中）的音频时长和耗时"""
+    AUDIO_SECONDS.inc(audio_seconds)
+    SYNTHESIS_SECONDS.inc(wall_seconds)
+    if wall_seconds > 0:
+        REALTIME_FACTOR.observe(audio_seconds / wall_seconds)
+
+
+def render():
+    """返回 (响应体, Content-Type)"""
+    return generate_latest(), CONTENT_TYPE_LATEST
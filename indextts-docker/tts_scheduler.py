@@ -0,0 +1,236 @@
+"""
+IndexTTS2 推理调度器
+把并发到达的 TTS 请求收集到队列中，按批次交给模型执行
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import Future
+
+from request_deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class TTSTask:
+    """单个待执行的推理任务；deadline 为 time.monotonic() 截止时间，过期后不再执行"""
+
+    def __init__(self, group_key, infer_kwargs, deadline=None):
+        self.group_key = group_key
+        self.infer_kwargs = infer_kwargs
+        self.deadline = deadline
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class BatchScheduler:
+    """
+    动态微批调度器
+
+    - 所有推理都在调度线程中执行，HTTP 线程之间不再争抢同一个模型实例
+    - 同一音色参考音频、同一组采样参数的请求（group_key 相同）会被归为一批
+    - 每批最多 batch_size 个任务；凑不满时最多等待 max_wait 秒
+    - workers 为调度线程数，多副本部署时每个副本对应一个调度线程
+    - batch_infer_fn(kwargs 列表) 返回等长结果列表，单个元素为异常实例时表示该任务失败
+    - on_dispatch(task) 在任务出队交给模型时调用，用于统计排队时间
+    - 出队时已被调用方取消或已过截止时间的任务直接丢弃，过载时队列不会被没人等待的任务拖垮
+    """
+
+    def __init__(self, infer_fn, batch_size=1, max_wait=0.02, batch_infer_fn=None, workers=1, on_dispatch=None):
+        self.infer_fn = infer_fn
+        self.batch_infer_fn = batch_infer_fn
+        self.on_dispatch = on_dispatch
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max(0.0, float(max_wait))
+        self.workers = max(1, int(workers))
+
+        self._pending = []
+        self._cond = threading.Condition()
+        self._threads = []
+        self._running = False
+
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "batches": 0,
+            "max_batch": 0,
+            "cancelled": 0,
+            "expired": 0,
+        }
+
+    def start(self):
+        """启动调度线程"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"tts-scheduler-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(
+            f"TTS 调度器已启动: batch_size={self.batch_size}, max_wait={self.max_wait * 1000:.0f}ms, "
+            f"workers={self.workers}"
+        )
+
+    def stop(self, timeout=None):
+        """停止调度线程，尚未执行的任务以异常结束"""
+        with self._cond:
+            self._running = False
+            pending, self._pending = self._pending, []
+            self._cond.notify_all()
+        for task in pending:
+            task.future.set_exception(RuntimeError("调度器已停止"))
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, group_key, infer_kwargs, deadline=None):
+        """提交推理任务，返回 Future；调用方不再需要结果时 cancel() 该 Future 即可撤回"""
+        task = TTSTask(group_key, infer_kwargs, deadline)
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("调度器未启动")
+            self._pending.append(task)
+            self.stats["submitted"] += 1
+            self._cond.notify_all()
+        return task.future
+
+    def queue_depth(self):
+        """当前排队中的任务数"""
+        with self._cond:
+            return len(self._pending)
+
+    def _count_group(self, group_key):
+        return sum(1 for task in self._pending if task.group_key == group_key)
+
+    def _next_batch(self):
+        """等待并取出下一批任务；调度器停止时返回 None"""
+        with self._cond:
+            while True:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._running:
+                    return None
+
+                # 每次醒来都重新取队首，多个调度线程并发时不会拿着过期的队首等待
+                head = self._pending[0]
+                remaining = head.enqueued_at + self.max_wait - time.monotonic()
+                if remaining <= 0 or self._count_group(head.group_key) >= self.batch_size:
+                    break
+                self._cond.wait(remaining)
+
+            batch, rest = [], []
+            for task in self._pending:
+                if task.group_key == head.group_key and len(batch) < self.batch_size:
+                    batch.append(task)
+                else:
+                    rest.append(task)
+            self._pending = rest
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self.stats["batches"] += 1
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        # 客户端已放弃或已过截止时间的任务不再执行
+        now = time.monotonic()
+        runnable = []
+        for task in batch:
+            if not task.future.set_running_or_notify_cancel():
+                self.stats["cancelled"] += 1
+            elif task.deadline is not None and now >= task.deadline:
+                task.future.set_exception(DeadlineExceeded(f"排队 {now - task.enqueued_at:.1f}s 后已超过截止时间"))
+                self.stats["expired"] += 1
+            else:
+                runnable.append(task)
+        batch = runnable
+        if not batch:
+            return
+        if self.on_dispatch is not None:
+            for task in batch:
+                self.on_dispatch(task)
+
+        if self.batch_infer_fn is not None:
+            try:
+                results = self.batch_infer_fn([task.infer_kwargs for task in batch])
+            except Exception as e:
+                logger.error(f"批量推理失败: {str(e)}")
+                results = [e] * len(batch)
+            for task, result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    task.future.set_exception(result)
+                    self.stats["failed"] += 1
+                else:
+                    task.future.set_result(result)
+                    self.stats["completed"] += 1
+            return
+
+        # 模型不支持批量接口时，同组任务在调度线程中背靠背执行，
+        # IndexTTS2 内部缓存的音色/情感条件可以在组内复用
+        for task in batch:
+            try:
+                task.future.set_result(self.infer_fn(**task.infer_kwargs))
+                self.stats["completed"] += 1
+            except Exception as e:
+                task.future.set_exception(e)
+                self.stats["failed"] += 1
+
+
+class SingleFlight:
+    """
+    相同键的并发调用合并
+
+    第一个到达的调用者负责执行，其余调用者挂在同一个 Future 上等待结果
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.stats = {"leaders": 0, "coalesced": 0}
+
+    def do(self, key, fn, timeout=None, retry_on=()):
+        """
+        执行 fn() 或等待已在执行的同键调用
+        等待中的调用收到 retry_on 中的异常（如发起者被取消）时，改为自己执行
+        返回 (结果, 是否为合并的调用)
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                leader = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                self.stats["leaders"] += 1
+                leader = True
+
+        if not leader:
+            try:
+                return future.result(timeout=timeout), True
+            except retry_on:
+                return self.do(key, fn, timeout, retry_on)
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def inflight_count(self):
+        with self._lock:
+            return len(self._inflight)
@@ -0,0 +1,349 @@
+"""
+分布式追踪
+- 接收 W3C traceparent 请求头，本服务的处理过程记为调用方 trace 下的 span
+- 各处理阶段（参考音频解码/下载、排队、推理、后处理、编码、响应发送）各记一个 span
+- span 由后台线程批量导出到 JSONL 文件或 OTLP/HTTP（JSON 编码）收集器，导出慢或失败不影响请求
+未携带 traceparent 的请求按 TRACE_SAMPLE_RATE 抽样开启新的 trace；调用方标记为不采样的请求不记录
+"""
+
+import os
+import re
+import json
+import time
+import queue
+import random
+import secrets
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager, nullcontext
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = 'traceparent'
+
+_TRACEPARENT = re.compile(r'^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+# 当前线程所属的 span
+_local = threading.local()
+
+
+def parse_traceparent(value):
+    """解析 traceparent，返回 (trace_id, parent_id, sampled)；格式无效时返回 None"""
+    match = _TRACEPARENT.match((value or '').strip().lower())
+    if match is None:
+        return None
+    version, trace_id, parent_id, flags = match.groups()
+    if version == 'ff' or trace_id == '0' * 32 or parent_id == '0' * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+class Span:
+    """一个处理阶段；end() 后交给 Tracer 导出"""
+
+    def __init__(self, tracer, name, trace_id, parent_id=None, kind='internal', attributes=None, start_ns=None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def child(self, name, attributes=None, start_ns=None):
+        return Span(self.tracer, name, self.trace_id, self.span_id, attributes=attributes, start_ns=start_ns)
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, error):
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self, end_ns=None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        self.tracer.export(self)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "service": self.tracer.service_name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+def current():
+    """当前线程所属的 span，没有时返回 None"""
+    return getattr(_local, 'span', None)
+
+
+def attach(span):
+    """把 span 设为当前线程的 span，返回之前的 span（交给 detach 恢复）"""
+    previous = current()
+    _local.span = span
+    return previous
+
+
+def detach(previous):
+    _local.span = previous
+
+
+@contextmanager
+def activated(span):
+    """在当前线程中以 span 为父节点执行；span 为 None 时不做任何事"""
+    if span is None:
+        yield None
+        return
+    previous = attach(span)
+    try:
+        yield span
+    finally:
+        detach(previous)
+
+
+def span(name, **attributes):
+    """在当前 span 下记录一个子 span；当前线程不在追踪中时不做任何事"""
+    parent = current()
+    if parent is None:
+        return nullcontext()
+    return _child_span(parent, name, attributes)
+
+
+@contextmanager
+def _child_span(parent, name, attributes):
+    child = parent.child(name, attributes)
+    previous = attach(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.set_error(e)
+        raise
+    finally:
+        detach(previous)
+        child.end()
+
+
+def record(parent, name, start_ns, end_ns=None, **attributes):
+    """补记一个已经结束的阶段（如排队等待），parent 为 None 时忽略"""
+    if parent is not None:
+        parent.child(name, attributes, start_ns=start_ns).end(end_ns)
+
+
+def wrap(fn, parent=None):
+    """把 fn 绑定到 parent（默认为当前 span），用于提交到其他线程执行的任务"""
+    parent = parent if parent is not None else current()
+    if parent is None:
+        return fn
+
+    def run(*args, **kwargs):
+        with activated(parent):
+            return fn(*args, **kwargs)
+    return run
+
+
+class JsonlExporter:
+    """每个 span 一行 JSON 追加到文件，超过 max_bytes 时轮转为 .1"""
+
+    def __init__(self, path, max_bytes=100 * 1024 * 1024):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def export(self, spans):
+        try:
+            if self.max_bytes and self.path.stat().st_size > self.max_bytes:
+                os.replace(self.path, self.path.with_name(self.path.name + '.1'))
+        except FileNotFoundError:
+            pass
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for item in spans:
+                f.write(json.dumps(item.to_dict(), ensure_ascii=False) + '\n')
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter:
+    """以 OTLP/HTTP JSON 编码发送到收集器（如 OpenTelemetry Collector、Jaeger、Tempo 的 4318 端口）"""
+
+    KINDS = {'internal': 1, 'server': 2, 'client': 3}
+
+    def __init__(self, endpoint, service_name, timeout=5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def export(self, spans):
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "indextts"},
+                    "spans": [self._span(item) for item in spans],
+                }],
+            }]
+        }
+        resp = self.session.post(self.endpoint, json=payload, timeout=self.timeout)
+        resp.raise_for_status()
+
+    def _span(self, item):
+        data = {
+            "traceId": item.trace_id,
+            "spanId": item.span_id,
+            "name": item.name,
+            "kind": self.KINDS.get(item.kind, 1),
+            "startTimeUnixNano": str(item.start_ns),
+            "endTimeUnixNano": str(item.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in item.attributes.items()],
+        }
+        if item.parent_id:
+            data["parentSpanId"] = item.parent_id
+        if item.error:
+            data["status"] = {"code": 2, "message": item.error}
+        return data
+
+
+def make_exporter(kind, path=None, endpoint=None, service_name='indextts', max_bytes=None):
+    """按 TRACE_EXPORTER 创建导出器：jsonl / otlp，空字符串表示关闭追踪"""
+    if not kind:
+        return None
+    if kind == 'jsonl':
+        return JsonlExporter(path, max_bytes=max_bytes)
+    if kind == 'otlp':
+        return OtlpHttpExporter(endpoint, service_name)
+    raise ValueError(f"未知的 TRACE_EXPORTER: {kind}，可选: jsonl、otlp")
+
+
+class Tracer:
+    """
+    为请求创建根 span，结束的 span 进入有界队列，由后台线程按批导出
+    队列满时丢弃新的 span 并计数，导出失败只记录日志
+    """
+
+    def __init__(self, exporter=None, service_name='indextts', sample_rate=0.0,
+                 max_queue=10000, batch_size=512, interval=1.0):
+        self.exporter = exporter
+        self.service_name = service_name
+        self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {"traces": 0, "exported": 0, "dropped": 0, "failed": 0}
+
+    @property
+    def enabled(self):
+        return self.exporter is not None
+
+    def start_request(self, headers, name, **attributes):
+        """
+        为请求创建服务端根 span：沿用 traceparent 中的 trace（调用方标记为不采样时不记录），
+        没有 traceparent 时按 sample_rate 开启新的 trace；不记录时返回 None
+        """
+        if not self.enabled:
+            return None
+        parent = parse_traceparent(headers.get(TRACEPARENT_HEADER))
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+            if not sampled:
+                return None
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            trace_id, parent_id = secrets.token_hex(16), None
+        else:
+            return None
+        with self._lock:
+            self.stats["traces"] += 1
+        return Span(self, name, trace_id, parent_id, kind='server', attributes=attributes)
+
+    def export(self, item):
+        if not self.enabled:
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.stats["dropped"] += 1
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._export_batch(batch)
+
+    def _export_batch(self, batch):
+        try:
+            self.exporter.export(batch)
+            with self._lock:
+                self.stats["exported"] += len(batch)
+        except Exception as e:
+            with self._lock:
+                self.stats["failed"] += len(batch)
+            logger.warning(f"导出追踪数据失败: {len(batch)} 个 span, {str(e)}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self, timeout=5.0):
+        """等待队列中的 span 导出完毕（退出前调用），超时返回 False"""
+        if not self.enabled or self._thread is None:
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "exporter": type(self.exporter).__name__ if self.exporter else None,
+                "sample_rate": self.sample_rate,
+                "queued": self._queue.qsize(),
+                **self.stats,
+            }
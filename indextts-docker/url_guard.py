@@ -0,0 +1,38 @@
+"""
+出站 URL 检查
+服务端代为访问的 URL（任务回调、URL 参考音频）只允许 HTTP(S)，
+主机在白名单中或解析到的地址全部为公网地址，防止借服务访问内网（SSRF）
+"""
+
+import socket
+import ipaddress
+from urllib.parse import urlsplit
+
+
+class URLRejected(ValueError):
+    """URL 不允许由服务端访问"""
+
+
+def check_public_url(url, allowed_hosts=(), allow_private=False, field='url'):
+    """
+    检查 url，不允许时抛出 URLRejected，错误信息以 field 开头
+    allowed_hosts 为小写主机名集合；allow_private 时只检查协议和格式
+    """
+    try:
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+    except ValueError:
+        raise URLRejected(f"{field} 格式无效")
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise URLRejected(f"{field} 必须是 HTTP(S) 地址")
+    host = parts.hostname.lower()
+    if host in allowed_hosts or allow_private:
+        return
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (OSError, UnicodeError) as e:
+        raise URLRejected(f"无法解析 {field} 的主机: {host}, {str(e)}")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split('%', 1)[0])
+        if not ip.is_global or ip.is_multicast:
+            raise URLRejected(f"{field} 指向内网或保留地址: {host} ({address})")
@@ -0,0 +1,379 @@
+"""
+音色注册表
+参考音频上传一次：去掉首尾静音、转单声道、重采样、截断后保存，
+再把 IndexTTS2 由参考音频算出的音色/情感条件保存到磁盘，之后按 voice_id 合成时直接装入模型，跳过参考音频处理
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from audio_utils import read_float, resample, write_audio
+
+logger = logging.getLogger(__name__)
+
+# IndexTTS2 按参考音频路径缓存的条件张量：路径与 cache_spk_audio_prompt / cache_emo_audio_prompt 一致时直接复用
+CONDITIONING_ATTRS = (
+    'cache_spk_cond',
+    'cache_s2mel_style',
+    'cache_s2mel_prompt',
+    'cache_mel',
+    'cache_emo_cond',
+)
+
+# 计算条件时合成的短文本
+PRECOMPUTE_TEXT = '你好。'
+
+VOICE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# 参考音频按内容命名（prompt-<哈希前缀>.wav）：模型按路径缓存条件，
+# 删除后重新注册同名音色时路径随内容变化，不会复用旧音色的条件
+PROMPT_FILE = 'prompt-{digest}.wav'
+LEGACY_PROMPT_FILE = 'prompt.wav'
+CONDITIONING_FILE = 'conditioning.pt'
+META_FILE = 'voice.json'
+
+
+class VoiceError(ValueError):
+    """音色参数无效或参考音频无法使用"""
+
+
+class VoiceExists(VoiceError):
+    """voice_id 已被占用"""
+
+
+def trim_silence(data, sample_rate, threshold_db=-40.0, pad_ms=100):
+    """去掉首尾低于 threshold_db（相对峰值）的静音，两端各保留 pad_ms"""
+    if len(data) == 0:
+        return data
+    mono = np.abs(data).max(axis=1)
+    peak = mono.max()
+    if peak <= 0:
+        return data[:0]
+    voiced = np.nonzero(mono > peak * 10 ** (threshold_db / 20))[0]
+    pad = int(sample_rate * pad_ms / 1000)
+    start = max(0, voiced[0] - pad)
+    end = min(len(data), voiced[-1] + 1 + pad)
+    return data[start:end]
+
+
+class VoiceRegistry:
+    """
+    磁盘上的音色注册表，每个音色一个目录：
+      voice.json        元数据
+      prompt-<哈希>.wav  处理后的参考音频（合成时作为 spk_audio_prompt 传给模型）
+      conditioning.pt   预计算的条件张量（torch.save，加载时 mmap）
+    """
+
+    def __init__(self, root, sample_rate=22050, max_seconds=15.0, trim_db=-40.0):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.sample_rate = sample_rate
+        self.max_seconds = max_seconds
+        self.trim_db = trim_db
+        self._lock = threading.Lock()
+        self._voices = self._scan()
+        logger.info(f"音色注册表: {self.root}, {len(self._voices)} 个音色")
+
+    def list(self):
+        with self._lock:
+            voices = sorted(self._voices.values(), key=lambda v: v["created_at"])
+        return [self._public(voice) for voice in voices]
+
+    def get(self, voice_id):
+        with self._lock:
+            voice = self._voices.get(voice_id)
+        return dict(voice) if voice is not None else None
+
+    def describe(self, voice_id):
+        voice = self.get(voice_id)
+        return self._public(voice) if voice is not None else None
+
+    def prompt_path(self, voice_id):
+        """音色参考音频的路径，音色不存在时返回 None"""
+        voice = self.get(voice_id)
+        return self._prompt_of(voice) if voice is not None else None
+
+    def conditioning_path(self, voice_id):
+        return str(self.root / voice_id / CONDITIONING_FILE)
+
+    def infer_spec(self, voice_id):
+        """
+        合成时使用的 (参考音频路径, 内容标识, 传给推理的 voice 参数)，音色不存在时返回 None
+        内容标识取处理后参考音频的哈希，重新注册同名音色后结果缓存随之失效
+        """
+        voice = self.get(voice_id)
+        if voice is None:
+            return None
+        prompt = self._prompt_of(voice)
+        conditioning = self.conditioning_path(voice_id) if voice["conditioning"] else None
+        return prompt, f"voice:{voice['sha256']}", {"prompt": prompt, "conditioning": conditioning}
+
+    def create(self, source_path, name=None, description=None, voice_id=None):
+        """
+        处理参考音频并登记新音色，返回元数据（此时尚未计算条件）
+        """
+        if voice_id is None:
+            voice_id = uuid.uuid4().hex[:12]
+        elif not VOICE_ID_PATTERN.match(voice_id):
+            raise VoiceError("voice_id 只能包含字母、数字、下划线和连字符，最长 64 个字符")
+
+        try:
+            sample_rate, data = read_float(source_path)
+        except Exception as e:
+            raise VoiceError(f"无法解析参考音频: {str(e)}")
+        data = trim_silence(data.mean(axis=1, keepdims=True), sample_rate, self.trim_db)
+        if len(data) < sample_rate * 0.5:
+            raise VoiceError("参考音频有效时长不足 0.5 秒")
+        data = data[:int(sample_rate * self.max_seconds)]
+        data = resample(data, sample_rate, self.sample_rate)
+
+        voice_dir = self.root / voice_id
+        with self._lock:
+            if voice_id in self._voices or voice_dir.exists():
+                raise VoiceExists(f"音色已存在: {voice_id}")
+            voice_dir.mkdir(parents=True)
+
+        try:
+            tmp_path = voice_dir / '.prompt.tmp.wav'
+            write_audio(tmp_path, data, self.sample_rate)
+            with open(tmp_path, 'rb') as f:
+                sha = hashlib.sha256(f.read()).hexdigest()
+            prompt_file = PROMPT_FILE.format(digest=sha[:16])
+            os.replace(tmp_path, voice_dir / prompt_file)
+            voice = {
+                "id": voice_id,
+                "name": name or voice_id,
+                "description": description or '',
+                "duration": round(len(data) / float(self.sample_rate), 3),
+                "sample_rate": self.sample_rate,
+                "sha256": sha,
+                "prompt_file": prompt_file,
+                "conditioning": False,
+                "created_at": time.time(),
+            }
+            self._write_meta(voice)
+        except BaseException:
+            self._remove_dir(voice_dir)
+            raise
+
+        with self._lock:
+            self._voices[voice_id] = voice
+        logger.info(f"已登记音色: {voice_id}, 时长 {voice['duration']}s")
+        return dict(voice)
+
+    def mark_conditioned(self, voice_id, seconds):
+        """条件张量已保存"""
+        with self._lock:
+            voice = self._voices.get(voice_id)
+            if voice is None:
+                return
+            voice.update(conditioning=True, precompute_seconds=round(seconds, 3))
+            snapshot = dict(voice)
+        self._write_meta(snapshot)
+
+    def delete(self, voice_id):
+        """删除音色，返回其参考音频路径（供调用方清理模型缓存）；音色不存在时返回 None"""
+        with self._lock:
+            voice = self._voices.pop(voice_id, None)
+        if voice is None:
+            return None
+        forget_conditioning(self.conditioning_path(voice_id))
+        self._remove_dir(self.root / voice_id)
+        logger.info(f"已删除音色: {voice_id}")
+        return self._prompt_of(voice)
+
+    def invalidate_conditioning(self):
+        """删除所有音色的条件张量（模型权重更换后调用），合成时回退为按参考音频现算，之后可重新计算"""
+        with self._lock:
+            voices = [voice for voice in self._voices.values() if voice["conditioning"]]
+            for voice in voices:
+                voice["conditioning"] = False
+            snapshots = [dict(voice) for voice in voices]
+        for voice in snapshots:
+            path = self.conditioning_path(voice["id"])
+            forget_conditioning(path)
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            self._write_meta(voice)
+        return len(snapshots)
+
+    def pending(self):
+        """还没有条件张量的音色（上次计算失败或模型更换后清理过）"""
+        with self._lock:
+            return [voice_id for voice_id, voice in self._voices.items() if not voice["conditioning"]]
+
+    def preload(self, device=None):
+        """以 mmap 方式加载全部条件张量，首个请求不再付出读盘开销"""
+        loaded = 0
+        for voice_id in [v["id"] for v in self.list() if v["conditioning"]]:
+            try:
+                load_conditioning(self.conditioning_path(voice_id), device)
+                loaded += 1
+            except Exception as e:
+                logger.warning(f"加载音色条件失败: {voice_id}, {str(e)}")
+        return loaded
+
+    def snapshot(self):
+        with self._lock:
+            voices = list(self._voices.values())
+        return {
+            "voices": len(voices),
+            "conditioned": sum(1 for voice in voices if voice["conditioning"]),
+            "loaded": len(_loaded),
+        }
+
+    def _prompt_of(self, voice):
+        return str(self.root / voice["id"] / voice.get("prompt_file", LEGACY_PROMPT_FILE))
+
+    @staticmethod
+    def _public(voice):
+        return {key: value for key, value in voice.items() if key not in ("sha256", "prompt_file")}
+
+    def _scan(self):
+        voices = {}
+        for meta_path in self.root.glob(f'*/{META_FILE}'):
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    voice = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"读取音色元数据失败: {meta_path}, {str(e)}")
+                continue
+            voice_dir = meta_path.parent
+            # 旧版本注册的音色没有 prompt_file，参考音频为 prompt.wav
+            voice.setdefault("prompt_file", LEGACY_PROMPT_FILE)
+            if not (voice_dir / voice["prompt_file"]).exists():
+                continue
+            # 条件文件缺失时回退为按参考音频现算
+            voice["conditioning"] = (voice_dir / CONDITIONING_FILE).exists()
+            voices[voice["id"]] = voice
+        return voices
+
+    def _write_meta(self, voice):
+        meta_path = self.root / voice["id"] / META_FILE
+        tmp_path = meta_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(voice, f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+
+    @staticmethod
+    def _remove_dir(voice_dir):
+        for path in voice_dir.glob('*'):
+            path.unlink()
+        voice_dir.rmdir()
+
+
+# 已加载的条件张量：条件文件路径 -> (修改时间, 设备, {属性: 张量})
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def load_conditioning(path, device=None):
+    """以 mmap 方式加载条件张量，按文件修改时间缓存；GPU 推理时搬到对应设备后缓存"""
+    mtime = os.stat(path).st_mtime_ns
+    device = str(device) if device is not None else 'cpu'
+    with _loaded_lock:
+        entry = _loaded.get(path)
+    if entry is not None and entry[0] == mtime and entry[1] == device:
+        return entry[2]
+
+    import torch
+    state = torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+    if device != 'cpu':
+        state = {attr: value.to(device) for attr, value in state.items()}
+    with _loaded_lock:
+        _loaded[path] = (mtime, device, state)
+    return state
+
+
+def forget_conditioning(path):
+    with _loaded_lock:
+        _loaded.pop(path, None)
+
+
+def apply_conditioning(model, voice):
+    """
+    把音色的条件张量装入模型缓存，并让缓存路径指向音色的参考音频，
+    随后以该路径推理时模型直接复用条件，不再提取特征
+    """
+    prompt = voice["prompt"]
+    if not voice.get("conditioning") or not hasattr(model, 'cache_spk_cond'):
+        # 没有条件文件或模型版本不支持：按参考音频正常计算
+        return False
+    if getattr(model, 'cache_spk_audio_prompt', None) == prompt:
+        return True
+    state = load_conditioning(voice["conditioning"], getattr(model, 'device', None))
+    for attr in CONDITIONING_ATTRS:
+        if attr in state:
+            setattr(model, attr, state[attr])
+    model.cache_spk_audio_prompt = prompt
+    if 'cache_emo_cond' in state:
+        model.cache_emo_audio_prompt = prompt
+    return True
+
+
+def forget_prompt(model, prompt):
+    """
+    音色删除后让模型不再认为缓存属于 prompt：清空缓存的参考音频路径，下次推理重新提取特征
+    只改路径不动张量，正在进行的推理不受影响
+    """
+    forgotten = False
+    for attr in ('cache_spk_audio_prompt', 'cache_emo_audio_prompt'):
+        if getattr(model, attr, None) == prompt:
+            setattr(model, attr, None)
+            forgotten = True
+    return forgotten
+
+
+def capture_conditioning(model, prompt, path):
+    """
+    以 prompt 推理后，把模型缓存中的条件张量保存到 path
+    模型不支持或缓存不属于该参考音频时返回 False
+    """
+    if getattr(model, 'cache_spk_audio_prompt', None) != prompt:
+        return False
+    import torch
+    state = {}
+    for attr in CONDITIONING_ATTRS:
+        value = getattr(model, attr, None)
+        if isinstance(value, torch.Tensor):
+            state[attr] = value.detach().cpu().contiguous()
+    if 'cache_spk_cond' not in state:
+        return False
+    if getattr(model, 'cache_emo_audio_prompt', None) != prompt:
+        # 情感条件来自别的参考音频，不能随音色保存
+        state.pop('cache_emo_cond', None)
+    tmp_path = f"{path}.tmp"
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, path)
+    forget_conditioning(path)
+    return True
+
+
+def run_infer(model, infer_kwargs):
+    """
+    执行一次推理，处理音色相关的附加参数（单进程和推理副本共用）
+    - voice: {"prompt", "conditioning"}，推理前装入预计算的条件
+    - capture_conditioning: 路径，推理后把条件张量保存到该路径，返回值附带是否保存成功
+    """
+    voice = infer_kwargs.pop('voice', None)
+    capture = infer_kwargs.pop('capture_conditioning', None)
+    if voice is not None:
+        try:
+            apply_conditioning(model, voice)
+        except Exception as e:
+            logger.warning(f"装入音色条件失败，改为按参考音频计算: {str(e)}")
+    result = model.infer(**infer_kwargs)
+    if capture is not None:
+        return capture_conditioning(model, infer_kwargs['spk_audio_prompt'], capture)
+    return result
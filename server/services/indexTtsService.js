@@ -2,6 +2,9 @@ import dotenv from 'dotenv'
 import { fileURLToPath } from 'url'
 import { dirname, join } from 'path'
 import { existsSync } from 'fs'
+import { readFile } from 'fs/promises'
+import { randomBytes } from 'crypto'
+import http from 'http'
 
 // 加载.env文件
 const __filename = fileURLToPath(import.meta.url)
@@ -20,6 +23,18 @@ const INDEXTTS_BASE_URL = process.env.INDEXTTS_BASE_URL || 'http://localhost:800
 const INDEXTTS_ENABLED = process.env.INDEXTTS_ENABLED !== 'false'
 const INDEXTTS_PATH = process.env.INDEXTTS_PATH || 'C:\\Users\\Administrator\\Desktop\\index-tt2.5'
 const INDEXTTS_TIMEOUT = parseInt(process.env.INDEXTTS_TIMEOUT || '60000') // 60秒
+// 同机部署时 IndexTTS 服务监听的 Unix 套接字（与服务端 UDS_PATH 一致），为空时不使用同机快速通道
+const INDEXTTS_SOCKET = process.env.INDEXTTS_SOCKET || ''
+
+/**
+ * 生成 W3C traceparent（新的 trace，标记为采样），服务端把处理过程记为该 trace 下的 span
+ * @returns {{ traceId: string, traceparent: string }}
+ */
+function createTraceparent() {
+  const traceId = randomBytes(16).toString('hex')
+  const spanId = randomBytes(8).toString('hex')
+  return { traceId, traceparent: `00-${traceId}-${spanId}-01` }
+}
 
 /**
  * 检查服务健康状态
@@ -93,8 +108,70 @@ export async function getVoices() {
   }
 }
 
+/**
+ * 把 generateSpeech 的选项转换为 /api/tts/generate 的请求体
+ * @param {Object} options - 与 generateSpeech 相同
+ * @returns {Object} 请求体
+ */
+function buildSpeechRequestBody(options) {
+  const {
+    text,
+    voiceId = 'default',
+    speed = 1.0,
+    pitch = 0,
+    format = 'wav',
+    referenceAudio,
+    emotionControlMethod,
+    emotionReferenceAudio,
+    emotionWeight,
+    emotionVectors,
+    emotionText,
+    emotionRandom,
+  } = options
+
+  const requestBody = {
+    text: text.trim(),
+    voice_id: voiceId,
+    speed: speed,
+    pitch: pitch,
+    format: format,
+  }
+
+  // 添加音色参考音频
+  if (referenceAudio) {
+    requestBody.reference_audio = referenceAudio
+  }
+
+  // 添加情感控制参数
+  if (emotionControlMethod !== undefined) {
+    requestBody.emotion_control_method = emotionControlMethod
+    
+    if (emotionControlMethod === 1 && emotionReferenceAudio) {
+      // 使用单独的情感参考音频
+      requestBody.emotion_reference_audio = emotionReferenceAudio
+    } else if (emotionControlMethod === 2 && emotionVectors) {
+      // 使用情感向量
+      requestBody.emotion_vectors = emotionVectors
+      if (emotionRandom !== undefined) {
+        requestBody.emotion_random = emotionRandom
+      }
+    } else if (emotionControlMethod === 3 && emotionText !== undefined) {
+      // 使用情感描述文本
+      requestBody.emotion_text = emotionText
+    }
+
+    // 情感权重（选项1、2、3都支持）
+    if ((emotionControlMethod === 1 || emotionControlMethod === 2 || emotionControlMethod === 3) && emotionWeight !== undefined) {
+      requestBody.emotion_weight = emotionWeight
+    }
+  }
+
+  return requestBody
+}
+
 /**
  * 生成语音
+ * 设置了 INDEXTTS_SOCKET 时经同机快速通道（generateSpeechAudio）取回音频，结果中的 audioData 为 data URL
  * @param {Object} options - 生成选项
  * @param {string} options.text - 要转换的文本
  * @param {string} options.voiceId - 音色ID（可选）
@@ -117,13 +194,6 @@ export async function generateSpeech(options = {}) {
     speed = 1.0,
     pitch = 0,
     format = 'wav',
-    referenceAudio,
-    emotionControlMethod,
-    emotionReferenceAudio,
-    emotionWeight,
-    emotionVectors,
-    emotionText,
-    emotionRandom,
   } = options
 
   if (!INDEXTTS_ENABLED) {
@@ -134,58 +204,49 @@ export async function generateSpeech(options = {}) {
     throw new Error('文本不能为空')
   }
 
+  if (INDEXTTS_SOCKET) {
+    // 同机部署：经 Unix 套接字请求，音频经共享内存交接取回；只有连不上套接字（请求尚未发出）时才改走 HTTP
+    try {
+      const { audio, audioUrl, format: audioFormat, duration } = await generateSpeechAudio(options)
+      return {
+        success: true,
+        audioUrl,
+        audioData: `data:audio/${audioFormat};base64,${audio.toString('base64')}`,
+        format: audioFormat,
+        duration,
+      }
+    } catch (error) {
+      if (!error.socketUnavailable) {
+        throw error
+      }
+      console.warn('IndexTTS2.5 Unix 套接字不可用，改用 HTTP:', error.message)
+    }
+  }
+
+  const { traceId, traceparent } = createTraceparent()
+
   try {
     console.log('🎤 调用 IndexTTS2.5 生成语音:', {
       text: text.substring(0, 50) + (text.length > 50 ? '...' : ''),
       voiceId,
       speed,
       pitch,
+      traceId,
     })
 
     const controller = new AbortController()
     const timeoutId = setTimeout(() => controller.abort(), INDEXTTS_TIMEOUT)
 
-    const requestBody = {
-      text: text.trim(),
-      voice_id: voiceId,
-      speed: speed,
-      pitch: pitch,
-      format: format,
-    }
-
-    // 添加音色参考音频
-    if (referenceAudio) {
-      requestBody.reference_audio = referenceAudio
-    }
-
-    // 添加情感控制参数
-    if (emotionControlMethod !== undefined) {
-      requestBody.emotion_control_method = emotionControlMethod
-      
-      if (emotionControlMethod === 1 && emotionReferenceAudio) {
-        // 使用单独的情感参考音频
-        requestBody.emotion_reference_audio = emotionReferenceAudio
-      } else if (emotionControlMethod === 2 && emotionVectors) {
-        // 使用情感向量
-        requestBody.emotion_vectors = emotionVectors
-        if (emotionRandom !== undefined) {
-          requestBody.emotion_random = emotionRandom
-        }
-      } else if (emotionControlMethod === 3 && emotionText !== undefined) {
-        // 使用情感描述文本
-        requestBody.emotion_text = emotionText
-      }
-
-      // 情感权重（选项1、2、3都支持）
-      if ((emotionControlMethod === 1 || emotionControlMethod === 2 || emotionControlMethod === 3) && emotionWeight !== undefined) {
-        requestBody.emotion_weight = emotionWeight
-      }
-    }
+    const requestBody = buildSpeechRequestBody(options)
 
     const response = await fetch(`${INDEXTTS_BASE_URL}/api/tts/generate`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
+        // 告知服务端本次请求的截止时间，超时放弃后服务端不再为这个请求合成
+        'X-Request-Timeout': String(INDEXTTS_TIMEOUT / 1000),
+        // 服务端按 trace ID 记录各处理阶段的耗时（需开启 TRACE_EXPORTER）
+        traceparent,
       },
       body: JSON.stringify(requestBody),
       signal: controller.signal,
@@ -213,11 +274,127 @@ export async function generateSpeech(options = {}) {
     if (error.name === 'AbortError') {
       throw new Error('IndexTTS2.5 请求超时，请检查服务是否正常运行')
     }
-    console.error('IndexTTS2.5 生成语音失败:', error)
+    console.error('IndexTTS2.5 生成语音失败:', error, 'traceId:', traceId)
     throw new Error(`生成语音失败: ${error.message}`)
   }
 }
 
+/**
+ * 经 Unix 套接字发送 JSON 请求
+ * @returns {Promise<{status: number, data: Object}>}
+ */
+function requestOverSocket(method, path, body, headers = {}) {
+  return new Promise((resolve, reject) => {
+    const payload = body ? JSON.stringify(body) : null
+    const req = http.request({
+      socketPath: INDEXTTS_SOCKET,
+      method,
+      path,
+      timeout: INDEXTTS_TIMEOUT,
+      headers: payload
+        ? { ...headers, 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(payload) }
+        : headers,
+    }, (res) => {
+      const chunks = []
+      res.on('data', (chunk) => chunks.push(chunk))
+      res.on('end', () => {
+        const text = Buffer.concat(chunks).toString('utf8')
+        let data = {}
+        try {
+          data = text ? JSON.parse(text) : {}
+        } catch {
+          data = { error: text }
+        }
+        resolve({ status: res.statusCode, data })
+      })
+    })
+    req.on('timeout', () => req.destroy(new Error('IndexTTS2.5 请求超时，请检查服务是否正常运行')))
+    req.on('error', reject)
+    if (payload) {
+      req.write(payload)
+    }
+    req.end()
+  })
+}
+
+/**
+ * 经 Unix 套接字下载已生成的音频（/api/audio/<filename>）
+ * @param {string} path - 服务端返回的 audio_url
+ * @returns {Promise<Buffer>}
+ */
+function downloadOverSocket(path) {
+  return new Promise((resolve, reject) => {
+    http.get({ socketPath: INDEXTTS_SOCKET, path, timeout: INDEXTTS_TIMEOUT }, (res) => {
+      const chunks = []
+      res.on('data', (chunk) => chunks.push(chunk))
+      res.on('end', () => (res.statusCode === 200
+        ? resolve(Buffer.concat(chunks))
+        : reject(new Error(`下载音频失败: HTTP ${res.statusCode}`))))
+    }).on('error', reject)
+  })
+}
+
+/**
+ * 生成语音并直接取回音频内容（同机快速通道）
+ * 经 Unix 套接字（INDEXTTS_SOCKET）请求，音频通过 /dev/shm 交接：读取文件后确认释放，不经过 base64 和 TCP
+ * 应与服务端挂载同一个 SHM_HANDOFF_DIR；读不到交接文件或交接区已满（服务端只返回 audio_url）时，改为经套接字下载
+ * @param {Object} options - 与 generateSpeech 相同
+ * @returns {Promise<{audio: Buffer, audioUrl: string, format: string, duration: number, sampleRate: number}>}
+ */
+export async function generateSpeechAudio(options = {}) {
+  if (!INDEXTTS_SOCKET) {
+    throw new Error('未配置 INDEXTTS_SOCKET，无法使用同机快速通道')
+  }
+  if (!options.text || !options.text.trim()) {
+    throw new Error('文本不能为空')
+  }
+
+  const { traceId, traceparent } = createTraceparent()
+  const { status, data } = await requestOverSocket('POST', '/api/tts/generate', {
+    ...buildSpeechRequestBody(options),
+    response_mode: 'shm',
+  }, {
+    'X-Request-Timeout': String(INDEXTTS_TIMEOUT / 1000),
+    traceparent,
+  }).catch((error) => {
+    // 套接字不存在或无人监听：服务端还没收到请求，调用方可以安全地改走 HTTP
+    if (error.code === 'ENOENT' || error.code === 'ECONNREFUSED') {
+      error.socketUnavailable = true
+    }
+    throw error
+  })
+  if (status !== 200) {
+    console.error('IndexTTS2.5 生成语音失败:', data, 'traceId:', traceId)
+    throw new Error(`生成语音失败: ${data.error || data.message || `HTTP ${status}`}`)
+  }
+
+  let audio
+  if (data.shm) {
+    try {
+      audio = await readFile(data.shm.path)
+    } catch (error) {
+      // 本进程看不到服务端的 SHM_HANDOFF_DIR（未挂载同一目录），音频已生成，改为经套接字下载
+      console.warn('IndexTTS2.5 读取共享内存失败，改为经套接字下载（请检查 SHM_HANDOFF_DIR 挂载）:', error.message)
+    } finally {
+      // 读完（或读取失败）都确认释放，未确认的文件由服务端按 SHM_LEASE_TTL 回收
+      await requestOverSocket('DELETE', `/api/tts/leases/${data.shm.lease}`).catch((error) => {
+        console.warn('IndexTTS2.5 释放共享内存失败:', error.message)
+      })
+    }
+  }
+  if (!audio) {
+    audio = await downloadOverSocket(data.audio_url)
+  }
+
+  return {
+    audio,
+    audioUrl: data.audio_url,
+    format: data.format || options.format || 'wav',
+    duration: data.duration,
+    sampleRate: data.sample_rate,
+  }
+}
+
 /**
  * 批量生成语音
  * @param {Array<Object>} texts - 文本数组，每个对象包含 text 和其他选项